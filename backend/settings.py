@@ -8,6 +8,7 @@ from datetime import timedelta
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 import os
+from corsheaders.defaults import default_headers
 
 # --------------------------------------------------
 # LOAD ENV VARIABLES
@@ -55,6 +56,8 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # --------------------------------------------------
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.QueryInstrumentationMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -62,15 +65,95 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
+    "core.middleware.ShardRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.IdempotencyMiddleware",
+    "core.middleware.ProfilingMiddleware",
 ]
 
+# --------------------------------------------------
+# SQL INSTRUMENTATION (Server-Timing + slow/N+1 logs)
+# --------------------------------------------------
+SQL_INSTRUMENTATION = {
+    "ENABLED": os.getenv("SQL_INSTRUMENTATION", "True") == "True",
+    "SLOW_REQUEST_MS": int(os.getenv("SLOW_REQUEST_MS", "500")),
+    "SLOW_QUERY_MS": int(os.getenv("SLOW_QUERY_MS", "100")),
+    "N_PLUS_ONE_THRESHOLD": int(os.getenv("N_PLUS_ONE_THRESHOLD", "10")),
+}
+
+# --------------------------------------------------
+# PROMETHEUS METRICS (/metrics)
+# --------------------------------------------------
+METRICS = {
+    "ENABLED": os.getenv("METRICS_ENABLED", "True") == "True",
+    # Point every gunicorn worker at the same empty directory
+    "MULTIPROC_DIR": os.getenv("METRICS_MULTIPROC_DIR", ""),
+    "FLUSH_INTERVAL": float(os.getenv("METRICS_FLUSH_INTERVAL", "5")),
+    # Required outside DEBUG: /metrics answers 403 without it
+    "TOKEN": os.getenv("METRICS_TOKEN", ""),
+}
+
+# --------------------------------------------------
+# ON-DEMAND PROFILING (X-Profile: 1 | mem, staff or signed token)
+# --------------------------------------------------
+PROFILING = {
+    "ENABLED": os.getenv("PROFILING_ENABLED", "True") == "True",
+    "DIR": os.getenv("PROFILING_DIR", str(BASE_DIR / "profiles")),
+    "TOP_N": int(os.getenv("PROFILING_TOP_N", "40")),
+    "MAX_PER_MINUTE": int(os.getenv("PROFILING_MAX_PER_MINUTE", "6")),
+    "KEEP": int(os.getenv("PROFILING_KEEP", "200")),
+    "TOKEN_MAX_AGE": int(os.getenv("PROFILING_TOKEN_MAX_AGE", "3600")),
+}
+
+# --------------------------------------------------
+# IDEMPOTENCY-KEY (stored responses for retried writes)
+# --------------------------------------------------
+IDEMPOTENCY = {
+    "ENABLED": os.getenv("IDEMPOTENCY_ENABLED", "True") == "True",
+    "TTL": int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600))),
+    "WAIT": float(os.getenv("IDEMPOTENCY_WAIT", "10")),
+}
+
+# --------------------------------------------------
+# BATCH API (/api/batch/)
+# --------------------------------------------------
+BATCH = {
+    "MAX_REQUESTS": int(os.getenv("BATCH_MAX_REQUESTS", "20")),
+    "TIMEOUT": float(os.getenv("BATCH_TIMEOUT", "10")),
+    "MAX_WORKERS": int(os.getenv("BATCH_MAX_WORKERS", "4")),
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core": {
+            "handlers": ["console"],
+            "level": os.getenv("CORE_LOG_LEVEL", "INFO"),
+        },
+    },
+}
+
 # --------------------------------------------------
 # CORS
 # --------------------------------------------------
 CORS_ALLOW_ALL_ORIGINS = True
 
+CORS_EXPOSE_HEADERS = [
+    "X-Plan-Hash",
+    "Retry-After",
+    "Server-Timing",
+    "X-Profile-Id",
+    "Idempotent-Replayed",
+]
+
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+
 CSRF_TRUSTED_ORIGINS = [
     "https://*.onrender.com",
 ]
@@ -105,26 +188,93 @@ TEMPLATES = [
 # --------------------------------------------------
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+
+def database_from_url(url):
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        return {"ENGINE": "django.db.backends.sqlite3", "NAME": parsed.path}
+    return {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": parsed.path.lstrip("/"),
+        "USER": parsed.username,
+        "PASSWORD": parsed.password,
+        "HOST": parsed.hostname,
+        "PORT": parsed.port or 5432,
+    }
+
+
 if DATABASE_URL:
-    db_url = urlparse(DATABASE_URL)
+    DATABASES = {"default": database_from_url(DATABASE_URL)}
+    # Trigram lookups for expense search
+    INSTALLED_APPS += ["django.contrib.postgres"]
+else:
     DATABASES = {
         "default": {
-            "ENGINE": "django.db.backends.postgresql",
-            "NAME": db_url.path.lstrip("/"),
-            "USER": db_url.username,
-            "PASSWORD": db_url.password,
-            "HOST": db_url.hostname,
-            "PORT": db_url.port or 5432,
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+        }
+    }
+
+# Read replicas: comma-separated URLs, aliases replica1, replica2, ...
+# Needs REDIS_URL: read-your-writes pins must reach every worker (core.E001)
+DATABASE_REPLICAS = []
+for i, url in enumerate(filter(None, os.getenv("DATABASE_REPLICA_URLS", "").split(",")), 1):
+    DATABASES[f"replica{i}"] = {**database_from_url(url.strip()), "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(f"replica{i}")
+
+# A user's reads stay on the primary this long after they write
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
+# Group shards: comma-separated URLs, aliases shard1, shard2, ...
+# "default" is always shard 0 and keeps users and everything not per-group
+DATABASE_SHARDS = ["default"]
+for i, url in enumerate(filter(None, os.getenv("DATABASE_SHARD_URLS", "").split(",")), 1):
+    DATABASES[f"shard{i}"] = database_from_url(url.strip())
+    DATABASE_SHARDS.append(f"shard{i}")
+
+SHARDING = {
+    # Shards new groups are placed on (default: all of them)
+    "NEW_GROUP_SHARDS": list(filter(None, os.getenv("NEW_GROUP_SHARDS", "").split(","))),
+    # How long a group -> shard lookup is cached
+    "CACHE_SECONDS": int(os.getenv("SHARD_CACHE_SECONDS", "60")),
+}
+
+DATABASE_ROUTERS = ["core.routers.ShardRouter", "core.routers.ReplicaRouter"]
+
+# --------------------------------------------------
+# CACHE (Redis when configured, else per-process memory)
+# --------------------------------------------------
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "core.cache.RedisCache",
+            "LOCATION": REDIS_URL,
         }
     }
 else:
-    DATABASES = {
+    CACHES = {
         "default": {
-            "ENGINE": "django.db.backends.sqlite3",
-            "NAME": BASE_DIR / "db.sqlite3",
+            "BACKEND": "core.cache.LocMemCache",
         }
     }
 
+# --------------------------------------------------
+# RATE LIMITING (scope -> key -> (requests, window seconds))
+# --------------------------------------------------
+RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "True") == "True"
+
+# Trusted proxies appending to X-Forwarded-For (Render: 1)
+RATELIMIT_PROXY_COUNT = int(os.getenv("RATELIMIT_PROXY_COUNT", "0"))
+
+RATE_LIMITS = {
+    "login": {"ip": (30, 60), "identifier": (10, 300)},
+    "register": {"ip": (10, 600)},
+    "forgot_password": {"ip": (5, 600), "identifier": (3, 600)},
+    "reset_password": {"ip": (10, 600), "identifier": (5, 600)},
+}
+
 # --------------------------------------------------
 # PASSWORD VALIDATION
 # --------------------------------------------------
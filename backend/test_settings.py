@@ -0,0 +1,10 @@
+"""
+Settings for the test suite: the regular settings plus the in-memory
+SQLite stand-ins the replica and shard tests route to.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+DATABASES["replica"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+DATABASES["shard"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
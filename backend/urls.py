@@ -5,6 +5,8 @@ from django.http import HttpResponse
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import metrics_view
+
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -25,6 +27,9 @@ urlpatterns = [
 
     path("admin/", admin.site.urls),
 
+    # 📈 PROMETHEUS
+    path("metrics", metrics_view, name="metrics"),
+
     # 🔐 JWT AUTH
     path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
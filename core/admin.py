@@ -1,6 +1,11 @@
+import json
+
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
 from .models import (
     UserProfile,
@@ -39,12 +44,114 @@ admin.site.register(User, UserAdmin)
 
 
 # =========================
-# REGISTER OTHER MODELS
+# COUNTS WITHOUT COUNT(*) ON BIG TABLES
+# =========================
+class EstimatedCountPaginator(Paginator):
+    """
+    On Postgres, pages with the planner's row estimate (EXPLAIN, no table
+    scan) once it says the result is large; small results, and SQLite,
+    get an exact COUNT(*). Page links past the estimate may be off a bit.
+    """
+    EXACT_BELOW = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        db = getattr(queryset, "db", None)
+        if db is None or connections[db].vendor != "postgresql":
+            return super().count
+
+        sql, params = queryset.order_by().query.get_compiler(using=db).as_sql()
+        with connections[db].cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        estimate = int(plan[0]["Plan"]["Plan Rows"])
+        return estimate if estimate >= self.EXACT_BELOW else super().count
+
+
+class LedgerAdmin(admin.ModelAdmin):
+    """
+    Changelists for tables with millions of rows: newest first by primary
+    key, every FK in list_display joined up front, no unfiltered total.
+    Only date filters, on columns that lead their own index (0019), so
+    a narrow filter's exact COUNT(*) is an index range, not a scan.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    ordering = ("-id",)
+
+
+# =========================
+# GROUPS & MEMBERS
+# =========================
+@admin.register(Group)
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "group_type", "wallet_enabled", "created_by", "created_at", "deleted_at")
+    list_select_related = ("created_by",)
+    list_filter = ("group_type", "wallet_enabled", ("deleted_at", admin.EmptyFieldListFilter))
+    search_fields = ("name",)
+    autocomplete_fields = ("created_by",)
+    show_full_result_count = False
+
+
+@admin.register(GroupMember)
+class GroupMemberAdmin(LedgerAdmin):
+    list_display = ("id", "group", "user", "joined_at")
+    list_select_related = ("group", "user")
+    list_filter = ("joined_at",)
+    autocomplete_fields = ("group", "user")
+
+
+# =========================
+# WALLET
 # =========================
-admin.site.register(Group)
-admin.site.register(GroupMember)
-admin.site.register(WalletContribution)
-admin.site.register(WalletExpense)
-admin.site.register(Expense)
-admin.site.register(ExpenseSplit)
-admin.site.register(Settlement)
+@admin.register(WalletContribution)
+class WalletContributionAdmin(LedgerAdmin):
+    list_display = ("id", "group", "user", "amount", "note", "created_at")
+    list_select_related = ("group", "user")
+    list_filter = ("created_at",)
+    autocomplete_fields = ("group", "user")
+
+
+@admin.register(WalletExpense)
+class WalletExpenseAdmin(LedgerAdmin):
+    list_display = ("id", "title", "amount", "group", "added_by", "created_at")
+    list_select_related = ("group", "added_by")
+    list_filter = ("created_at",)
+    # icontains -> UPPER(title) LIKE, trigram-indexed on Postgres (0018)
+    search_fields = ("title",)
+    autocomplete_fields = ("group", "added_by")
+
+
+# =========================
+# EXPENSES, SPLITS, SETTLEMENTS
+# =========================
+@admin.register(Expense)
+class ExpenseAdmin(LedgerAdmin):
+    list_display = ("id", "title", "amount", "split_type", "group", "paid_by", "created_at")
+    list_select_related = ("group", "paid_by")
+    list_filter = ("created_at",)
+    # icontains -> UPPER(title) LIKE, trigram-indexed on Postgres (0018)
+    search_fields = ("title",)
+    autocomplete_fields = ("group", "paid_by")
+
+
+@admin.register(ExpenseSplit)
+class ExpenseSplitAdmin(LedgerAdmin):
+    list_display = ("id", "expense", "user", "share_amount")
+    list_select_related = ("expense", "user")
+    # Millions of expenses: type the id instead of loading a <select>
+    raw_id_fields = ("expense",)
+    autocomplete_fields = ("user",)
+
+
+@admin.register(Settlement)
+class SettlementAdmin(LedgerAdmin):
+    list_display = ("id", "group", "from_user", "to_user", "amount", "status", "created_at")
+    list_select_related = ("group", "from_user", "to_user")
+    list_filter = ("created_at",)
+    autocomplete_fields = ("group", "from_user", "to_user")
@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+
+        from . import checks, sharding  # noqa: F401 (checks registers itself)
+        from .models import UserProfile
+
+        post_migrate.connect(sharding.prepare_shard, sender=self)
+        for model in (User, UserProfile):
+            post_save.connect(sharding.replicate_saved, sender=model)
+            post_delete.connect(sharding.replicate_deleted, sender=model)
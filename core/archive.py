@@ -0,0 +1,297 @@
+import time
+from collections import defaultdict
+from itertools import groupby
+
+from django.db.models import Max, Sum
+
+from . import sharding
+from .models import (
+    ArchivedExpense,
+    ArchivedExpenseSplit,
+    CarriedBalance,
+    Expense,
+    ExpenseSplit,
+    Group,
+    GroupMember,
+    Settlement,
+)
+from .splits import from_paise, to_paise
+
+
+EXPENSE_FIELDS = (
+    "id", "group_id", "paid_by_id", "amount", "title", "split_type", "created_at",
+)
+MAX_PAGE_SIZE = 50
+
+
+# ============================================================
+# ✅ WHERE IS IT SAFE TO CUT?
+# ============================================================
+def archived_through(group_id):
+    return CarriedBalance.objects.filter(
+        group_id=group_id
+    ).aggregate(t=Max("through"))["t"]
+
+
+def _expense_batches(group_id, after, before, batch_size):
+    """
+    Yield ``(through, expenses)`` for the group's expenses created in
+    ``(after, before]``, oldest first. Each batch ends on a whole instant
+    (rows sharing the last ``created_at`` are pulled in) so every event
+    at ``through`` is in the batch; the last one has ``through=before``.
+    """
+    fields = ("id", "paid_by_id", "amount", "created_at")
+
+    while True:
+        window = {"created_at__lte": before}
+        if after:
+            window["created_at__gt"] = after
+        expenses = list(
+            Expense.objects.filter(group_id=group_id, **window)
+            .order_by("created_at", "id").values_list(*fields)[:batch_size]
+        )
+        if len(expenses) < batch_size:
+            yield before, expenses
+            return
+
+        last_id, _, _, through = expenses[-1]
+        expenses += Expense.objects.filter(
+            group_id=group_id, created_at=through, id__gt=last_id
+        ).order_by("id").values_list(*fields)
+        yield through, expenses
+        after = through
+
+
+def settled_cutoff(group_id, before, batch_size=500):
+    """
+    Latest ``created_at <= before`` at which every member of the group
+    was square (all balances zero), or ``None`` if there is no such
+    point after the previous archive run.
+
+    Starts from the carried balances plus settlements up to the previous
+    cut-off (summed in SQL), then replays live expenses and settlements
+    in time order, ``batch_size`` expenses at a time.
+    """
+    through = archived_through(group_id)
+
+    net = defaultdict(int)
+    for user_id, amount in CarriedBalance.objects.filter(
+        group_id=group_id
+    ).values_list("user_id", "amount"):
+        net[user_id] += to_paise(amount)
+
+    paid = Settlement.objects.filter(group_id=group_id, status="PAID")
+    if through:
+        earlier = paid.filter(created_at__lte=through)
+        for field, sign in (("from_user_id", 1), ("to_user_id", -1)):
+            for user_id, total in earlier.values_list(field).annotate(Sum("amount")):
+                net[user_id] += sign * to_paise(total)
+
+    nonzero = {u for u, v in net.items() if v}
+    cutoff = None
+    after = through
+
+    for upto, expenses in _expense_batches(group_id, after, before, batch_size):
+        window = {"created_at__lte": upto}
+        if after:
+            window["created_at__gt"] = after
+
+        events = defaultdict(list)
+        for _, payer, amount, at in expenses:
+            events[at].append((payer, to_paise(amount)))
+
+        for user_id, share, at in ExpenseSplit.objects.filter(
+            expense__group_id=group_id,
+            **{f"expense__{k}": v for k, v in window.items()},
+        ).values_list("user_id", "share_amount", "expense__created_at"):
+            events[at].append((user_id, -to_paise(share)))
+
+        for from_id, to_id, amount, at in paid.filter(**window).values_list(
+            "from_user_id", "to_user_id", "amount", "created_at"
+        ):
+            paise = to_paise(amount)
+            events[at] += [(from_id, paise), (to_id, -paise)]
+
+        for at in sorted(events):
+            for user_id, delta in events[at]:
+                net[user_id] += delta
+                if net[user_id]:
+                    nonzero.add(user_id)
+                else:
+                    nonzero.discard(user_id)
+            if not nonzero:
+                cutoff = at
+
+        after = upto
+
+    return cutoff
+
+
+# ============================================================
+# ✅ MOVE EXPENSES TO THE ARCHIVE
+# ============================================================
+def _carry(group_id, net, through):
+    """Add ``{user_id: paise}`` to the group's carried balances."""
+    member_ids = GroupMember.objects.filter(
+        group_id=group_id
+    ).values_list("user_id", flat=True)
+
+    CarriedBalance.objects.bulk_create(
+        [
+            CarriedBalance(group_id=group_id, user_id=user_id, through=through)
+            for user_id in set(member_ids) | set(net)
+        ],
+        ignore_conflicts=True,
+    )
+
+    rows = list(CarriedBalance.objects.select_for_update().filter(group_id=group_id))
+    for row in rows:
+        row.amount = from_paise(to_paise(row.amount) + net.get(row.user_id, 0))
+        row.through = through
+
+    CarriedBalance.objects.bulk_update(rows, ["amount", "through"])
+
+
+def archive_group(group_id, cutoff, batch_size=500, pause=0.0):
+    """
+    Move the group's expenses with ``created_at <= cutoff`` (and their
+    splits) into the archive tables, oldest first, one short transaction
+    per batch. Returns the number of expenses moved.
+    """
+    moved = 0
+
+    while True:
+        with sharding.atomic():
+            expenses = list(
+                Expense.objects.filter(
+                    group_id=group_id, created_at__lte=cutoff
+                ).order_by("created_at", "id").values(*EXPENSE_FIELDS)[:batch_size]
+            )
+            if not expenses:
+                break
+
+            ids = [e["id"] for e in expenses]
+            splits = list(
+                ExpenseSplit.objects.filter(
+                    expense_id__in=ids
+                ).values("id", "expense_id", "user_id", "share_amount")
+            )
+
+            ArchivedExpense.objects.bulk_create(
+                [ArchivedExpense(**e) for e in expenses]
+            )
+            ArchivedExpenseSplit.objects.bulk_create(
+                [ArchivedExpenseSplit(**s) for s in splits]
+            )
+
+            net = defaultdict(int)
+            for e in expenses:
+                net[e["paid_by_id"]] += to_paise(e["amount"])
+            for s in splits:
+                net[s["user_id"]] -= to_paise(s["share_amount"])
+
+            _carry(group_id, net, expenses[-1]["created_at"])
+
+            for model in (ExpenseSplit, Expense):
+                key = "expense_id__in" if model is ExpenseSplit else "id__in"
+                batch = model.objects.filter(**{key: ids})
+                batch._raw_delete(batch.db)
+
+        moved += len(expenses)
+        if len(expenses) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    # Everything up to the cut-off is carried now; the next run starts there
+    CarriedBalance.objects.filter(group_id=group_id).update(through=cutoff)
+    return moved
+
+
+def archive_groups(before, group_ids=None, group_type=None, batch_size=500,
+                   pause=0.0, dry_run=False):
+    """
+    Archive every (or the given) group up to its settled cut-off.
+    Returns ``{group_id: (cutoff, expenses_moved)}`` for groups that had one.
+    """
+    groups = Group.objects.filter(deleted_at__isnull=True)
+    if group_ids:
+        groups = groups.filter(id__in=group_ids)
+    if group_type:
+        groups = groups.filter(group_type=group_type)
+
+    results = {}
+    for _, part in sharding.fan_out(lambda: _archive_shard(
+        groups, before, batch_size, pause, dry_run
+    )):
+        results.update(part)
+    return results
+
+
+def _archive_shard(groups, before, batch_size, pause, dry_run):
+    results = {}
+    for group_id in groups.order_by("id").values_list("id", flat=True).iterator():
+        if not sharding.owns(group_id):
+            continue
+        cutoff = settled_cutoff(group_id, before, batch_size)
+        if cutoff is None:
+            continue
+
+        if dry_run:
+            moved = Expense.objects.filter(group_id=group_id, created_at__lte=cutoff).count()
+        else:
+            moved = archive_group(group_id, cutoff, batch_size, pause)
+        results[group_id] = (cutoff, moved)
+
+    return results
+
+
+# ============================================================
+# ✅ READ ARCHIVED HISTORY
+# ============================================================
+def get_archived_expenses(group_id, page=1, page_size=20):
+    """Newest first, with splits; one query for the page, one for splits."""
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    page = max(1, page)
+    offset = (page - 1) * page_size
+
+    rows = list(
+        ArchivedExpense.objects.filter(
+            group_id=group_id
+        ).order_by("-created_at", "-id").values(
+            "id", "title", "amount", "split_type", "paid_by_id",
+            "paid_by__username", "created_at",
+        )[offset:offset + page_size + 1]
+    )
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    splits = ArchivedExpenseSplit.objects.filter(
+        expense_id__in=[r["id"] for r in rows]
+    ).order_by("expense_id", "user_id").values_list("expense_id", "user_id", "share_amount")
+    by_expense = {
+        expense_id: [
+            {"user_id": user_id, "share_amount": str(share)}
+            for _, user_id, share in items
+        ]
+        for expense_id, items in groupby(splits, key=lambda s: s[0])
+    }
+
+    return {
+        "archived_through": archived_through(group_id),
+        "page": page,
+        "page_size": page_size,
+        "has_next": has_next,
+        "results": [
+            {
+                "id": r["id"],
+                "title": r["title"],
+                "amount": str(r["amount"]),
+                "split_type": r["split_type"],
+                "paid_by": {"id": r["paid_by_id"], "username": r["paid_by__username"]},
+                "created_at": r["created_at"],
+                "splits": by_expense.get(r["id"], []),
+            }
+            for r in rows
+        ],
+    }
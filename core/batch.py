@@ -0,0 +1,195 @@
+import io
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from . import sharding
+from .middleware import route_view
+
+
+logger = logging.getLogger("core.batch")
+
+DEFAULTS = {
+    "MAX_REQUESTS": 20,
+    # Wall-clock budget for the whole batch; later sub-requests get 504
+    "TIMEOUT": 10,
+    # Threads for "parallel": true reads (each holds its own DB connection)
+    "MAX_WORKERS": 4,
+}
+
+METHODS = {"GET", "POST"}
+PREFIX = "/api/"
+
+# Never forwarded into a sub-request from the outer one
+_BODY_META = {"CONTENT_TYPE", "CONTENT_LENGTH", "QUERY_STRING", "HTTP_IDEMPOTENCY_KEY"}
+
+
+def batch_settings():
+    return {**DEFAULTS, **getattr(settings, "BATCH", {})}
+
+
+class BatchError(ValueError):
+    pass
+
+
+def parse(payload, config):
+    """
+    Validate ``{"requests": [{"method", "url", "body"?}, ...], "parallel"?}``.
+    Returns ``(requests, parallel)`` or raises :class:`BatchError`.
+    """
+    items = payload.get("requests") if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BatchError("requests must be a non-empty list")
+    if len(items) > config["MAX_REQUESTS"]:
+        raise BatchError(f"At most {config['MAX_REQUESTS']} requests per batch")
+
+    parsed = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise BatchError(f"requests[{index}] must be an object")
+
+        method = str(item.get("method", "GET")).upper()
+        url = item.get("url")
+        if method not in METHODS:
+            raise BatchError(f"requests[{index}].method must be GET or POST")
+        if not isinstance(url, str) or not url.startswith(PREFIX):
+            raise BatchError(f"requests[{index}].url must start with {PREFIX}")
+        if method == "GET" and item.get("body") is not None:
+            raise BatchError(f"requests[{index}] is a GET and cannot have a body")
+
+        parsed.append((method, url, item.get("body")))
+
+    return parsed, bool(payload.get("parallel"))
+
+
+# ============================================================
+# ✅ ONE SUB-REQUEST
+# ============================================================
+def _sub_request(request, method, url, body):
+    path, _, query = url.partition("?")
+    payload = json.dumps(body).encode() if body is not None else b""
+
+    environ = {k: v for k, v in request.META.items() if k not in _BODY_META}
+    environ.update({
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "SCRIPT_NAME": "",
+        "QUERY_STRING": query,
+        "CONTENT_LENGTH": str(len(payload)),
+        "wsgi.input": io.BytesIO(payload),
+    })
+    if body is not None:
+        environ["CONTENT_TYPE"] = "application/json"
+
+    sub = WSGIRequest(environ)
+    # DRF honours these, so the caller is not authenticated again per item
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def _error(status, detail):
+    return {"status": status, "headers": {}, "body": {"detail": detail}}
+
+
+def dispatch(request, method, url, body):
+    """Run one sub-request through the URL resolver and its view."""
+    sub = _sub_request(request, method, url, body)
+
+    try:
+        match = resolve(sub.path_info)
+    except Resolver404:
+        return _error(404, "Not found.")
+    if match.url_name == "batch":
+        return _error(400, "Batches cannot be nested.")
+
+    sub.resolver_match = match
+    try:
+        # Each sub-request may be about a different group, on another shard
+        with sharding.use_shard(None):
+            response = None
+            if sharding.is_sharded():
+                response = route_view(sub, match.func, match.kwargs)
+            if response is None:
+                response = match.func(sub, *match.args, **match.kwargs)
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+    except Exception:
+        logger.exception("Batch sub-request %s %s failed", method, url)
+        return _error(500, "Internal server error.")
+
+    content = response.content
+    if response.get("Content-Type", "").startswith("application/json") and content:
+        content = json.loads(content)
+    else:
+        content = content.decode(response.charset or "utf-8", "replace")
+
+    exposed = getattr(settings, "CORS_EXPOSE_HEADERS", [])
+    return {
+        "status": response.status_code,
+        "headers": {h: response[h] for h in exposed if response.has_header(h)},
+        "body": content,
+    }
+
+
+def _dispatch_in_thread(request, method, url, body):
+    try:
+        return dispatch(request, method, url, body)
+    finally:
+        # Worker threads open their own connections; don't leak them
+        connections.close_all()
+
+
+# ============================================================
+# ✅ THE WHOLE BATCH
+# ============================================================
+def run(request, items, parallel, config):
+    """
+    Execute ``items`` in order. With ``parallel``, each run of adjacent
+    GETs is fanned out over a thread pool; a POST always waits for
+    everything before it. Sub-requests are independent: one failing
+    doesn't stop or roll back the others.
+    """
+    deadline = time.monotonic() + config["TIMEOUT"]
+    timed_out = _error(504, "Batch time limit exceeded.")
+    results = [None] * len(items)
+
+    executor = None
+    if parallel and config["MAX_WORKERS"] > 1:
+        executor = ThreadPoolExecutor(max_workers=config["MAX_WORKERS"])
+
+    try:
+        index = 0
+        while index < len(items):
+            if time.monotonic() >= deadline:
+                break
+
+            method, url, body = items[index]
+            if executor is None or method != "GET":
+                results[index] = dispatch(request, method, url, body)
+                index += 1
+                continue
+
+            end = index
+            while end < len(items) and items[end][0] == "GET":
+                end += 1
+
+            futures = {
+                executor.submit(_dispatch_in_thread, request, *items[i]): i
+                for i in range(index, end)
+            }
+            done, _ = wait(futures, timeout=max(0, deadline - time.monotonic()))
+            for future in done:
+                results[futures[future]] = future.result()
+            index = end
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return [result or timed_out for result in results]
@@ -0,0 +1,31 @@
+from django.core.cache.backends import locmem, redis
+
+from . import metrics
+
+
+_MISS = object()
+
+
+class CacheMetricsMixin:
+    """Counts hits and misses of cache reads for /metrics."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISS, version)
+        if value is _MISS:
+            metrics.record_cache(0, 1)
+            return default
+        metrics.record_cache(1, 0)
+        return value
+
+
+class LocMemCache(CacheMetricsMixin, locmem.LocMemCache):
+    # BaseCache.get_many goes through get(), so it is already counted
+    pass
+
+
+class RedisCache(CacheMetricsMixin, redis.RedisCache):
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        metrics.record_cache(len(found), len(keys) - len(found))
+        return found
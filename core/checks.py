@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+from django.utils.module_loading import import_string
+
+
+# Backends whose entries only the current process can see
+PER_PROCESS_CACHES = (LocMemCache, DummyCache)
+
+
+@register(Tags.database, Tags.caches)
+def check_replica_pin_cache(app_configs, **kwargs):
+    """
+    Read-your-writes pins live in the cache. With a per-process cache
+    another worker never sees the pin and serves a lagging replica.
+    """
+    if not getattr(settings, "DATABASE_REPLICAS", []):
+        return []
+
+    backend = import_string(settings.CACHES["default"]["BACKEND"])
+    if not issubclass(backend, PER_PROCESS_CACHES):
+        return []
+
+    return [
+        Error(
+            "DATABASE_REPLICA_URLS needs a cache shared by every worker.",
+            hint="Set REDIS_URL so read-your-writes pins reach all workers.",
+            id="core.E001",
+        )
+    ]
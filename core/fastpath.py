@@ -0,0 +1,139 @@
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+
+
+# Representation is the DB value itself
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+)
+# Representation needs the field's own to_representation
+CONVERTED_FIELDS = (
+    serializers.ChoiceField,
+    serializers.DateField,
+    serializers.DateTimeField,
+    serializers.DecimalField,
+    serializers.FloatField,
+)
+
+_VALUE, _NESTED, _FILE, _METHOD = range(4)
+
+
+def _lookup(model, attrs, trail):
+    """
+    Follow a serializer source like ``user.username`` from ``model``,
+    reached from the root by ``trail`` (``[(name, model field), ...]``).
+    A hop straight back across a one-to-one just taken in reverse
+    (``user__profile__user``) is dropped, so no extra join is made.
+    Returns ``(trail to the value, model field, model it leads to)``.
+    """
+    steps = list(trail)
+    field = None
+    for attr in attrs:
+        field = model._meta.get_field(attr)
+        if steps and steps[-1][1].one_to_one and getattr(steps[-1][1], "field", None) is field:
+            steps.pop()
+        else:
+            steps.append((attr, field))
+        model = field.related_model if field.is_relation else model
+    return steps, field, model
+
+
+# ============================================================
+# ✅ COMPILE A SERIALIZER INTO A ROW PLAN
+# ============================================================
+def _compile(serializer, model, trail, methods, lookups):
+    plan = []
+
+    for field in serializer._readable_fields:
+        name = field.field_name
+
+        if isinstance(field, serializers.SerializerMethodField):
+            if name not in methods:
+                raise TypeError(f"{name}: method fields need an entry in methods")
+            needs, func = methods[name]
+            lookups.update(needs)
+            plan.append((name, _METHOD, None, func))
+            continue
+
+        steps, model_field, related = _lookup(model, field.source_attrs, trail)
+        key = "__".join(step for step, _ in steps)
+
+        if isinstance(field, serializers.BaseSerializer):
+            if isinstance(field, serializers.ListSerializer):
+                raise TypeError(f"{name}: nested many=True has no fast path")
+            pk_key = f"{key}__{related._meta.pk.name}"
+            lookups.add(pk_key)
+            subplan = _compile(field, related, steps, methods, lookups)
+            plan.append((name, _NESTED, pk_key, subplan))
+        elif isinstance(field, serializers.FileField):
+            lookups.add(key)
+            plan.append((name, _FILE, key, model_field.storage))
+        elif isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None:
+            lookups.add(key)
+            plan.append((name, _VALUE, key, None))
+        elif type(field) in IDENTITY_FIELDS or isinstance(field, serializers.EmailField):
+            lookups.add(key)
+            plan.append((name, _VALUE, key, None))
+        elif isinstance(field, CONVERTED_FIELDS):
+            lookups.add(key)
+            plan.append((name, _VALUE, key, field.to_representation))
+        else:
+            raise TypeError(f"{name}: {type(field).__name__} has no fast path")
+
+    return plan
+
+
+def _render(plan, row, request):
+    ret = {}
+    for name, kind, key, arg in plan:
+        if kind == _VALUE:
+            value = row[key]
+            ret[name] = value if value is None or arg is None else arg(value)
+        elif kind == _NESTED:
+            ret[name] = None if row[key] is None else _render(arg, row, request)
+        elif kind == _FILE:
+            # Same as FileField.to_representation with use_url
+            value = row[key]
+            if not value:
+                ret[name] = None
+            else:
+                url = arg.url(value)
+                ret[name] = request.build_absolute_uri(url) if request is not None else url
+        else:
+            ret[name] = arg(row)
+    return ret
+
+
+# ============================================================
+# ✅ READ-ONLY LIST SERIALIZER OVER .values()
+# ============================================================
+class RowSerializer:
+    """
+    Read-only stand-in for ``serializer_class(queryset, many=True).data``.
+    The serializer's fields are compiled once into a flat plan of
+    ``.values()`` lookups, so a list is one query and plain dict building,
+    with no model instances and no per-row field objects.
+
+    ``methods`` maps each ``SerializerMethodField`` name to
+    ``(lookups, func(row))``. Unsupported field types fail at compile time.
+    """
+
+    def __init__(self, serializer_class, methods=None):
+        self.serializer_class = serializer_class
+        self.methods = methods or {}
+        self._compiled = None
+
+    def compile(self):
+        if self._compiled is None:
+            lookups = set()
+            serializer = self.serializer_class()
+            plan = _compile(serializer, serializer.Meta.model, [], self.methods, lookups)
+            self._compiled = (plan, sorted(lookups))
+        return self._compiled
+
+    def data(self, queryset, context=None):
+        plan, lookups = self.compile()
+        request = (context or {}).get("request")
+        return [_render(plan, row, request) for row in queryset.values(*lookups)]
@@ -0,0 +1,171 @@
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    # How long a stored response is replayed for
+    "TTL": 24 * 3600,
+    # How long a duplicate waits for the original before giving up with 409
+    "WAIT": 10,
+    "POLL_INTERVAL": 0.05,
+    # An unfinished claim this old is assumed dead (worker killed) and taken over
+    "STALE_AFTER": 120,
+}
+
+MUTATING = {"POST", "PUT", "PATCH", "DELETE"}
+MAX_KEY_LENGTH = 255
+
+# Per-response headers that must not be replayed
+SKIP_HEADERS = {"set-cookie", "server-timing", "x-profile-id", "vary"}
+
+
+def idempotency_settings():
+    return {**DEFAULTS, **getattr(settings, "IDEMPOTENCY", {})}
+
+
+def _multipart(request):
+    if request.method == "POST":
+        return request.POST, request.FILES
+    # Django only parses POST bodies. Parse PUT/PATCH here and leave the
+    # result where DRF looks once the stream has been read
+    request._post, request._files = request.parse_file_upload(request.META, request)
+    return request._post, request._files
+
+
+def fingerprint(request):
+    """
+    Hash of what the client asked for. Uploads count by field, name and
+    size, so a retried image upload is not read into memory twice.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.get_full_path()}\n".encode())
+    if request.content_type.startswith("multipart/"):
+        form, files = _multipart(request)
+        for name, values in sorted(form.lists()):
+            digest.update(repr((name, values)).encode())
+        for name, uploads in sorted(files.lists()):
+            digest.update(repr((name, [(f.name, f.size) for f in uploads])).encode())
+    else:
+        digest.update(request.body)
+    return digest.hexdigest()
+
+
+# ============================================================
+# ✅ CLAIM / REPLAY
+# ============================================================
+def _claim(user, key, digest, config):
+    """
+    Insert an unfinished row for ``(user, key)``. Returns ``(row, True)``
+    when this request owns the key, else ``(existing_row, False)``.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=user,
+                key=key,
+                fingerprint=digest,
+                expires_at=now + timedelta(seconds=config["TTL"]),
+            ), True
+    except IntegrityError:
+        pass
+
+    # Served by the (user, key) unique index
+    row = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if row is None:
+        # Released by a failed original between our insert and read
+        return _claim(user, key, digest, config)
+
+    if row.expires_at <= now:
+        IdempotencyKey.objects.filter(pk=row.pk, expires_at__lte=now).delete()
+        return _claim(user, key, digest, config)
+
+    stale = now - timedelta(seconds=config["STALE_AFTER"])
+    if row.status_code is None and row.fingerprint == digest and row.created_at < stale:
+        taken = IdempotencyKey.objects.filter(
+            pk=row.pk, status_code__isnull=True, created_at__lt=stale
+        ).update(created_at=now)
+        if taken:
+            return row, True
+
+    return row, False
+
+
+def replay(row):
+    response = HttpResponse(bytes(row.body), status=row.status_code)
+    for name, value in row.headers.items():
+        response[name] = value
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def begin(user, key, request, config):
+    """
+    Returns ``(row, None)`` when the caller should run the view and then
+    call :func:`finish`, or ``(None, response)`` to answer right away:
+    the stored response, or an error for a mismatched or stuck key.
+    """
+    digest = fingerprint(request)
+    deadline = time.monotonic() + config["WAIT"]
+
+    while True:
+        row, owned = _claim(user, key, digest, config)
+        if owned:
+            return row, None
+
+        if row.fingerprint != digest:
+            return None, JsonResponse(
+                {"detail": "Idempotency-Key was already used for a different request."},
+                status=422,
+            )
+
+        if row.status_code is not None:
+            return None, replay(row)
+
+        # The original is still running; wait for it rather than run twice
+        while time.monotonic() < deadline:
+            time.sleep(config["POLL_INTERVAL"])
+            row = IdempotencyKey.objects.filter(pk=row.pk).first()
+            if row is None or row.status_code is not None:
+                break
+        else:
+            response = JsonResponse(
+                {"detail": "A request with this Idempotency-Key is still in progress."},
+                status=409,
+            )
+            response["Retry-After"] = "1"
+            return None, response
+
+        if row is not None:
+            return None, replay(row)
+        # Original failed and gave the key up; claim it ourselves
+
+
+def finish(row, response):
+    """
+    Store ``response`` for replay. Server errors and rate limits are not
+    final, so the key is released and a retry runs the request again.
+    """
+    status = response.status_code
+    if response.streaming or status >= 500 or status == 429:
+        IdempotencyKey.objects.filter(pk=row.pk).delete()
+        return
+
+    IdempotencyKey.objects.filter(pk=row.pk).update(
+        status_code=status,
+        headers={
+            name: value
+            for name, value in response.items()
+            if name.lower() not in SKIP_HEADERS
+        },
+        body=response.content,
+    )
@@ -0,0 +1,200 @@
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import sharding
+from .models import (
+    ArchivedExpense,
+    ArchivedExpenseSplit,
+    BalanceSnapshot,
+    CarriedBalance,
+    Expense,
+    ExpenseSplit,
+    Group,
+    GroupInvite,
+    GroupMember,
+    GroupPurge,
+    GroupShard,
+    IdempotencyKey,
+    PasswordResetOTP,
+    Settlement,
+    SpendingRollup,
+    WalletContribution,
+    WalletExpense,
+)
+
+
+# ============================================================
+# ✅ WHAT COUNTS AS GARBAGE
+# ============================================================
+def expired_otps(now):
+    return PasswordResetOTP.objects.filter(
+        Q(is_used=True) | Q(created_at__lt=now - PasswordResetOTP.VALID_FOR)
+    )
+
+
+def expired_invites(now):
+    return GroupInvite.objects.filter(
+        Q(is_active=False) | Q(expires_at__lt=now)
+    )
+
+
+def expired_idempotency_keys(now):
+    return IdempotencyKey.objects.filter(expires_at__lt=now)
+
+
+TARGETS = {
+    "otps": expired_otps,
+    "invites": expired_invites,
+    "idempotency_keys": expired_idempotency_keys,
+}
+
+
+# ============================================================
+# ✅ CHUNKED PURGE
+# ============================================================
+def purge(queryset, batch_size=1000, dry_run=False, pause=0.0):
+    """
+    Delete ``queryset`` in primary-key batches of ``batch_size``, each in
+    its own short transaction so no lock is held for long. Returns the
+    number of rows removed (or that would be removed on a dry run).
+    """
+    if dry_run:
+        return queryset.count()
+
+    deleted = 0
+
+    while True:
+        with transaction.atomic(using=queryset.db):
+            ids = list(
+                queryset.order_by("pk").values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            # No dependents, so Django fast-deletes with a single DELETE
+            deleted += queryset.model.objects.filter(pk__in=ids).delete()[0]
+
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    return deleted
+
+
+def run(targets=None, batch_size=1000, dry_run=False, pause=0.0):
+    now = timezone.now()
+
+    results = {}
+    for name in targets or TARGETS:
+        queryset = TARGETS[name](now)
+
+        def run_one():
+            return purge(queryset, batch_size=batch_size, dry_run=dry_run, pause=pause)
+
+        # Per-group garbage is on every shard; the rest only on "default"
+        if sharding.is_sharded_model(queryset.model):
+            results[name] = sum(count for _, count in sharding.fan_out(run_one))
+        else:
+            results[name] = run_one()
+
+    return results
+
+
+# ============================================================
+# ✅ SOFT-DELETED GROUPS (RESUMABLE)
+# ============================================================
+# Children before parents; the group row itself goes last.
+GROUP_STEPS = [
+    ("splits", ExpenseSplit, "expense__group_id"),
+    ("expenses", Expense, "group_id"),
+    ("settlements", Settlement, "group_id"),
+    ("wallet_contributions", WalletContribution, "group_id"),
+    ("wallet_expenses", WalletExpense, "group_id"),
+    ("invites", GroupInvite, "group_id"),
+    ("rollups", SpendingRollup, "group_id"),
+    ("snapshots", BalanceSnapshot, "group_id"),
+    ("archived_splits", ArchivedExpenseSplit, "expense__group_id"),
+    ("archived_expenses", ArchivedExpense, "group_id"),
+    ("carried_balances", CarriedBalance, "group_id"),
+    ("members", GroupMember, "group_id"),
+    ("group", Group, "id"),
+]
+
+
+def purge_group(record, batch_size=1000, pause=0.0, deadline=None, restarted=False):
+    """
+    Remove everything belonging to ``record.group_id`` with raw
+    ``DELETE ... WHERE id IN (batch)`` statements: no collector, nothing
+    loaded into memory. Progress is committed with every batch.
+
+    Returns ``True`` once the group is gone, ``False`` if ``deadline``
+    (a ``time.monotonic()`` value) passed first; call again to resume.
+    """
+    names = [name for name, _, _ in GROUP_STEPS]
+    start = names.index(record.step) if record.step in names else 0
+
+    for name, model, field in GROUP_STEPS[start:]:
+        queryset = model.objects.filter(**{field: record.group_id})
+
+        while True:
+            try:
+                with transaction.atomic(using=queryset.db):
+                    ids = list(
+                        queryset.order_by("pk").values_list("pk", flat=True)[:batch_size]
+                    )
+                    removed = 0
+                    if ids:
+                        batch = model.objects.filter(pk__in=ids)
+                        removed = batch._raw_delete(batch.db)
+
+                    record.step = name
+                    record.deleted[name] = record.deleted.get(name, 0) + removed
+                    record.save(update_fields=["step", "deleted", "updated_at"])
+            except IntegrityError:
+                if model is not Group or restarted:
+                    raise
+                # A row was written into the group after its table was
+                # swept; sweep every child table again, then the group
+                record.refresh_from_db()
+                record.step = ""
+                record.save(update_fields=["step", "updated_at"])
+                return purge_group(record, batch_size, pause, deadline, restarted=True)
+
+            if len(ids) < batch_size:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            if pause:
+                time.sleep(pause)
+
+    record.finished_at = timezone.now()
+    record.save(update_fields=["finished_at", "updated_at"])
+    return True
+
+
+def purge_groups(batch_size=1000, pause=0.0, max_seconds=None, group_ids=None):
+    """Work through unfinished purges, oldest first."""
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+
+    pending = GroupPurge.objects.filter(finished_at__isnull=True).order_by("created_at")
+    if group_ids:
+        pending = pending.filter(group_id__in=group_ids)
+
+    results = []
+    for record in pending:
+        if sharding.is_moving(record.group_id):
+            continue
+        with sharding.for_group(record.group_id):
+            done = purge_group(record, batch_size, pause, deadline)
+        if done:
+            GroupShard.objects.filter(group_id=record.group_id).delete()
+            sharding.forget(record.group_id)
+        results.append((record, done))
+        if not done:
+            break
+
+    return results
@@ -0,0 +1,78 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import archive
+from core.models import Group
+
+
+class Command(BaseCommand):
+    help = (
+        "Move expenses older than each group's last fully-settled point "
+        "into the archive tables, carrying their balances forward"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=180,
+            help="Only archive expenses at least this old (default 180)",
+        )
+        parser.add_argument(
+            "--group",
+            type=int,
+            action="append",
+            dest="groups",
+            help="Only archive this group id (repeatable)",
+        )
+        parser.add_argument(
+            "--group-type",
+            choices=[code for code, _ in Group.GROUP_TYPES],
+            help="Only archive groups of this type",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Expenses moved per transaction (default 500)",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report each group's cut-off and expense count",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        started = time.monotonic()
+        before = timezone.now() - timedelta(days=options["older_than_days"])
+
+        results = archive.archive_groups(
+            before,
+            group_ids=options["groups"],
+            group_type=options["group_type"],
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            dry_run=options["dry_run"],
+        )
+
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        for group_id, (cutoff, moved) in results.items():
+            self.stdout.write(
+                f"Group {group_id}: {verb.lower()} {moved} expenses up to {cutoff.isoformat()}"
+            )
+        self.stdout.write(
+            f"{verb} {sum(m for _, m in results.values())} expenses "
+            f"in {len(results)} groups in {time.monotonic() - started:.2f}s"
+        )
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import janitor
+
+
+class Command(BaseCommand):
+    help = "Purge expired/used OTPs, expired invites and idempotency keys"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count what would be deleted",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows deleted per transaction (default 1000)",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches",
+        )
+        parser.add_argument(
+            "--only",
+            action="append",
+            choices=sorted(janitor.TARGETS),
+            help="Limit to one target (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        started = time.monotonic()
+        stats = janitor.run(
+            targets=options["only"],
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+            pause=options["pause"],
+        )
+        elapsed = time.monotonic() - started
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        for name, count in stats.items():
+            self.stdout.write(f"{verb} {count} {name}")
+        self.stdout.write(f"Done in {elapsed:.2f}s")
@@ -0,0 +1,384 @@
+import asyncio
+import base64
+import json
+import math
+import random
+import ssl
+import subprocess
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+DEFAULT_MIX = (
+    "groups=20,summary=10,totals=15,settle_up=15,"
+    "expenses=25,create_expense=10,mark_settlement=5"
+)
+
+
+# ============================================================
+# ✅ MINIMAL KEEP-ALIVE HTTP/1.1 CLIENT (STDLIB ONLY)
+# ============================================================
+class HttpClient:
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.https = parts.scheme == "https"
+        self.port = parts.port or (443 if self.https else 80)
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.reader = self.writer = None
+        # Headers of the last response, for Retry-After
+        self.headers = {}
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host,
+            self.port,
+            ssl=ssl.create_default_context() if self.https else None,
+        )
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, token=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        headers = [
+            f"{method} {self.prefix}{path} HTTP/1.1",
+            f"Host: {self.host}",
+            "Accept: application/json",
+            f"Content-Length: {len(payload)}",
+        ]
+        if body is not None:
+            headers.append("Content-Type: application/json")
+        if token:
+            headers.append(f"Authorization: Bearer {token}")
+        raw = ("\r\n".join(headers) + "\r\n\r\n").encode() + payload
+
+        for attempt in (0, 1):
+            if self.writer is None:
+                await self._connect()
+            try:
+                self.writer.write(raw)
+                await self.writer.drain()
+                return await asyncio.wait_for(self._read_response(), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Server closed an idle keep-alive connection; retry once
+                await self.close()
+                if attempt:
+                    raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                body += chunk[:-2]
+        else:
+            body = await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+
+        self.headers = headers
+        return status, body
+
+
+# ============================================================
+# ✅ STATS
+# ============================================================
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    routes = {}
+    for route in sorted(set(latencies) | set(errors)):
+        values = sorted(latencies.get(route, []))
+        routes[route] = {
+            "requests": len(values),
+            "errors": errors.get(route, 0),
+            "rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round((values[-1] if values else 0) * 1000, 2),
+        }
+
+    total = sum(r["requests"] for r in routes.values())
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "requests": total,
+        "errors": sum(r["errors"] for r in routes.values()),
+        "rps": round(total / elapsed, 2) if elapsed else 0,
+        "routes": routes,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def jwt_user_id(token):
+    payload = token.split(".")[1]
+    payload += "=" * (-len(payload) % 4)
+    # simplejwt issues the claim as a string; member ids are ints
+    return int(json.loads(base64.urlsafe_b64decode(payload))["user_id"])
+
+
+# ============================================================
+# ✅ VIRTUAL USER
+# ============================================================
+class VirtualUser:
+    def __init__(self, client, token, rng):
+        self.client = client
+        self.token = token
+        self.rng = rng
+        self.user_id = jwt_user_id(token)
+        self.groups = {}
+
+    async def discover(self):
+        status, body = await self.client.request("GET", "/api/groups/", token=self.token)
+        if status != 200:
+            raise CommandError(f"GET /api/groups/ returned {status}")
+
+        for group in json.loads(body)[:20]:
+            status, body = await self.client.request(
+                "GET", f"/api/members/?group={group['id']}", token=self.token
+            )
+            members = [m["user"]["id"] for m in json.loads(body)] if status == 200 else []
+            self.groups[group["id"]] = [m for m in members if m != self.user_id]
+
+    def next_request(self, route):
+        """
+        ``(route, method, path, body)`` for ``route``. The route returned
+        is the one actually called (mark_settlement with nobody to pay
+        falls back to totals), so timings land under the right name.
+        """
+        group_id = self.rng.choice(list(self.groups))
+        others = self.groups[group_id]
+
+        if route == "groups":
+            return route, "GET", "/api/groups/", None
+        if route in ("summary", "totals", "settle_up"):
+            return route, "GET", f"/api/groups/{group_id}/{route}/", None
+        if route == "expenses":
+            return route, "GET", f"/api/expenses/?group={group_id}", None
+        if route == "create_expense":
+            return route, "POST", "/api/expenses/", {
+                "group": group_id,
+                "title": "Load test",
+                "amount": f"{self.rng.randint(100, 99_999) / 100:.2f}",
+            }
+        if route == "mark_settlement" and others:
+            return route, "POST", f"/api/groups/{group_id}/mark_settlement/", {
+                "from_user": self.user_id,
+                "to_user": self.rng.choice(others),
+                "amount": "1.00",
+            }
+        return "totals", "GET", f"/api/groups/{group_id}/totals/", None
+
+
+def mint_tokens(usernames):
+    """
+    Access tokens for seeded users straight from the database, so N
+    users don't queue behind the per-IP login rate limit. The server
+    must share this database and SECRET_KEY.
+    """
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    users = {u.username: u for u in User.objects.filter(username__in=usernames)}
+    missing = [name for name in usernames if name not in users]
+    if missing:
+        raise CommandError(f"Seeded users not found: {missing[:5]}")
+    return [str(RefreshToken.for_user(users[name]).access_token) for name in usernames]
+
+
+# ============================================================
+# ✅ COMMAND
+# ============================================================
+class Command(BaseCommand):
+    help = "Drive a running server with a request mix and report latency percentiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument(
+            "--account",
+            action="append",
+            default=[],
+            help="identifier:password to log in with (repeatable)",
+        )
+        parser.add_argument(
+            "--seeded",
+            type=int,
+            default=0,
+            help="Also act as the first N seed_load users (load<seed>_<i>); "
+                 "their tokens are minted locally, so the server must share "
+                 "this database and SECRET_KEY",
+        )
+        parser.add_argument("--seed-prefix", default="load1_")
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument("--duration", type=float, default=30, help="Seconds")
+        parser.add_argument("--mix", default=DEFAULT_MIX, help="route=weight,...")
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--out", help="Write JSON results to this file")
+        parser.add_argument("--compare", help="Previous JSON results to diff against")
+
+    def handle(self, *args, **o):
+        accounts = [a.split(":", 1) for a in o["account"]]
+        if not (accounts or o["seeded"]) or any(len(a) != 2 for a in accounts):
+            raise CommandError("Give --account identifier:password or --seeded N")
+        tokens = mint_tokens([f"{o['seed_prefix']}{i}" for i in range(o["seeded"])])
+
+        try:
+            mix = {
+                route: float(weight)
+                for route, weight in (item.split("=") for item in o["mix"].split(","))
+            }
+        except ValueError:
+            raise CommandError("--mix must look like route=weight,route=weight")
+
+        result = asyncio.run(self.run(accounts, tokens, mix, o))
+        result.update({
+            "commit": git_commit(),
+            "url": o["url"],
+            "concurrency": o["concurrency"],
+            "mix": mix,
+        })
+
+        self.report(result, o["compare"])
+
+        if o["out"]:
+            with open(o["out"], "w") as fh:
+                json.dump(result, fh, indent=2)
+            self.stdout.write(f"Results written to {o['out']}")
+
+    async def login(self, client, identifier, password):
+        while True:
+            status, body = await client.request(
+                "POST", "/api/auth/login/",
+                {"identifier": identifier, "password": password},
+            )
+            if status != 429:
+                break
+            # Login is rate limited per IP; wait as long as the server asks
+            wait = float(client.headers.get("retry-after", 1))
+            self.stdout.write(f"Login rate limited, retrying in {wait:g}s")
+            await asyncio.sleep(wait)
+
+        if status != 200:
+            raise CommandError(f"Login failed for {identifier}: {status}")
+        return json.loads(body)["access"]
+
+    async def run(self, accounts, tokens, mix, o):
+        rng = random.Random(o["seed"])
+
+        clients = []
+        for identifier, password in accounts:
+            client = HttpClient(o["url"], o["timeout"])
+            clients.append((client, await self.login(client, identifier, password)))
+        clients += [(HttpClient(o["url"], o["timeout"]), token) for token in tokens]
+
+        users = []
+        for client, token in clients:
+            user = VirtualUser(client, token, random.Random(rng.random()))
+            await user.discover()
+            if user.groups:
+                users.append(user)
+            else:
+                await client.close()
+
+        if not users:
+            raise CommandError("None of the accounts belong to a group")
+
+        routes, weights = zip(*mix.items())
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        deadline = time.monotonic() + o["duration"]
+
+        async def worker(index):
+            user = users[index % len(users)]
+            # Each worker owns a connection; users may be shared
+            client = HttpClient(o["url"], o["timeout"])
+            worker_rng = random.Random(o["seed"] * 1000 + index)
+
+            while time.monotonic() < deadline:
+                route = worker_rng.choices(routes, weights)[0]
+                route, method, path, body = user.next_request(route)
+                started = time.perf_counter()
+                try:
+                    status, _ = await client.request(method, path, body, user.token)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    errors[route] += 1
+                    await client.close()
+                    continue
+                latencies[route].append(time.perf_counter() - started)
+                if status >= 400:
+                    errors[route] += 1
+
+            await client.close()
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(o["concurrency"])))
+        elapsed = time.monotonic() - started
+
+        for user in users:
+            await user.client.close()
+
+        return summarize(latencies, errors, elapsed)
+
+    def report(self, result, compare_path):
+        previous = {}
+        if compare_path:
+            with open(compare_path) as fh:
+                previous = json.load(fh).get("routes", {})
+
+        self.stdout.write(
+            f"{'route':<16}{'reqs':>8}{'err':>6}{'rps':>9}"
+            f"{'p50':>9}{'p95':>9}{'p99':>9}"
+            + ("   p95 vs prev" if previous else "")
+        )
+        for route, r in result["routes"].items():
+            line = (
+                f"{route:<16}{r['requests']:>8}{r['errors']:>6}{r['rps']:>9.1f}"
+                f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+            )
+            old = previous.get(route)
+            if old and old.get("p95_ms"):
+                change = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+                line += f"   {change:+.1f}%"
+            self.stdout.write(line)
+
+        self.stdout.write(
+            f"Total {result['requests']} requests, {result['errors']} errors, "
+            f"{result['rps']:.1f} req/s over {result['elapsed_s']}s"
+        )
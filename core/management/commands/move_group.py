@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+
+
+class Command(BaseCommand):
+    help = (
+        "Move one group's rows to another shard while the app keeps running; "
+        "writes to that group get 503 until the copy is switched over"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("group_id", type=int)
+        parser.add_argument(
+            "target",
+            help="Database alias to move to (one of DATABASE_SHARDS)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows copied per transaction (default 1000)",
+        )
+        parser.add_argument(
+            "--drain",
+            type=float,
+            help="Seconds to wait for cached shard lookups to expire "
+                 "(default SHARDING['CACHE_SECONDS'])",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        if not sharding.is_sharded():
+            raise CommandError("Only one database is configured (DATABASE_SHARD_URLS)")
+
+        started = time.monotonic()
+        try:
+            copied = sharding.move_group(
+                options["group_id"],
+                options["target"],
+                batch_size=options["batch_size"],
+                drain=options["drain"],
+                log=self.stdout.write,
+            )
+        except sharding.ShardError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Moved {sum(copied.values())} rows of group {options['group_id']} "
+            f"to {options['target']} in {time.monotonic() - started:.2f}s"
+        )
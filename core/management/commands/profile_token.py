@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.middleware import make_profile_token, profile_settings
+
+
+class Command(BaseCommand):
+    help = "Print a signed X-Profile-Token for profiling requests"
+
+    def handle(self, *args, **kwargs):
+        max_age = profile_settings()["TOKEN_MAX_AGE"]
+        self.stdout.write(make_profile_token())
+        self.stderr.write(f"Valid for {max_age} seconds")
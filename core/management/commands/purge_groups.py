@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import janitor
+
+
+class Command(BaseCommand):
+    help = "Delete the rows of soft-deleted groups in small batches (resumable)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows deleted per transaction (default 1000)",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches",
+        )
+        parser.add_argument(
+            "--max-seconds",
+            type=float,
+            help="Stop after this long; the next run resumes",
+        )
+        parser.add_argument(
+            "--group",
+            type=int,
+            action="append",
+            dest="groups",
+            help="Only purge this group id (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        started = time.monotonic()
+        results = janitor.purge_groups(
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            max_seconds=options["max_seconds"],
+            group_ids=options["groups"],
+        )
+
+        for record, done in results:
+            rows = sum(record.deleted.values())
+            state = "done" if done else f"paused at {record.step}"
+            self.stdout.write(
+                f"Group {record.group_id} ({record.group_name}): {rows} rows, {state}"
+            )
+        self.stdout.write(f"Done in {time.monotonic() - started:.2f}s")
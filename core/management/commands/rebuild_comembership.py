@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.people import rebuild_comembership
+
+
+class Command(BaseCommand):
+    help = "Recompute shared-group counts used to rank user suggestions"
+
+    def handle(self, *args, **kwargs):
+        rows = rebuild_comembership()
+        self.stdout.write(f"Rebuilt {rows} co-membership rows")
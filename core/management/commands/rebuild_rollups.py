@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core.rollups import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Rebuild monthly spending rollups from the raw ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--group",
+            type=int,
+            action="append",
+            dest="groups",
+            help="Only rebuild this group id (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_all(options["groups"])
+
+        self.stdout.write(
+            f"Rebuilt {sum(rebuilt.values())} rollup rows "
+            f"for {len(rebuilt)} groups"
+        )
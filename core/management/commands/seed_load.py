@@ -0,0 +1,302 @@
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import (
+    Expense,
+    ExpenseSplit,
+    Group,
+    GroupInvite,
+    GroupMember,
+    Settlement,
+    UserProfile,
+    WalletContribution,
+    WalletExpense,
+)
+from core.splits import compute_split_paise, from_paise
+
+
+GROUP_TYPES = [code for code, _ in Group.GROUP_TYPES]
+TITLES = [
+    "Dinner", "Lunch", "Groceries", "Cab", "Rent", "Electricity", "Movie",
+    "Snacks", "Fuel", "Hotel", "Train tickets", "Coffee", "Internet", "Party",
+]
+
+TIMESTAMPED = [
+    (Expense, "created_at"),
+    (Settlement, "created_at"),
+    (WalletContribution, "created_at"),
+    (WalletExpense, "created_at"),
+]
+
+
+@contextmanager
+def explicit_timestamps():
+    """
+    Let bulk_create keep the created_at values we generate instead of
+    stamping every row with "now".
+    """
+    fields = [model._meta.get_field(name) for model, name in TIMESTAMPED]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def draw(rng, dist, low, high):
+    """
+    ``uniform``: every size in [low, high] equally likely.
+    ``pareto``: mostly small, with a long tail up to ``high``.
+    """
+    if dist == "pareto":
+        return min(high, low + int(rng.paretovariate(1.2)) - 1)
+    return rng.randint(low, high)
+
+
+class Buffer:
+    """Collects unsaved rows and flushes them with bulk_create."""
+
+    def __init__(self, model, batch_size, stats):
+        self.model = model
+        self.batch_size = batch_size
+        self.stats = stats
+        self.rows = []
+
+    def add(self, obj):
+        self.rows.append(obj)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.model.objects.bulk_create(self.rows, batch_size=self.batch_size)
+            self.stats[self.model.__name__] += len(self.rows)
+            self.rows = []
+
+
+class Command(BaseCommand):
+    help = "Generate deterministic synthetic users, groups and ledgers for load tests"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--groups", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--prefix", default="load", help="Username prefix")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--days", type=int, default=365, help="History length")
+
+        for name, low, high in (("members", 2, 50), ("expenses", 5, 2000)):
+            parser.add_argument(
+                f"--{name}-dist",
+                choices=["uniform", "pareto"],
+                default="pareto",
+                help=f"Distribution of {name} per group",
+            )
+            parser.add_argument(f"--{name}-min", type=int, default=low)
+            parser.add_argument(f"--{name}-max", type=int, default=high)
+
+        parser.add_argument(
+            "--settlements",
+            type=int,
+            default=5,
+            help="Max PAID settlements per group",
+        )
+        parser.add_argument(
+            "--wallet-ratio",
+            type=float,
+            default=0.3,
+            help="Share of wallet-enabled groups",
+        )
+        parser.add_argument(
+            "--skip-derived",
+            action="store_true",
+            help="Don't rebuild rollups and co-membership counts afterwards",
+        )
+
+    def handle(self, *args, **o):
+        if o["users"] < o["members_min"]:
+            raise CommandError("--users must be at least --members-min")
+        if o["members_min"] < 1 or o["members_min"] > o["members_max"]:
+            raise CommandError("invalid --members-min/--members-max")
+        if o["expenses_min"] < 0 or o["expenses_min"] > o["expenses_max"]:
+            raise CommandError("invalid --expenses-min/--expenses-max")
+
+        prefix = f"{o['prefix']}{o['seed']}_"
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f"Users with prefix {prefix!r} already exist; use another --seed or --prefix"
+            )
+
+        rng = random.Random(o["seed"])
+        stats = {name: 0 for name in (
+            "User", "UserProfile", "Group", "GroupMember", "Expense",
+            "ExpenseSplit", "Settlement", "WalletContribution",
+            "WalletExpense", "GroupInvite",
+        )}
+        started = time.monotonic()
+
+        with transaction.atomic(), explicit_timestamps():
+            user_ids = self.seed_users(rng, prefix, o, stats)
+            self.seed_groups(rng, prefix, user_ids, o, stats)
+
+        for name, count in stats.items():
+            self.stdout.write(f"{name:<20} {count:>12,}")
+        self.stdout.write(f"Seeded in {time.monotonic() - started:.1f}s")
+
+        if not o["skip_derived"]:
+            call_command("rebuild_rollups", stdout=self.stdout)
+            call_command("rebuild_comembership", stdout=self.stdout)
+
+    # ------------------------------------------------------------
+    def seed_users(self, rng, prefix, o, stats):
+        # Hash once; PBKDF2 per user would dominate the run time
+        password = make_password("password")
+        phone_base = self.next_phone(o["users"])
+
+        user_ids = []
+        for start in range(0, o["users"], o["batch_size"]):
+            stop = min(start + o["batch_size"], o["users"])
+            users = User.objects.bulk_create([
+                User(
+                    username=f"{prefix}{i}",
+                    email=f"{prefix}{i}@example.com",
+                    password=password,
+                )
+                for i in range(start, stop)
+            ])
+            UserProfile.objects.bulk_create([
+                UserProfile(user=u, phone=str(phone_base + i))
+                for i, u in zip(range(start, stop), users)
+            ])
+            user_ids += [u.id for u in users]
+            stats["User"] += len(users)
+            stats["UserProfile"] += len(users)
+
+        return user_ids
+
+    def next_phone(self, count):
+        # Seeded phones are 6xxxxxxxxx; carry on after the highest one so
+        # runs with other seeds or prefixes never collide
+        last = (
+            UserProfile.objects.filter(phone__regex=r"^6[0-9]{9}$")
+            .order_by("-phone")
+            .values_list("phone", flat=True)
+            .first()
+        )
+        base = int(last) + 1 if last else 6_000_000_000
+        if base + count > 7_000_000_000:
+            raise CommandError("No seed phone numbers left in the 6xxxxxxxxx range")
+        return base
+
+    def seed_groups(self, rng, prefix, user_ids, o, stats):
+        now = timezone.now()
+        history = timedelta(days=o["days"]).total_seconds()
+        batch = o["batch_size"]
+
+        members_buf = Buffer(GroupMember, batch, stats)
+        splits_buf = Buffer(ExpenseSplit, batch, stats)
+        settlements_buf = Buffer(Settlement, batch, stats)
+        contributions_buf = Buffer(WalletContribution, batch, stats)
+        wallet_buf = Buffer(WalletExpense, batch, stats)
+        invites_buf = Buffer(GroupInvite, batch, stats)
+
+        # Plan every group up front so they can be inserted in bulk
+        plans = []
+        for g in range(o["groups"]):
+            size = draw(rng, o["members_dist"], o["members_min"], o["members_max"])
+            members = sorted(rng.sample(user_ids, min(size, len(user_ids))))
+            plans.append((
+                Group(
+                    name=f"{prefix}group{g}",
+                    group_type=rng.choice(GROUP_TYPES),
+                    created_by_id=members[0],
+                    wallet_enabled=rng.random() < o["wallet_ratio"],
+                ),
+                members,
+            ))
+
+        for start in range(0, len(plans), batch):
+            Group.objects.bulk_create([group for group, _ in plans[start:start + batch]])
+        stats["Group"] += len(plans)
+
+        for group, members in plans:
+            for user_id in members:
+                members_buf.add(GroupMember(group=group, user_id=user_id))
+
+            # Expenses need their ids before splits can point at them
+            count = draw(rng, o["expenses_dist"], o["expenses_min"], o["expenses_max"])
+            for start in range(0, count, batch):
+                expenses = []
+                for _ in range(min(batch, count - start)):
+                    expenses.append(Expense(
+                        group=group,
+                        paid_by_id=rng.choice(members),
+                        title=rng.choice(TITLES),
+                        amount=from_paise(rng.randint(100, 500_000)),
+                        split_type="EQUAL",
+                        created_at=now - timedelta(seconds=rng.random() * history),
+                    ))
+                Expense.objects.bulk_create(expenses, batch_size=batch)
+                stats["Expense"] += len(expenses)
+
+                for expense in expenses:
+                    total = int(expense.amount * 100)
+                    for user_id, share in compute_split_paise(total, "EQUAL", members):
+                        splits_buf.add(ExpenseSplit(
+                            expense_id=expense.id,
+                            user_id=user_id,
+                            share_amount=from_paise(share),
+                        ))
+
+            for _ in range(rng.randint(0, o["settlements"]) if len(members) > 1 else 0):
+                payer, payee = rng.sample(members, 2)
+                settlements_buf.add(Settlement(
+                    group=group,
+                    from_user_id=payer,
+                    to_user_id=payee,
+                    amount=from_paise(rng.randint(100, 100_000)),
+                    status="PAID",
+                    created_at=now - timedelta(seconds=rng.random() * history),
+                ))
+
+            if group.wallet_enabled:
+                for _ in range(rng.randint(1, 10)):
+                    contributions_buf.add(WalletContribution(
+                        group=group,
+                        user_id=rng.choice(members),
+                        amount=from_paise(rng.randint(10_000, 500_000)),
+                        created_at=now - timedelta(seconds=rng.random() * history),
+                    ))
+                for _ in range(rng.randint(1, 20)):
+                    wallet_buf.add(WalletExpense(
+                        group=group,
+                        added_by_id=rng.choice(members),
+                        amount=from_paise(rng.randint(100, 50_000)),
+                        title=rng.choice(TITLES),
+                        created_at=now - timedelta(seconds=rng.random() * history),
+                    ))
+
+            invites_buf.add(GroupInvite(
+                group=group,
+                token=uuid.uuid5(uuid.NAMESPACE_URL, f"splitbills-seed:{group.name}"),
+                created_by_id=members[0],
+                expires_at=now + timedelta(days=rng.randint(-14, 7)),
+            ))
+
+        for buf in (
+            members_buf, splits_buf, settlements_buf,
+            contributions_buf, wallet_buf, invites_buf,
+        ):
+            buf.flush()
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from core import sharding
+from core.models import Group
+from core.services import take_balance_snapshot
+
+
+class Command(BaseCommand):
+    help = "Write a balance snapshot for every group that changed since its last one"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--group",
+            type=int,
+            action="append",
+            dest="groups",
+            help="Only snapshot this group id (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        group_ids = options["groups"]
+        if group_ids is None:
+            group_ids = [
+                group_id
+                for _, ids in sharding.fan_out(lambda: list(
+                    Group.objects.filter(
+                        deleted_at__isnull=True
+                    ).values_list("id", flat=True)
+                ))
+                for group_id in ids
+            ]
+
+        written = skipped = 0
+
+        for group_id in sorted(set(group_ids)):
+            with sharding.for_group(group_id):
+                if sharding.owns(group_id) and take_balance_snapshot(group_id):
+                    written += 1
+                else:
+                    skipped += 1
+
+        self.stdout.write(f"Snapshots written: {written}, unchanged: {skipped}")
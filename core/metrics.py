@@ -0,0 +1,266 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    # Directory shared by every worker; empty keeps metrics in-process
+    "MULTIPROC_DIR": "",
+    # Seconds between flushes of this worker's file
+    "FLUSH_INTERVAL": 5,
+    # Bearer token required by /metrics; without one it only answers in DEBUG
+    "TOKEN": "",
+    # job_queue_depth runs a COUNT per job; scrapes reuse it this long
+    "QUEUE_DEPTH_SECONDS": 60,
+}
+
+QUEUE_DEPTHS_KEY = "metrics:queue_depths"
+
+PREFIX = "splitbills_"
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "http_requests_total": ("counter", "HTTP requests by route, method and status"),
+    "http_request_duration_seconds": ("histogram", "Request latency by route"),
+    "db_queries_total": ("counter", "Database queries issued, by route"),
+    "cache_requests_total": ("counter", "Cache reads by result (hit/miss)"),
+    "service_duration_seconds": ("histogram", "Time spent in core.services functions"),
+    "cache_hit_ratio": ("gauge", "Cache hits / reads since the workers started"),
+    "job_queue_depth": ("gauge", "Rows waiting for a background job"),
+}
+
+
+def metrics_settings():
+    return {**DEFAULTS, **getattr(settings, "METRICS", {})}
+
+
+# ============================================================
+# ✅ PER-PROCESS REGISTRY
+# ============================================================
+class Registry:
+    """
+    Counters and histograms for this process, keyed by
+    ``(name, ((label, value), ...))``. Histograms hold per-bucket counts
+    (not cumulative), the +Inf bucket last, then the sum.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.last_flush = time.monotonic()
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.counters[(name, labels)] += value
+
+    def observe(self, name, labels, value):
+        with self.lock:
+            series = self.histograms.get((name, labels))
+            if series is None:
+                series = self.histograms[(name, labels)] = [0] * (len(BUCKETS) + 2)
+            series[bisect_left(BUCKETS, value)] += 1
+            series[-1] += value
+
+    def dump(self):
+        with self.lock:
+            return {
+                "counters": [[n, l, v] for (n, l), v in self.counters.items()],
+                "histograms": [[n, l, s] for (n, l), s in self.histograms.items()],
+            }
+
+    def flush(self, directory):
+        """Atomically replace this worker's file in ``directory``."""
+        self.last_flush = time.monotonic()
+        path = os.path.join(directory, f"metrics_{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(self.dump(), fh)
+        os.replace(tmp, path)
+
+    def maybe_flush(self):
+        config = metrics_settings()
+        directory = config["MULTIPROC_DIR"]
+        if directory and time.monotonic() - self.last_flush >= config["FLUSH_INTERVAL"]:
+            self.flush(directory)
+
+
+registry = Registry()
+
+
+@atexit.register
+def _flush_on_exit():
+    directory = metrics_settings()["MULTIPROC_DIR"]
+    if directory:
+        registry.flush(directory)
+
+
+# ============================================================
+# ✅ RECORDING
+# ============================================================
+def observe_request(route, method, status, duration, queries):
+    registry.inc(
+        "http_requests_total",
+        (("route", route), ("method", method), ("status", str(status))),
+    )
+    registry.observe("http_request_duration_seconds", (("route", route),), duration)
+    registry.inc("db_queries_total", (("route", route),), queries)
+    registry.maybe_flush()
+
+
+def record_cache(hits, misses):
+    if hits:
+        registry.inc("cache_requests_total", (("result", "hit"),), hits)
+    if misses:
+        registry.inc("cache_requests_total", (("result", "miss"),), misses)
+
+
+def timed(func):
+    """Record the wall time of every call to ``func``."""
+    labels = (("function", func.__name__),)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            registry.observe(
+                "service_duration_seconds", labels, time.perf_counter() - started
+            )
+
+    return wrapper
+
+
+# ============================================================
+# ✅ SCRAPE-TIME GAUGES
+# ============================================================
+def queue_depths():
+    """
+    Work waiting on the maintenance commands. There is no broker, so
+    the "queue" is the set of rows each job would pick up next. The
+    counts aren't all indexed, so every worker shares one result for
+    ``QUEUE_DEPTH_SECONDS`` instead of counting on each scrape.
+    """
+    from .janitor import TARGETS
+    from .models import GroupPurge
+
+    depths = cache.get(QUEUE_DEPTHS_KEY)
+    if depths is not None:
+        return depths
+
+    now = timezone.now()
+    depths = {
+        f"janitor_{name}": target(now).count()
+        for name, target in TARGETS.items()
+    }
+    depths["group_purge"] = GroupPurge.objects.filter(finished_at__isnull=True).count()
+    cache.set(
+        QUEUE_DEPTHS_KEY, depths, timeout=metrics_settings()["QUEUE_DEPTH_SECONDS"]
+    )
+    return depths
+
+
+# ============================================================
+# ✅ EXPOSITION
+# ============================================================
+def collect():
+    """
+    Merge every worker's file (or just this process without a
+    multiprocess directory) into one set of series.
+    """
+    directory = metrics_settings()["MULTIPROC_DIR"]
+    if not directory:
+        dumps = [registry.dump()]
+    else:
+        os.makedirs(directory, exist_ok=True)
+        registry.flush(directory)
+        dumps = []
+        for name in os.listdir(directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as fh:
+                    dumps.append(json.load(fh))
+            except (OSError, ValueError):
+                # Worker mid-replace or gone; its next flush will catch up
+                continue
+
+    counters = defaultdict(float)
+    histograms = {}
+    for dump in dumps:
+        for name, labels, value in dump["counters"]:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, series in dump["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], series)]
+            else:
+                histograms[key] = list(series)
+
+    return counters, histograms
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (
+        str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for _, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render():
+    counters, histograms = collect()
+    by_name = defaultdict(list)
+
+    for (name, labels), value in sorted(counters.items()):
+        by_name[name].append(f"{PREFIX}{name}{_labels(labels)} {_number(value)}")
+
+    for (name, labels), series in sorted(histograms.items()):
+        lines = by_name[name]
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), series[:-1]):
+            cumulative += count
+            le = bound if bound == "+Inf" else _number(bound)
+            lines.append(
+                f"{PREFIX}{name}_bucket{_labels(labels, [('le', le)])} {cumulative}"
+            )
+        lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {_number(series[-1])}")
+        lines.append(f"{PREFIX}{name}_count{_labels(labels)} {cumulative}")
+
+    hits = counters.get(("cache_requests_total", (("result", "hit"),)), 0)
+    misses = counters.get(("cache_requests_total", (("result", "miss"),)), 0)
+    by_name["cache_hit_ratio"].append(
+        f"{PREFIX}cache_hit_ratio {_number(hits / (hits + misses)) if hits + misses else 0}"
+    )
+
+    for job, depth in sorted(queue_depths().items()):
+        by_name["job_queue_depth"].append(
+            f"{PREFIX}job_queue_depth{_labels([('job', job)])} {depth}"
+        )
+
+    out = []
+    for name, lines in by_name.items():
+        kind, help_text = HELP[name]
+        out.append(f"# HELP {PREFIX}{name} {help_text}")
+        out.append(f"# TYPE {PREFIX}{name} {kind}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
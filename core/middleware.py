@@ -0,0 +1,568 @@
+import cProfile
+import io
+import json
+import logging
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.http import JsonResponse
+
+from . import idempotency, metrics, routers, sharding
+from .models import Expense, Group, GroupInvite
+
+
+logger = logging.getLogger("core.sql")
+profile_logger = logging.getLogger("core.profile")
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SLOW_REQUEST_MS": 500,
+    "SLOW_QUERY_MS": 100,
+    # Same statement this many times in one request => likely N+1
+    "N_PLUS_ONE_THRESHOLD": 10,
+}
+
+_IN_LIST_RE = re.compile(r"IN \((?:%s, )+%s\)")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def sql_settings():
+    return {**DEFAULTS, **getattr(settings, "SQL_INSTRUMENTATION", {})}
+
+
+def normalize_sql(sql):
+    """
+    Collapse placeholders lists and inline literals so equivalent
+    statements group together in logs.
+    """
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    return _LITERAL_RE.sub("?", sql)
+
+
+# ============================================================
+# ✅ PER-REQUEST QUERY RECORDER
+# ============================================================
+class QueryRecorder:
+    """
+    ``connection.execute_wrapper`` callback. Keeps only counters and
+    the slow statements, so the per-query cost is a clock read and a
+    dict increment.
+    """
+
+    def __init__(self, slow_query_ms):
+        self.slow_query_s = slow_query_ms / 1000
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            # ORM SQL keeps params separate, so the text is already a template
+            self.statements[sql] += 1
+            if elapsed >= self.slow_query_s:
+                self.slow.append((elapsed, sql))
+
+
+# ============================================================
+# ✅ MIDDLEWARE
+# ============================================================
+class QueryInstrumentationMiddleware:
+    """
+    Adds ``Server-Timing: db, serialize, total`` to every response and
+    logs slow requests, slow queries and repeated statements (N+1).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = sql_settings()
+        if not config["ENABLED"]:
+            return self.get_response(request)
+
+        recorder = QueryRecorder(config["SLOW_QUERY_MS"])
+        request._render_timing = [0.0, 0.0]
+        started = time.perf_counter()
+
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        total = time.perf_counter() - started
+        render_start, render_end = request._render_timing
+        serialize = max(0.0, render_end - render_start)
+
+        response["Server-Timing"] = ", ".join([
+            f"db;dur={recorder.duration * 1000:.1f};desc=\"{recorder.count} queries\"",
+            f"serialize;dur={serialize * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ])
+
+        self.log(request, response, recorder, total, config)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses render right after this hook; time that render
+        timing = getattr(request, "_render_timing", None)
+        if timing is not None:
+            timing[0] = time.perf_counter()
+
+            def rendered(response):
+                timing[1] = time.perf_counter()
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def log(self, request, response, recorder, total, config):
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name or match._func_path) if match else "-"
+        where = f"{request.method} {request.path} view={view}"
+
+        if total * 1000 >= config["SLOW_REQUEST_MS"]:
+            logger.warning(
+                "Slow request %s: %.1fms total, %d queries, %.1fms db, status %s",
+                where, total * 1000, recorder.count,
+                recorder.duration * 1000, response.status_code,
+            )
+
+        for elapsed, sql in recorder.slow:
+            logger.warning(
+                "Slow query %.1fms in %s: %s",
+                elapsed * 1000, where, normalize_sql(sql),
+            )
+
+        for sql, count in recorder.statements.items():
+            if count >= config["N_PLUS_ONE_THRESHOLD"]:
+                logger.warning(
+                    "Possible N+1 in %s: %d x %s",
+                    where, count, normalize_sql(sql),
+                )
+
+
+def authenticated_user(request):
+    """
+    Session user, else the user of a valid Bearer token. DRF only
+    authenticates inside the view, so middleware has to do it itself.
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user
+
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+# ============================================================
+# ✅ PROMETHEUS REQUEST METRICS
+# ============================================================
+def route_name(request):
+    """
+    URL name from core/urls.py or backend/urls.py (router names like
+    ``groups-detail``), falling back to the pattern. Never the raw path,
+    so label cardinality stays bounded.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.view_name or match.route or "unnamed"
+
+
+class MetricsMiddleware:
+    """Feeds request counts, latency and query counts to core.metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics.metrics_settings()["ENABLED"]:
+            return self.get_response(request)
+
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(count))
+            response = self.get_response(request)
+
+        metrics.observe_request(
+            route_name(request),
+            request.method,
+            response.status_code,
+            time.perf_counter() - started,
+            queries[0],
+        )
+        return response
+
+
+# ============================================================
+# ✅ ON-DEMAND PROFILER (STAFF / SIGNED TOKEN ONLY)
+# ============================================================
+PROFILE_DEFAULTS = {
+    "ENABLED": True,
+    "DIR": "profiles",
+    "TOP_N": 40,
+    # Across all workers when the cache is shared
+    "MAX_PER_MINUTE": 6,
+    # Oldest .prof/.txt pairs beyond this are removed
+    "KEEP": 200,
+    "TOKEN_MAX_AGE": 3600,
+}
+
+PROFILE_TOKEN_SALT = "core.profile"
+
+# X-Profile / ?profile values that turn profiling on; "0", "false" etc. don't
+PROFILE_MODES = {"1": "cpu", "true": "cpu", "yes": "cpu", "mem": "mem"}
+
+_profile_lock = threading.Lock()
+_SLUG_RE = re.compile(r"[^A-Za-z0-9]+")
+
+
+def profile_settings():
+    return {**PROFILE_DEFAULTS, **getattr(settings, "PROFILING", {})}
+
+
+def make_profile_token():
+    return signing.TimestampSigner(salt=PROFILE_TOKEN_SALT).sign("profile")
+
+
+class ProfilingMiddleware:
+    """
+    Runs a request under cProfile when asked with ``X-Profile: 1`` (or
+    ``true``, or ``?profile=1``); ``mem`` instead of ``1`` also records the top
+    tracemalloc allocations. Only honoured for staff JWTs or a valid
+    ``X-Profile-Token``; anyone else gets a normal, unprofiled response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        asked = request.headers.get("X-Profile") or request.GET.get("profile") or ""
+        mode = PROFILE_MODES.get(asked.strip().lower())
+        if not mode:
+            return self.get_response(request)
+
+        config = profile_settings()
+        if not config["ENABLED"] or not self.allowed(request, config):
+            return self.get_response(request)
+
+        # One profile at a time per process, and a global budget per minute
+        if not _profile_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            from .ratelimit import hit
+
+            if not hit("profile:global", config["MAX_PER_MINUTE"], 60)[0]:
+                return self.get_response(request)
+
+            return self.profile(request, mode == "mem", config)
+        finally:
+            _profile_lock.release()
+
+    def allowed(self, request, config):
+        token = request.headers.get("X-Profile-Token")
+        if token:
+            try:
+                signing.TimestampSigner(salt=PROFILE_TOKEN_SALT).unsign(
+                    token, max_age=config["TOKEN_MAX_AGE"]
+                )
+                return True
+            except signing.BadSignature:
+                return False
+
+        user = authenticated_user(request)
+        return bool(user and user.is_staff)
+
+    def profile(self, request, with_memory, config):
+        if with_memory:
+            tracemalloc.start()
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            snapshot = tracemalloc.take_snapshot() if with_memory else None
+            if with_memory:
+                tracemalloc.stop()
+
+        name = self.save(request, profiler, snapshot, elapsed, config)
+        response["X-Profile-Id"] = name
+        profile_logger.info(
+            "Profiled %s %s in %.1fms -> %s",
+            request.method, request.path, elapsed * 1000, name,
+        )
+        return response
+
+    def save(self, request, profiler, snapshot, elapsed, config):
+        directory = Path(config["DIR"])
+        if not directory.is_absolute():
+            directory = Path(settings.BASE_DIR) / directory
+        directory.mkdir(parents=True, exist_ok=True)
+
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        slug = _SLUG_RE.sub("-", request.path).strip("-")[:60] or "root"
+        name = f"{stamp}-{request.method.lower()}-{slug}"
+
+        profiler.dump_stats(directory / f"{name}.prof")
+
+        summary = io.StringIO()
+        summary.write(f"{request.method} {request.get_full_path()}\n")
+        summary.write(f"wall time: {elapsed * 1000:.1f}ms\n\n")
+        stats = pstats.Stats(profiler, stream=summary)
+        stats.sort_stats("cumulative").print_stats(config["TOP_N"])
+
+        if snapshot is not None:
+            summary.write("\nTop allocations:\n")
+            for stat in snapshot.statistics("lineno")[:config["TOP_N"]]:
+                summary.write(f"{stat}\n")
+
+        (directory / f"{name}.txt").write_text(summary.getvalue())
+
+        self.prune(directory, config["KEEP"])
+        return name
+
+    def prune(self, directory, keep):
+        profiles = sorted(directory.glob("*.prof"))
+        for old in profiles[:max(0, len(profiles) - keep)]:
+            old.unlink(missing_ok=True)
+            old.with_suffix(".txt").unlink(missing_ok=True)
+
+
+# ============================================================
+# ✅ IDEMPOTENCY-KEY (SAFE CLIENT RETRIES)
+# ============================================================
+class IdempotencyMiddleware:
+    """
+    For authenticated POST/PUT/PATCH/DELETE requests carrying an
+    ``Idempotency-Key`` header, runs the view at most once per user and
+    key and replays its response to every retry. See core/idempotency.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = request.headers.get("Idempotency-Key")
+        if not key or request.method not in idempotency.MUTATING:
+            return self.get_response(request)
+
+        config = idempotency.idempotency_settings()
+        if not config["ENABLED"]:
+            return self.get_response(request)
+
+        if len(key) > idempotency.MAX_KEY_LENGTH:
+            return JsonResponse(
+                {"detail": f"Idempotency-Key must be at most {idempotency.MAX_KEY_LENGTH} characters."},
+                status=400,
+            )
+
+        user = authenticated_user(request)
+        if user is None:
+            # The view will reject it; nothing to deduplicate
+            return self.get_response(request)
+
+        row, response = idempotency.begin(user, key, request, config)
+        if response is not None:
+            return response
+
+        response = self.get_response(request)
+        idempotency.finish(row, response)
+        return response
+
+
+# ============================================================
+# ✅ READ REPLICAS (SAFE METHODS, READ-YOUR-WRITES)
+# ============================================================
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def request_user_id(request):
+    """
+    User id from the Bearer token's claims (no database read), else the
+    session user. ``None`` for anonymous requests.
+    """
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+    from rest_framework_simplejwt.settings import api_settings
+
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw = auth.get_raw_token(header) if header else None
+    if raw is not None:
+        try:
+            return auth.get_validated_token(raw).get(api_settings.USER_ID_CLAIM)
+        except (InvalidToken, TokenError):
+            return None
+
+    user = getattr(request, "user", None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Safe-method requests read from one replica for the whole request,
+    unless the same user wrote within REPLICA_PIN_SECONDS; other methods
+    use the primary and start that pin. No-op without DATABASE_REPLICAS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not routers.replica_aliases():
+            return self.get_response(request)
+
+        user_id = request_user_id(request)
+
+        if request.method in SAFE_METHODS:
+            if routers.is_pinned(user_id):
+                return self.get_response(request)
+            with routers.read_from_replica():
+                return self.get_response(request)
+
+        if user_id is None:
+            return self.get_response(request)
+
+        # Before the write, so a read racing its response sees the primary,
+        # and again after, so the window starts once the write is committed
+        routers.pin(user_id)
+        response = self.get_response(request)
+        routers.pin(user_id)
+        return response
+
+
+# ============================================================
+# ✅ GROUP SHARDS (ROUTE EACH REQUEST TO ITS GROUP'S DATABASE)
+# ============================================================
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _view_model(view_func):
+    cls = getattr(view_func, "cls", None)
+    queryset = getattr(cls, "queryset", None)
+    if queryset is not None:
+        return queryset.model
+    meta = getattr(getattr(cls, "serializer_class", None), "Meta", None)
+    return getattr(meta, "model", None)
+
+
+def _request_fields(request):
+    """Query string, plus a JSON or form body, without consuming it for DRF."""
+    fields = request.GET.dict()
+    if request.method not in SAFE_METHODS:
+        if request.content_type == "application/json":
+            try:
+                body = json.loads(request.body or b"{}")
+            except ValueError:
+                body = None
+            if isinstance(body, dict):
+                fields.update(body)
+        else:
+            fields.update(request.POST.dict())
+    return fields
+
+
+def request_group_id(request, view_func, view_kwargs):
+    """The group a request is about, or ``None`` for cross-group views."""
+    if "group_id" in view_kwargs:
+        return _as_id(view_kwargs["group_id"])
+    if "token" in view_kwargs:
+        return sharding.locate(GroupInvite, token=view_kwargs["token"])
+
+    model = _view_model(view_func)
+    if model is None or not sharding.is_sharded_model(model):
+        return None
+
+    pk = view_kwargs.get("pk")
+    if pk is not None:
+        if model is Group:
+            return _as_id(pk)
+        pk = _as_id(pk)
+        return sharding.locate(model, pk=pk) if pk is not None else None
+
+    fields = _request_fields(request)
+    if _as_id(fields.get("group")) is not None:
+        return _as_id(fields["group"])
+    if _as_id(fields.get("expense")) is not None:
+        return sharding.locate(Expense, pk=_as_id(fields["expense"]))
+    return None
+
+
+def route_view(request, view_func, view_kwargs):
+    """
+    Route the rest of the request to its group's shard. Returns a 503
+    response for writes to a group that is being moved, else ``None``.
+    """
+    group_id = request_group_id(request, view_func, view_kwargs)
+    if group_id is None:
+        return None
+
+    if request.method not in SAFE_METHODS and sharding.is_moving(group_id):
+        response = JsonResponse(
+            {"detail": "This group is being moved; try again shortly."},
+            status=503,
+        )
+        response["Retry-After"] = "5"
+        return response
+
+    sharding.route(sharding.shard_for_group(group_id))
+    return None
+
+
+class ShardRoutingMiddleware:
+    """
+    Per-group queries of a request go to the shard of the group named
+    by its URL, query string or body; cross-group views fan out
+    themselves (sharding.fan_out). No-op with a single database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not sharding.is_sharded():
+            return self.get_response(request)
+        with sharding.use_shard(None):
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not sharding.is_sharded():
+            return None
+        return route_view(request, view_func, view_kwargs)
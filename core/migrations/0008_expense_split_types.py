@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-19 15:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_group_group_image'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='expense',
+            name='split_type',
+            field=models.CharField(choices=[('EQUAL', 'Equal'), ('EXACT', 'Exact'), ('PERCENT', 'Percent'), ('SHARES', 'Shares'), ('CUSTOM', 'Custom')], default='EQUAL', max_length=20),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.11 on 2026-10-19 15:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0008_expense_split_types'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('share', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('wallet_spent', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('expense_count', models.IntegerField(default=0)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_rollups', to='core.group')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['group', 'month'], name='core_spendi_group_i_22ba84_idx'), models.Index(fields=['user', 'month'], name='core_spendi_user_id_395ec9_idx')],
+                'unique_together': {('group', 'user', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,91 @@
+from django.db import migrations
+
+
+# -------------------------------------------------------------
+# Postgres: trigram GIN indexes on the searchable titles
+# -------------------------------------------------------------
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS core_expense_title_trgm "
+    "ON core_expense USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS core_walletexpense_title_trgm "
+    "ON core_walletexpense USING gin (title gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS core_expense_title_trgm",
+    "DROP INDEX IF EXISTS core_walletexpense_title_trgm",
+]
+
+
+# -------------------------------------------------------------
+# SQLite: one FTS5 table for both kinds, synced by triggers.
+# rowid = id * 2 + kind (0 = expense, 1 = wallet expense) so the
+# triggers touch a single row by primary key.
+# -------------------------------------------------------------
+def _sqlite_triggers(kind, table):
+    return [
+        f"""
+        CREATE TRIGGER {table}_fts_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO core_search_fts (rowid, title, group_id)
+            VALUES (new.id * 2 + {kind}, new.title, new.group_id);
+        END
+        """,
+        f"""
+        CREATE TRIGGER {table}_fts_ad AFTER DELETE ON {table} BEGIN
+            DELETE FROM core_search_fts WHERE rowid = old.id * 2 + {kind};
+        END
+        """,
+        f"""
+        CREATE TRIGGER {table}_fts_au AFTER UPDATE OF title, group_id ON {table} BEGIN
+            DELETE FROM core_search_fts WHERE rowid = old.id * 2 + {kind};
+            INSERT INTO core_search_fts (rowid, title, group_id)
+            VALUES (new.id * 2 + {kind}, new.title, new.group_id);
+        END
+        """,
+        f"""
+        INSERT INTO core_search_fts (rowid, title, group_id)
+        SELECT id * 2 + {kind}, title, group_id FROM {table}
+        """,
+    ]
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE core_search_fts USING fts5(
+        title,
+        group_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    *_sqlite_triggers(0, "core_expense"),
+    *_sqlite_triggers(1, "core_walletexpense"),
+]
+
+SQLITE_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}"
+    for table in ("core_expense", "core_walletexpense")
+    for suffix in ("ai", "ad", "au")
+] + ["DROP TABLE IF EXISTS core_search_fts"]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_balancesnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"postgresql": POSTGRES_FORWARD, "sqlite": SQLITE_FORWARD}),
+            _run({"postgresql": POSTGRES_BACKWARD, "sqlite": SQLITE_BACKWARD}),
+        ),
+    ]
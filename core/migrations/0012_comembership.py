@@ -0,0 +1,66 @@
+# Generated by Django 4.2.11 on 2026-10-19 15:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Prefix lookups on auth_user.email (username already has a unique index)
+EMAIL_INDEX = {
+    "postgresql": (
+        "CREATE INDEX IF NOT EXISTS core_auth_user_email_prefix "
+        "ON auth_user (email varchar_pattern_ops)",
+        "DROP INDEX IF EXISTS core_auth_user_email_prefix",
+    ),
+    "sqlite": (
+        "CREATE INDEX IF NOT EXISTS core_auth_user_email_prefix "
+        "ON auth_user (email)",
+        "DROP INDEX IF EXISTS core_auth_user_email_prefix",
+    ),
+}
+
+BACKFILL = """
+    INSERT INTO core_comembership (user_id, other_id, shared_groups)
+    SELECT a.user_id, b.user_id, COUNT(*)
+    FROM core_groupmember a
+    JOIN core_groupmember b
+      ON a.group_id = b.group_id AND a.user_id <> b.user_id
+    GROUP BY a.user_id, b.user_id
+"""
+
+
+def add_email_index(apps, schema_editor):
+    sql = EMAIL_INDEX.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql[0])
+
+
+def drop_email_index(apps, schema_editor):
+    sql = EMAIL_INDEX.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql[1])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0011_expense_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shared_groups', models.IntegerField(default=0)),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comemberships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'other')},
+            },
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+        migrations.RunPython(add_email_index, drop_email_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-19 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_comembership'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='groupinvite',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='passwordresetotp',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.11 on 2026-10-19 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupShard',
+            fields=[
+                ('group_id', models.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('alias', models.CharField(db_index=True, max_length=50)),
+                ('moving_to', models.CharField(blank=True, max_length=50)),
+                ('moved_from', models.CharField(blank=True, max_length=50)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='grouppurge',
+            name='group_id',
+            field=models.PositiveBigIntegerField(unique=True),
+        ),
+    ]
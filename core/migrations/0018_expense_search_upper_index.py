@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+# -------------------------------------------------------------
+# Postgres: icontains compiles to UPPER(title::text) LIKE ..., which
+# the plain title trigram indexes from 0011 can't serve. Index the
+# same expression so search (and the admin) skip the sequential scan.
+# -------------------------------------------------------------
+POSTGRES_FORWARD = [
+    "CREATE INDEX IF NOT EXISTS core_expense_title_upper_trgm "
+    "ON core_expense USING gin ((UPPER(title::text)) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS core_walletexpense_title_upper_trgm "
+    "ON core_walletexpense USING gin ((UPPER(title::text)) gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS core_expense_title_upper_trgm",
+    "DROP INDEX IF EXISTS core_walletexpense_title_upper_trgm",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == "postgresql":
+            for sql in statements:
+                schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_group_shards'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(POSTGRES_FORWARD), _run(POSTGRES_BACKWARD)),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.11 on 2026-10-19 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_expense_search_upper_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['created_at'], name='core_expens_created_c79526_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupmember',
+            index=models.Index(fields=['joined_at'], name='core_groupm_joined__e71b2e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='settlement',
+            index=models.Index(fields=['created_at'], name='core_settle_created_53a711_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='walletcontribution',
+            index=models.Index(fields=['created_at'], name='core_wallet_created_5d69ee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='walletexpense',
+            index=models.Index(fields=['created_at'], name='core_wallet_created_99a4ed_idx'),
+        ),
+    ]
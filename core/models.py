@@ -65,6 +65,9 @@ class Group(models.Model):
 
     wallet_enabled = models.BooleanField(default=False)
 
+    # Soft delete: hidden at once, rows removed later by purge_groups
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
     def __str__(self):
         return self.name
 
@@ -87,6 +90,9 @@ class GroupMember(models.Model):
 
     class Meta:
         unique_together = ("group", "user")
+        indexes = [
+            models.Index(fields=["joined_at"]),
+        ]
 
     def __str__(self):
         return f"{self.user.username} in {self.group.name}"
@@ -110,6 +116,11 @@ class WalletContribution(models.Model):
     note = models.CharField(max_length=255, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"]),
+        ]
+
     def __str__(self):
         return f"{self.user.username} added ₹{self.amount} to {self.group.name}"
 
@@ -132,6 +143,11 @@ class WalletExpense(models.Model):
     title = models.CharField(max_length=120)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"]),
+        ]
+
     def __str__(self):
         return f"{self.group.name} spent ₹{self.amount} ({self.title})"
 
@@ -142,6 +158,9 @@ class WalletExpense(models.Model):
 class Expense(models.Model):
     SPLIT_TYPES = [
         ("EQUAL", "Equal"),
+        ("EXACT", "Exact"),
+        ("PERCENT", "Percent"),
+        ("SHARES", "Shares"),
         ("CUSTOM", "Custom"),
     ]
 
@@ -164,6 +183,12 @@ class Expense(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["group", "created_at"]),
+            models.Index(fields=["created_at"]),
+        ]
+
     def __str__(self):
         return f"{self.title} - ₹{self.amount}"
 
@@ -219,6 +244,12 @@ class Settlement(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["group", "created_at"]),
+            models.Index(fields=["created_at"]),
+        ]
+
     def __str__(self):
         return f"{self.from_user.username} -> {self.to_user.username} ₹{self.amount}"
 
@@ -232,12 +263,14 @@ class PasswordResetOTP(models.Model):
         on_delete=models.CASCADE,
         related_name="password_otps"
     )
+    VALID_FOR = timedelta(minutes=5)
+
     otp = models.CharField(max_length=6)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     is_used = models.BooleanField(default=False)
 
     def is_expired(self):
-        return timezone.now() > self.created_at + timedelta(minutes=5)
+        return timezone.now() > self.created_at + self.VALID_FOR
 
     def __str__(self):
         return f"OTP for {self.user.email}"
@@ -262,7 +295,7 @@ class GroupInvite(models.Model):
         on_delete=models.CASCADE
     )
     created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
     is_active = models.BooleanField(default=True)
 
     def save(self, *args, **kwargs):
@@ -275,3 +308,242 @@ class GroupInvite(models.Model):
 
     def __str__(self):
         return f"Invite to {self.group.name}"
+
+
+# =========================
+# 📈 MONTHLY SPENDING ROLLUP
+# =========================
+class SpendingRollup(models.Model):
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name="spending_rollups"
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="spending_rollups"
+    )
+    month = models.DateField()
+
+    paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    share = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    wallet_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    expense_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("group", "user", "month")
+        indexes = [
+            models.Index(fields=["group", "month"]),
+            models.Index(fields=["user", "month"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} in {self.group_id} for {self.month:%Y-%m}"
+
+
+# =========================
+# 📸 BALANCE SNAPSHOT
+# =========================
+class BalanceSnapshot(models.Model):
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name="balance_snapshots"
+    )
+    # Ledger rows with created_at <= taken_at are folded into balances
+    taken_at = models.DateTimeField()
+    balances = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["group", "taken_at"]),
+        ]
+
+    def __str__(self):
+        return f"Balances of {self.group_id} at {self.taken_at}"
+
+
+# =========================
+# 🤝 CO-MEMBERSHIP COUNT
+# =========================
+class CoMembership(models.Model):
+    """
+    How many groups ``user`` shares with ``other``. Stored in both
+    directions so suggestions for one user are a single index range.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="comemberships"
+    )
+    other = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    shared_groups = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "other")
+
+    def __str__(self):
+        return f"{self.user_id} shares {self.shared_groups} groups with {self.other_id}"
+
+
+# =========================
+# 🗑️ GROUP PURGE PROGRESS
+# =========================
+class GroupPurge(models.Model):
+    """
+    One row per soft-deleted group. ``step`` and ``deleted`` are saved
+    after every batch, so an interrupted purge resumes where it stopped.
+    Kept after the group row is gone as a record of what was removed.
+    """
+    group_id = models.PositiveBigIntegerField(unique=True)
+    group_name = models.CharField(max_length=100)
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="+"
+    )
+    step = models.CharField(max_length=30, blank=True)
+    deleted = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        state = "done" if self.finished_at else self.step or "pending"
+        return f"Purge of group {self.group_id} ({state})"
+
+
+# =========================
+# 🧊 COLD ARCHIVE
+# =========================
+class ArchivedExpense(models.Model):
+    """
+    Expense moved out of the hot table by ``archive_expenses``. Keeps
+    the original id so links and audit trails still resolve.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name="archived_expenses"
+    )
+    paid_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    title = models.CharField(max_length=120)
+    split_type = models.CharField(max_length=20)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["group", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - ₹{self.amount} (archived)"
+
+
+class ArchivedExpenseSplit(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    expense = models.ForeignKey(
+        ArchivedExpense,
+        on_delete=models.CASCADE,
+        related_name="splits"
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    share_amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.user_id} owed ₹{self.share_amount} (archived)"
+
+
+class CarriedBalance(models.Model):
+    """
+    Net effect (paid - owed) of a member's archived expenses, so live
+    balances stay exact. Every archived expense has created_at <= ``through``.
+    """
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name="carried_balances"
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    through = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("group", "user")
+
+    def __str__(self):
+        return f"{self.user_id} carries ₹{self.amount} in {self.group_id}"
+
+
+# =========================
+# 🔁 IDEMPOTENCY KEYS
+# =========================
+class IdempotencyKey(models.Model):
+    """
+    First response to a mutating request sent with an ``Idempotency-Key``
+    header. ``status_code`` stays null while the original is running;
+    retries with the same key replay the stored response until ``expires_at``.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    key = models.CharField(max_length=255)
+    # sha256 of method, path and body; a reused key must match it
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    headers = models.JSONField(default=dict)
+    body = models.BinaryField(default=b"")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ("user", "key")
+
+    def __str__(self):
+        state = self.status_code or "in progress"
+        return f"{self.user_id}:{self.key} ({state})"
+
+
+# =========================
+# 🧩 GROUP SHARD DIRECTORY
+# =========================
+class GroupShard(models.Model):
+    """
+    Which database holds a group's rows; lives on ``default`` only.
+    Groups without a row are on ``default``. While ``move_group`` runs,
+    ``moving_to`` names the target and writes to the group are refused;
+    ``moved_from`` is set until the old copy has been deleted.
+    """
+    group_id = models.PositiveBigIntegerField(primary_key=True)
+    alias = models.CharField(max_length=50, db_index=True)
+    moving_to = models.CharField(max_length=50, blank=True)
+    moved_from = models.CharField(max_length=50, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Group {self.group_id} on {self.alias}"
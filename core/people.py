@@ -0,0 +1,378 @@
+from django.contrib.auth.models import User
+from collections import Counter
+
+from django.db import connection, connections, transaction
+from django.db.models import F, Q
+
+from . import sharding
+from .models import CoMembership, GroupMember, UserProfile
+
+
+MAX_SUGGESTIONS = 20
+MAX_BULK_MEMBERS = 100
+
+
+# ============================================================
+# ✅ HELPERS
+# ============================================================
+def normalize_phone(raw):
+    """
+    Same normalisation ``register`` applies: digits only, last 10,
+    leading zeros dropped.
+    """
+    phone = "".join(filter(str.isdigit, raw or ""))
+
+    if len(phone) > 10:
+        phone = phone[-10:]
+
+    return phone.lstrip("0")
+
+
+def _prefix(field, value):
+    """
+    Index-backed prefix filter. Postgres uses LIKE 'x%' against the
+    pattern-ops indexes; elsewhere a [value, value + max) range keeps the
+    plain B-tree usable (SQLite's LIKE is case-insensitive and unindexed).
+    """
+    if connection.vendor == "postgresql":
+        return Q(**{f"{field}__startswith": value})
+
+    return Q(**{f"{field}__gte": value, f"{field}__lt": value + "\U0010ffff"})
+
+
+# ============================================================
+# ✅ CO-MEMBERSHIP COUNTS (CALLED WHEN MEMBERSHIP CHANGES)
+# ============================================================
+def _bump(user_id, other_ids, delta):
+    """
+    Add ``delta`` to (user, other) and (other, user) for every other.
+    """
+    other_ids = [o for o in other_ids if o != user_id]
+    if not other_ids:
+        return
+
+    if delta > 0:
+        CoMembership.objects.bulk_create(
+            [CoMembership(user_id=user_id, other_id=o) for o in other_ids]
+            + [CoMembership(user_id=o, other_id=user_id) for o in other_ids],
+            ignore_conflicts=True,
+        )
+
+    CoMembership.objects.filter(
+        Q(user_id=user_id, other_id__in=other_ids)
+        | Q(user_id__in=other_ids, other_id=user_id)
+    ).update(shared_groups=F("shared_groups") + delta)
+
+    if delta < 0:
+        CoMembership.objects.filter(
+            Q(user_id=user_id, other_id__in=other_ids)
+            | Q(user_id__in=other_ids, other_id=user_id),
+            shared_groups__lte=0,
+        ).delete()
+
+
+def member_joined(group_id, user_id):
+    """Call after ``user_id`` was added to ``group_id``."""
+    others = GroupMember.objects.filter(
+        group_id=group_id
+    ).values_list("user_id", flat=True)
+    _bump(user_id, list(others), 1)
+
+
+def members_joined(group_id, user_ids):
+    """
+    ``member_joined`` for many users at once: one read of the member
+    list, one insert of missing pairs and one update, whatever the count.
+    """
+    new = set(user_ids)
+    if not new:
+        return
+
+    members = set(
+        GroupMember.objects.filter(
+            group_id=group_id
+        ).values_list("user_id", flat=True)
+    )
+
+    CoMembership.objects.bulk_create(
+        [
+            CoMembership(user_id=u, other_id=o)
+            for u in new
+            for o in members
+            if o != u
+        ]
+        + [
+            CoMembership(user_id=o, other_id=u)
+            for u in new
+            for o in members - new
+        ],
+        ignore_conflicts=True,
+    )
+
+    CoMembership.objects.filter(
+        Q(user_id__in=new, other_id__in=members)
+        | Q(user_id__in=members - new, other_id__in=new)
+    ).update(shared_groups=F("shared_groups") + 1)
+
+
+def member_left(group_id, user_id):
+    """Call after ``user_id`` was removed from ``group_id``."""
+    others = GroupMember.objects.filter(
+        group_id=group_id
+    ).values_list("user_id", flat=True)
+    _bump(user_id, list(others), -1)
+
+
+def group_removed(group_id):
+    """Call before deleting a group: drops every pair it contributed."""
+    members = list(
+        GroupMember.objects.filter(
+            group_id=group_id
+        ).values_list("user_id", flat=True)
+    )
+    if len(members) < 2:
+        return
+
+    pairs = CoMembership.objects.filter(user_id__in=members, other_id__in=members)
+    pairs.update(shared_groups=F("shared_groups") - 1)
+    pairs.filter(shared_groups__lte=0).delete()
+
+
+_PAIRS_SQL = """
+    SELECT a.user_id, b.user_id, COUNT(*)
+    FROM core_groupmember a
+    JOIN core_groupmember b
+      ON a.group_id = b.group_id AND a.user_id <> b.user_id
+    JOIN core_group g
+      ON g.id = a.group_id AND g.deleted_at IS NULL
+    GROUP BY a.user_id, b.user_id
+"""
+
+
+def rebuild_comembership():
+    if sharding.is_sharded():
+        return _rebuild_comembership_sharded()
+
+    with transaction.atomic():
+        CoMembership.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO core_comembership (user_id, other_id, shared_groups)"
+                + _PAIRS_SQL
+            )
+    return CoMembership.objects.count()
+
+
+def _rebuild_comembership_sharded():
+    # Memberships are spread over the shards; count pairs on each and add up
+    shared = Counter()
+    for alias in sharding.shard_aliases():
+        with connections[alias].cursor() as cursor:
+            cursor.execute(_PAIRS_SQL)
+            for user_id, other_id, count in cursor.fetchall():
+                shared[(user_id, other_id)] += count
+
+    with transaction.atomic():
+        CoMembership.objects.all().delete()
+        CoMembership.objects.bulk_create(
+            [
+                CoMembership(user_id=user_id, other_id=other_id, shared_groups=count)
+                for (user_id, other_id), count in shared.items()
+            ],
+            batch_size=1000,
+        )
+    return len(shared)
+
+
+# ============================================================
+# ✅ USER SUGGESTIONS (AUTOCOMPLETE)
+# ============================================================
+def mask_email(email):
+    local, _, domain = (email or "").partition("@")
+    return f"{local[:1]}***@{domain}" if local and domain else None
+
+
+def mask_phone(phone):
+    return "*" * (len(phone) - 4) + phone[-4:] if phone and len(phone) > 4 else None
+
+
+def suggest_users(user_id, q, limit=10, exclude_group_id=None):
+    """
+    Prefix-match ``q`` against usernames. Emails and phones are
+    prefix-matched only among people the requester shares a group with;
+    anyone else must be named by their exact address or number, so the
+    endpoint can't be used to list accounts. Contacts are returned
+    masked. People the requester already shares groups with come first.
+    """
+    q = (q or "").strip()
+    limit = max(1, min(limit, MAX_SUGGESTIONS))
+    if not q:
+        return []
+
+    # One index range scan per source, each capped, then merge by id.
+    # Over-fetch a little so friends outside the first page still rank.
+    fetch = limit * 5
+
+    usernames = _prefix("username", q)
+    if q.lower() != q:
+        usernames |= _prefix("username", q.lower())
+    sources = [User.objects.filter(usernames).values_list("id", flat=True)]
+
+    co_members = CoMembership.objects.filter(user_id=user_id).values("other_id")
+
+    if not q.isdigit():
+        email = q.lower()
+        emails = User.objects.filter(
+            Q(email=email) | _prefix("email", email) & Q(id__in=co_members)
+        )
+        sources.append(emails.values_list("id", flat=True))
+
+    phone = normalize_phone(q)
+    if len(phone) >= 3 and not any(c.isalpha() for c in q):
+        phones = UserProfile.objects.filter(
+            Q(phone=phone) | _prefix("phone", phone) & Q(user_id__in=co_members)
+        )
+        sources.append(phones.values_list("user_id", flat=True))
+
+    ids = set()
+    for source in sources:
+        ids.update(source[:fetch])
+    ids.discard(user_id)
+
+    candidates = User.objects.filter(id__in=ids, is_active=True)
+
+    if exclude_group_id:
+        members = GroupMember.objects.filter(
+            group_id=exclude_group_id
+        ).values("user_id")
+        if sharding.is_sharded():
+            # Members live on the group's shard, not next to the users
+            with sharding.for_group(exclude_group_id):
+                members = list(members.values_list("user_id", flat=True))
+        candidates = candidates.exclude(id__in=members)
+
+    rows = list(candidates.values("id", "username", "email", "profile__phone"))
+    if not rows:
+        return []
+
+    shared = dict(
+        CoMembership.objects.filter(
+            user_id=user_id,
+            other_id__in=[r["id"] for r in rows],
+        ).values_list("other_id", "shared_groups")
+    )
+
+    lowered = q.lower()
+    rows.sort(key=lambda r: (
+        -shared.get(r["id"], 0),
+        r["username"].lower() != lowered,
+        r["username"].lower(),
+    ))
+
+    return [
+        {
+            "id": r["id"],
+            "username": r["username"],
+            "contact": mask_email(r["email"]) or mask_phone(r["profile__phone"]),
+            "shared_groups": shared.get(r["id"], 0),
+        }
+        for r in rows[:limit]
+    ]
+
+
+# ============================================================
+# ✅ BULK ADD MEMBERS
+# ============================================================
+def resolve_identifiers(identifiers):
+    """
+    Map each identifier to a user id with the same precedence as the
+    single-member cascade (username, then email, then phone), using one
+    ``__in`` query per source. Unmatched identifiers map to ``None``.
+    """
+    identifiers = list(identifiers)
+
+    by_username = dict(
+        User.objects.filter(
+            username__in=identifiers
+        ).values_list("username", "id")
+    )
+
+    pending = [i for i in identifiers if i not in by_username]
+    by_email = dict(
+        User.objects.filter(
+            email__in=pending
+        ).values_list("email", "id")
+    ) if pending else {}
+
+    pending = [i for i in pending if i not in by_email]
+    phones = {i: normalize_phone(i) for i in pending}
+    phones = {i: p for i, p in phones.items() if p}
+
+    by_phone = {}
+    if phones:
+        # register stores the normalised number; profile edits may keep
+        # leading zeros of a 10-digit number
+        candidates = set(phones.values()) | {p.zfill(10) for p in phones.values()}
+        for user_id, phone in UserProfile.objects.filter(
+            phone__in=candidates
+        ).values_list("user_id", "phone"):
+            by_phone.setdefault(normalize_phone(phone), user_id)
+
+    return {
+        i: by_username.get(i) or by_email.get(i) or by_phone.get(phones.get(i))
+        for i in identifiers
+    }
+
+
+def add_members(group_id, identifiers):
+    """
+    Add every resolvable identifier to the group. Returns one outcome
+    per identifier, in order: ``added``, ``already_member``,
+    ``duplicate`` (same user listed earlier) or ``not_found``.
+    """
+    identifiers = [str(i).strip() for i in identifiers]
+    resolved = resolve_identifiers(i for i in identifiers if i)
+
+    existing = set(
+        GroupMember.objects.filter(
+            group_id=group_id,
+            user_id__in=[u for u in resolved.values() if u],
+        ).values_list("user_id", flat=True)
+    )
+
+    results = []
+    to_add = []
+    seen = set()
+
+    for identifier in identifiers:
+        user_id = resolved.get(identifier)
+
+        if not user_id:
+            outcome = "not_found"
+        elif user_id in existing:
+            outcome = "already_member"
+        elif user_id in seen:
+            outcome = "duplicate"
+        else:
+            outcome = "added"
+            to_add.append(user_id)
+
+        if user_id:
+            seen.add(user_id)
+        results.append({
+            "identifier": identifier,
+            "user_id": user_id,
+            "status": outcome,
+        })
+
+    if to_add:
+        # Memberships live on the group's shard, co-member counts on "default"
+        with sharding.atomic():
+            GroupMember.objects.bulk_create(
+                [GroupMember(group_id=group_id, user_id=u) for u in to_add],
+                ignore_conflicts=True,
+            )
+        with transaction.atomic():
+            members_joined(group_id, to_add)
+
+    return results
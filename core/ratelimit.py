@@ -0,0 +1,154 @@
+import hashlib
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+
+STATS_KEY = "rl:stats:{scope}:{outcome}"
+
+
+# ============================================================
+# ✅ HELPERS
+# ============================================================
+def client_ip(request):
+    """
+    Client address. Behind a proxy, set RATELIMIT_PROXY_COUNT to the
+    number of trusted hops appending to X-Forwarded-For.
+    """
+    proxies = getattr(settings, "RATELIMIT_PROXY_COUNT", 0)
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+
+    if proxies and forwarded:
+        hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+        if len(hops) >= proxies:
+            return hops[-proxies]
+
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _digest(value):
+    # Keep raw emails/phones out of cache keys
+    return hashlib.sha1(value.strip().lower().encode()).hexdigest()[:16]
+
+
+def _bump_stat(scope, outcome):
+    key = STATS_KEY.format(scope=scope, outcome=outcome)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(key, 1, timeout=None)
+
+
+# ============================================================
+# ✅ SLIDING WINDOW
+# ============================================================
+def hit(key, limit, window, now=None):
+    """
+    Count one attempt against ``key`` and decide whether it is allowed.
+
+    Sliding-window counter: the previous fixed window's count is weighted
+    by how much of it still overlaps the sliding window. Two cache reads
+    and one increment per call. Returns ``(allowed, retry_after_seconds)``.
+    """
+    now = time.time() if now is None else now
+    current = int(now // window)
+    elapsed = (now % window) / window
+
+    current_key = f"rl:{key}:{current}"
+    previous_key = f"rl:{key}:{current - 1}"
+
+    counts = cache.get_many([current_key, previous_key])
+    estimate = (
+        counts.get(previous_key, 0) * (1 - elapsed)
+        + counts.get(current_key, 0)
+    )
+
+    if estimate >= limit:
+        retry_after = max(1, math.ceil(window * (1 - elapsed)))
+        return False, retry_after
+
+    if not cache.add(current_key, 1, timeout=window * 2):
+        try:
+            cache.incr(current_key)
+        except ValueError:
+            cache.set(current_key, 1, timeout=window * 2)
+
+    return True, 0
+
+
+def check(scope, request, identifier=None):
+    """
+    Apply every configured limit for ``scope``. Returns the Retry-After
+    seconds when blocked, otherwise ``None``.
+    """
+    if not getattr(settings, "RATELIMIT_ENABLED", True):
+        return None
+
+    rules = getattr(settings, "RATE_LIMITS", {}).get(scope, {})
+    keys = {"ip": client_ip(request)}
+    if identifier:
+        keys["identifier"] = _digest(str(identifier))
+
+    for kind, (limit, window) in rules.items():
+        if kind not in keys:
+            continue
+
+        allowed, retry_after = hit(f"{scope}:{kind}:{keys[kind]}", limit, window)
+        if not allowed:
+            _bump_stat(scope, "blocked")
+            return retry_after
+
+    _bump_stat(scope, "allowed")
+    return None
+
+
+def rate_limit(scope, identifier_field=None):
+    """
+    Decorator for DRF function views. Runs before the view body, so a
+    rejected request never reaches a DB lookup or password hash.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            identifier = None
+            if identifier_field:
+                identifier = request.data.get(identifier_field)
+
+            retry_after = check(scope, request, identifier)
+            if retry_after is not None:
+                return Response(
+                    {"detail": "Too many requests, try again later"},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={"Retry-After": str(retry_after)},
+                )
+
+            return view(request, *args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+def get_stats():
+    scopes = getattr(settings, "RATE_LIMITS", {})
+    keys = {
+        (scope, outcome): STATS_KEY.format(scope=scope, outcome=outcome)
+        for scope in scopes
+        for outcome in ("allowed", "blocked")
+    }
+    values = cache.get_many(list(keys.values()))
+
+    return {
+        scope: {
+            outcome: values.get(keys[(scope, outcome)], 0)
+            for outcome in ("allowed", "blocked")
+        }
+        for scope in scopes
+    }
@@ -0,0 +1,298 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from . import sharding
+from .models import (
+    ArchivedExpense,
+    ArchivedExpenseSplit,
+    Expense,
+    ExpenseSplit,
+    Group,
+    SpendingRollup,
+    WalletExpense,
+)
+from .splits import format_paise, to_paise
+
+
+ZERO = Decimal("0")
+
+
+# ============================================================
+# ✅ HELPERS
+# ============================================================
+def month_start(dt):
+    return timezone.localtime(dt).date().replace(day=1)
+
+
+def money(amount):
+    """Decimal rupees -> exact ``"12.05"``, like every other amount in the API."""
+    return format_paise(to_paise(amount))
+
+
+def parse_month(value):
+    """
+    ``"2026-03"`` -> ``date(2026, 3, 1)``. Returns ``None`` when empty.
+    """
+    if not value:
+        return None
+
+    try:
+        year, month = (int(part) for part in value.split("-")[:2])
+        return date(year, month, 1)
+    except ValueError:
+        raise ValueError(f"Invalid month: {value} (expected YYYY-MM)")
+
+
+def _apply(group_id, month, paid=None, shares=None, wallet=None):
+    """
+    Add deltas to the (group, user, month) rollup rows.
+
+    ``paid`` / ``wallet`` are ``(user_id, amount, count)`` and ``shares``
+    is a list of ``(user_id, amount)``. Rows are created with one
+    ``bulk_create`` and incremented with ``F()`` updates; share deltas
+    are grouped by value so an equal split is a single UPDATE.
+    """
+    user_ids = {uid for uid, _ in shares or []}
+    if paid:
+        user_ids.add(paid[0])
+    if wallet:
+        user_ids.add(wallet[0])
+
+    SpendingRollup.objects.bulk_create(
+        [
+            SpendingRollup(group_id=group_id, user_id=uid, month=month)
+            for uid in user_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+    rows = SpendingRollup.objects.filter(group_id=group_id, month=month)
+
+    if paid:
+        user_id, amount, count = paid
+        rows.filter(user_id=user_id).update(
+            paid=F("paid") + amount,
+            expense_count=F("expense_count") + count,
+        )
+
+    if wallet:
+        user_id, amount, _ = wallet
+        rows.filter(user_id=user_id).update(
+            wallet_spent=F("wallet_spent") + amount,
+        )
+
+    by_amount = defaultdict(list)
+    for user_id, amount in shares or []:
+        by_amount[amount].append(user_id)
+
+    for amount, users in by_amount.items():
+        rows.filter(user_id__in=users).update(share=F("share") + amount)
+
+
+# ============================================================
+# ✅ INCREMENTAL UPDATES (CALLED ON WRITES)
+# ============================================================
+def record_expense(expense, shares=None, sign=1):
+    """
+    Apply one expense to the rollups. ``shares`` is the list of
+    ``(user_id, share_amount)`` pairs; it is loaded when omitted.
+    Pass ``sign=-1`` before deleting or changing an expense.
+    """
+    if shares is None:
+        shares = ExpenseSplit.objects.filter(
+            expense_id=expense.id
+        ).values_list("user_id", "share_amount")
+
+    _apply(
+        expense.group_id,
+        month_start(expense.created_at),
+        paid=(expense.paid_by_id, sign * Decimal(expense.amount), sign),
+        shares=[(uid, sign * Decimal(amount)) for uid, amount in shares],
+    )
+
+
+def record_split(split, sign=1):
+    expense = split.expense
+    _apply(
+        expense.group_id,
+        month_start(expense.created_at),
+        shares=[(split.user_id, sign * Decimal(split.share_amount))],
+    )
+
+
+def record_wallet_expense(wallet_expense, sign=1):
+    _apply(
+        wallet_expense.group_id,
+        month_start(wallet_expense.created_at),
+        wallet=(wallet_expense.added_by_id, sign * Decimal(wallet_expense.amount), sign),
+    )
+
+
+# ============================================================
+# ✅ FULL REBUILD
+# ============================================================
+def rebuild_group(group_id):
+    """
+    Recompute every rollup row of one group from the raw ledger,
+    archived expenses included.
+    """
+    month = TruncMonth("created_at", output_field=DateField())
+    rows = defaultdict(lambda: {
+        "paid": ZERO,
+        "share": ZERO,
+        "wallet_spent": ZERO,
+        "expense_count": 0,
+    })
+
+    for expense_model, split_model in (
+        (Expense, ExpenseSplit),
+        (ArchivedExpense, ArchivedExpenseSplit),
+    ):
+        paid = expense_model.objects.filter(group_id=group_id).annotate(
+            m=month
+        ).values("paid_by_id", "m").annotate(total=Sum("amount"), count=Count("id"))
+        for r in paid:
+            row = rows[(r["paid_by_id"], r["m"])]
+            row["paid"] += r["total"]
+            row["expense_count"] += r["count"]
+
+        shares = split_model.objects.filter(expense__group_id=group_id).annotate(
+            m=TruncMonth("expense__created_at", output_field=DateField())
+        ).values("user_id", "m").annotate(total=Sum("share_amount"))
+        for r in shares:
+            rows[(r["user_id"], r["m"])]["share"] += r["total"]
+
+    wallet = WalletExpense.objects.filter(group_id=group_id).annotate(
+        m=month
+    ).values("added_by_id", "m").annotate(total=Sum("amount"))
+    for r in wallet:
+        rows[(r["added_by_id"], r["m"])]["wallet_spent"] = r["total"]
+
+    with sharding.atomic():
+        SpendingRollup.objects.filter(group_id=group_id).delete()
+        SpendingRollup.objects.bulk_create(
+            [
+                SpendingRollup(group_id=group_id, user_id=user_id, month=m, **values)
+                for (user_id, m), values in rows.items()
+            ],
+            batch_size=1000,
+        )
+
+    return len(rows)
+
+
+def rebuild_all(group_ids=None):
+    if group_ids is None:
+        group_ids = [
+            group_id
+            for _, ids in sharding.fan_out(lambda: list(
+                Group.objects.filter(deleted_at__isnull=True).values_list("id", flat=True)
+            ))
+            for group_id in ids
+        ]
+        group_ids = sorted(set(group_ids))
+
+    rebuilt = {}
+    for group_id in group_ids:
+        with sharding.for_group(group_id):
+            if sharding.owns(group_id):
+                rebuilt[group_id] = rebuild_group(group_id)
+    return rebuilt
+
+
+# ============================================================
+# ✅ ANALYTICS (READS ROLLUPS ONLY)
+# ============================================================
+def _in_range(qs, start, end):
+    if start:
+        qs = qs.filter(month__gte=start)
+    if end:
+        qs = qs.filter(month__lte=end)
+    return qs
+
+
+def get_group_analytics(group_id, start=None, end=None):
+    rows = _in_range(
+        SpendingRollup.objects.filter(group_id=group_id), start, end
+    ).values(
+        "month",
+        "user_id",
+        "user__username",
+        "paid",
+        "share",
+        "wallet_spent",
+        "expense_count",
+    ).order_by("month", "user_id")
+
+    months = {}
+    for r in rows:
+        bucket = months.setdefault(r["month"], {
+            "month": r["month"].strftime("%Y-%m"),
+            "total_spent": ZERO,
+            "wallet_spent": ZERO,
+            "expense_count": 0,
+            "members": [],
+        })
+        bucket["total_spent"] += r["paid"]
+        bucket["wallet_spent"] += r["wallet_spent"]
+        bucket["expense_count"] += r["expense_count"]
+        bucket["members"].append({
+            "user_id": r["user_id"],
+            "username": r["user__username"],
+            "paid": money(r["paid"]),
+            "share": money(r["share"]),
+            "wallet_spent": money(r["wallet_spent"]),
+        })
+
+    for bucket in months.values():
+        bucket["total_spent"] = money(bucket["total_spent"])
+        bucket["wallet_spent"] = money(bucket["wallet_spent"])
+
+    return list(months.values())
+
+
+def get_user_analytics(user_id, start=None, end=None):
+    """
+    The user's own share of spending per month, broken down by group type.
+    """
+    # One row per group and month, so a group caught mid-move counts once
+    rows = sharding.merge(
+        sharding.fan_out(lambda: list(
+            _in_range(
+                SpendingRollup.objects.filter(
+                    user_id=user_id, group__deleted_at__isnull=True
+                ),
+                start,
+                end,
+            ).values("month", "group_id", "group__group_type", "share", "paid")
+        )),
+        lambda r: r["group_id"],
+    )
+    rows.sort(key=lambda r: (r["month"], r["group__group_type"]))
+
+    months = {}
+    for r in rows:
+        bucket = months.setdefault(r["month"], {
+            "month": r["month"].strftime("%Y-%m"),
+            "total_share": ZERO,
+            "by_group_type": {},
+        })
+        bucket["total_share"] += r["share"]
+        by_type = bucket["by_group_type"].setdefault(
+            r["group__group_type"], {"share": ZERO, "paid": ZERO}
+        )
+        by_type["share"] += r["share"]
+        by_type["paid"] += r["paid"]
+
+    for bucket in months.values():
+        bucket["total_share"] = money(bucket["total_share"])
+        for by_type in bucket["by_group_type"].values():
+            by_type["share"] = money(by_type["share"])
+            by_type["paid"] = money(by_type["paid"])
+
+    return list(months.values())
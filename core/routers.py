@@ -0,0 +1,118 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from . import sharding
+
+
+PIN_KEY = "db:pin:{user_id}"
+
+# Replica alias for reads in the current request, or None for the primary
+_read_alias = ContextVar("read_alias", default=None)
+
+
+def replica_aliases():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+# ============================================================
+# ✅ READ-YOUR-WRITES PINNING
+# ============================================================
+def pin(user_id):
+    """Keep ``user_id``'s reads on the primary for REPLICA_PIN_SECONDS."""
+    cache.set(PIN_KEY.format(user_id=user_id), 1, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return user_id is not None and cache.get(PIN_KEY.format(user_id=user_id)) is not None
+
+
+@contextmanager
+def read_from_replica(alias=None):
+    """
+    Route reads inside the block to ``alias`` (default: a random replica).
+    One replica per block, so a request never mixes two lag positions.
+    """
+    aliases = replica_aliases()
+    if alias is None and aliases:
+        alias = random.choice(aliases)
+
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+# ============================================================
+# ✅ ROUTERS
+# ============================================================
+class ShardRouter:
+    """
+    Per-group models (sharding.GROUP_TABLES) follow the instance they are
+    reached from, else the shard chosen by :func:`sharding.use_shard`
+    (set by ShardRoutingMiddleware). Global models are written to
+    "default" only; every shard holds a copy of users for joins.
+    Anything on "default" is left to ReplicaRouter.
+    """
+
+    def _shard(self, model, hints):
+        instance = hints.get("instance")
+        if instance is not None and sharding.is_sharded_model(type(instance)) and instance._state.db:
+            alias = instance._state.db
+        else:
+            alias = sharding.current()
+        return None if alias == DEFAULT_DB_ALIAS else alias
+
+    def db_for_read(self, model, **hints):
+        if sharding.is_sharded_model(model):
+            return self._shard(model, hints)
+        return None
+
+    def db_for_write(self, model, **hints):
+        if sharding.is_sharded_model(model):
+            return self._shard(model, hints)
+        return DEFAULT_DB_ALIAS if sharding.is_sharded() else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not sharding.is_sharded():
+            return None
+        if sharding.is_sharded_model(type(obj1)) and sharding.is_sharded_model(type(obj2)):
+            return True if obj1._state.db == obj2._state.db else None
+        # A user has a copy on every shard
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaRouter:
+    """
+    Reads go to the replica chosen by :func:`read_from_replica` (set by
+    ReplicaRoutingMiddleware for safe requests); everything else, and
+    any read inside a transaction, goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or transaction.get_connection().in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Never follow an instance that was read from a replica
+        return DEFAULT_DB_ALIAS if replica_aliases() else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get schema and rows from the primary
+        return False if db in replica_aliases() else None
@@ -0,0 +1,214 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from . import sharding
+from .models import Expense, GroupMember, WalletExpense
+from .splits import format_paise, to_paise
+
+
+EXPENSE = "expense"
+WALLET_EXPENSE = "wallet_expense"
+
+MAX_PAGE_SIZE = 50
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# ============================================================
+# ✅ HELPERS
+# ============================================================
+def _fts_query(q):
+    """
+    ``"din goa"`` -> ``"din"* "goa"*`` (every word, prefix match).
+    Only word characters survive, so user input can't inject FTS syntax.
+    """
+    return " ".join(f'"{token}"*' for token in _TOKEN_RE.findall(q))
+
+
+def _user_group_ids(user_id):
+    return GroupMember.objects.filter(
+        user_id=user_id, group__deleted_at__isnull=True
+    ).values("group_id")
+
+
+def _connection():
+    # Where expense reads are routed: the current shard, or a replica
+    return connections[Expense.objects.db]
+
+
+_fts_available = {}
+
+
+def _has_fts():
+    # Introspect once per database instead of on every search
+    connection = _connection()
+    name = str(connection.settings_dict["NAME"])
+    if name not in _fts_available:
+        _fts_available[name] = (
+            "core_search_fts" in connection.introspection.table_names()
+        )
+    return _fts_available[name]
+
+
+# ============================================================
+# ✅ BACKENDS (EACH RETURNS [(kind, id, score)] BEST FIRST)
+# ============================================================
+def _search_sqlite(user_id, q, limit, offset):
+    match = _fts_query(q)
+    if not match:
+        return []
+
+    with _connection().cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT rowid, bm25(core_search_fts) AS rank
+            FROM core_search_fts
+            WHERE core_search_fts MATCH %s
+              AND group_id IN (
+                  SELECT m.group_id
+                  FROM core_groupmember m
+                  JOIN core_group g ON g.id = m.group_id AND g.deleted_at IS NULL
+                  WHERE m.user_id = %s
+              )
+            ORDER BY rank, rowid DESC
+            LIMIT %s OFFSET %s
+            """,
+            [match, user_id, limit, offset],
+        )
+        rows = cursor.fetchall()
+
+    # bm25 is "lower is better"; flip it so every backend sorts desc
+    return [
+        (WALLET_EXPENSE if rowid % 2 else EXPENSE, rowid // 2, -rank)
+        for rowid, rank in rows
+    ]
+
+
+def _search_postgres(user_id, q, limit, offset):
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    groups = _user_group_ids(user_id)
+    # icontains is served by the UPPER(title) trigram index (0018),
+    # trigram_similar by the plain one (0011): a BitmapOr, not a seq scan
+    matches = Q(title__icontains=q) | Q(title__trigram_similar=q)
+
+    results = []
+    for kind, model in ((EXPENSE, Expense), (WALLET_EXPENSE, WalletExpense)):
+        rows = model.objects.filter(
+            matches, group_id__in=groups
+        ).annotate(
+            score=TrigramSimilarity("title", q)
+        ).order_by("-score", "-id").values_list("id", "score")[:offset + limit]
+
+        results += [(kind, obj_id, score) for obj_id, score in rows]
+
+    results.sort(key=lambda r: (-r[2], -r[1]))
+    return results[offset:offset + limit]
+
+
+def _search_fallback(user_id, q, limit, offset):
+    groups = _user_group_ids(user_id)
+
+    results = []
+    for kind, model in ((EXPENSE, Expense), (WALLET_EXPENSE, WalletExpense)):
+        rows = model.objects.filter(
+            title__icontains=q, group_id__in=groups
+        ).order_by("-id").values_list("id", flat=True)[:offset + limit]
+
+        results += [(kind, obj_id, 1.0) for obj_id in rows]
+
+    results.sort(key=lambda r: -r[1])
+    return results[offset:offset + limit]
+
+
+def _hits(user_id, q, limit, offset):
+    vendor = _connection().vendor
+    if vendor == "postgresql":
+        return _search_postgres(user_id, q, limit, offset)
+    if vendor == "sqlite" and _has_fts():
+        return _search_sqlite(user_id, q, limit, offset)
+    return _search_fallback(user_id, q, limit, offset)
+
+
+def _rows(ids):
+    fields = ("id", "group_id", "group__name", "title", "amount", "created_at")
+    rows = {}
+    if ids[EXPENSE]:
+        for row in Expense.objects.filter(id__in=ids[EXPENSE]).values(*fields):
+            rows[(EXPENSE, row["id"])] = row
+    if ids[WALLET_EXPENSE]:
+        wallet_rows = WalletExpense.objects.filter(
+            id__in=ids[WALLET_EXPENSE]
+        ).values(*fields)
+        for row in wallet_rows:
+            rows[(WALLET_EXPENSE, row["id"])] = row
+    return rows
+
+
+# ============================================================
+# ✅ SEARCH EXPENSES ACROSS MY GROUPS
+# ============================================================
+def search_expenses(user_id, q, page=1, page_size=20):
+    """
+    Ranked title search over Expense and WalletExpense rows in the
+    user's groups. Fetches one extra hit to report ``has_next`` without
+    a COUNT over the whole match set.
+    """
+    q = (q or "").strip()
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    page = max(1, page)
+    offset = (page - 1) * page_size
+
+    if not q:
+        hits = []
+    elif sharding.is_sharded():
+        # Each shard's best offset + page_size + 1, merged by score; a
+        # row seen twice (its group is mid-move) is the same row
+        merged = {
+            hit[:2]: hit
+            for _, part in sharding.fan_out(
+                lambda: _hits(user_id, q, offset + page_size + 1, 0)
+            )
+            for hit in part
+        }
+        hits = sorted(merged.values(), key=lambda r: (-r[2], -r[1]))
+        hits = hits[offset:offset + page_size + 1]
+    else:
+        hits = _hits(user_id, q, page_size + 1, offset)
+
+    has_next = len(hits) > page_size
+    hits = hits[:page_size]
+
+    ids = {
+        kind: [obj_id for k, obj_id, _ in hits if k == kind]
+        for kind in (EXPENSE, WALLET_EXPENSE)
+    }
+    rows = {}
+    for _, part in sharding.fan_out(lambda: _rows(ids)):
+        rows.update(part)
+
+    results = []
+    for kind, obj_id, score in hits:
+        row = rows.get((kind, obj_id))
+        if not row:
+            continue
+        results.append({
+            "type": kind,
+            "id": obj_id,
+            "group_id": row["group_id"],
+            "group_name": row["group__name"],
+            "title": row["title"],
+            "amount": format_paise(to_paise(row["amount"])),
+            "created_at": row["created_at"],
+            "score": round(float(score), 4),
+        })
+
+    return {
+        "query": q,
+        "page": page,
+        "page_size": page_size,
+        "has_next": has_next,
+        "results": results,
+    }
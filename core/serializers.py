@@ -10,6 +10,8 @@ from .models import (
     Settlement,
     UserProfile
 )
+from .fastpath import RowSerializer
+from .splits import format_paise
 
 # =====================================================
 # 🔐 USER PROFILE SERIALIZER (FINAL STABLE VERSION)
@@ -162,10 +164,49 @@ class GroupMemberSerializer(serializers.ModelSerializer):
         return obj.user == obj.group.created_by
 
 
+# Same JSON as GroupMemberSerializer(many=True), built from .values() rows
+MEMBER_ROWS = RowSerializer(
+    GroupMemberSerializer,
+    methods={
+        "is_creator": (
+            ("user", "group__created_by"),
+            lambda row: row["user"] == row["group__created_by"],
+        ),
+    },
+)
+
+
+# =====================================================
+# 🗑️ NO WRITES INTO SOFT-DELETED GROUPS
+# =====================================================
+class LiveGroupMixin:
+    """
+    Rejects creates and edits in a soft-deleted group: purge_groups may
+    already have swept the table, and a late row would block its delete.
+    """
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        group = self._target_group(attrs)
+        if group is not None and group.deleted_at is not None:
+            raise serializers.ValidationError({"group": "This group has been deleted."})
+        return attrs
+
+    def _target_group(self, attrs):
+        if "group" in attrs:
+            return attrs["group"]
+        if "expense" in attrs:
+            return attrs["expense"].group
+        if self.instance is None:
+            return None
+        group = getattr(self.instance, "group", None)
+        return group if group is not None else self.instance.expense.group
+
+
 # =====================================================
 # 💰 WALLET CONTRIBUTION
 # =====================================================
-class WalletContributionSerializer(serializers.ModelSerializer):
+class WalletContributionSerializer(LiveGroupMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
@@ -176,7 +217,7 @@ class WalletContributionSerializer(serializers.ModelSerializer):
 # =====================================================
 # 💳 WALLET EXPENSE
 # =====================================================
-class WalletExpenseSerializer(serializers.ModelSerializer):
+class WalletExpenseSerializer(LiveGroupMixin, serializers.ModelSerializer):
     added_by = UserSerializer(read_only=True)
 
     class Meta:
@@ -187,7 +228,7 @@ class WalletExpenseSerializer(serializers.ModelSerializer):
 # =====================================================
 # 🧾 EXPENSE
 # =====================================================
-class ExpenseSerializer(serializers.ModelSerializer):
+class ExpenseSerializer(LiveGroupMixin, serializers.ModelSerializer):
     paid_by = UserSerializer(read_only=True)
 
     class Meta:
@@ -195,10 +236,14 @@ class ExpenseSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+# Same JSON as ExpenseSerializer(many=True), built from .values() rows
+EXPENSE_ROWS = RowSerializer(ExpenseSerializer)
+
+
 # =====================================================
 # 📊 EXPENSE SPLIT
 # =====================================================
-class ExpenseSplitSerializer(serializers.ModelSerializer):
+class ExpenseSplitSerializer(LiveGroupMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
@@ -209,10 +254,69 @@ class ExpenseSplitSerializer(serializers.ModelSerializer):
 # =====================================================
 # 🤝 SETTLEMENT
 # =====================================================
-class SettlementSerializer(serializers.ModelSerializer):
+class SettlementSerializer(LiveGroupMixin, serializers.ModelSerializer):
     from_user = UserSerializer(read_only=True)
     to_user = UserSerializer(read_only=True)
 
     class Meta:
         model = Settlement
         fields = "__all__"
+
+
+# =====================================================
+# 💵 BALANCES (SERVICES RETURN INTEGER PAISE)
+# =====================================================
+class PaiseField(serializers.Field):
+    """Integer paise in, exact decimal string out (``1205`` -> ``"12.05"``)."""
+
+    def to_representation(self, value):
+        return format_paise(value)
+
+
+class WalletSummarySerializer(serializers.Serializer):
+    group_id = serializers.IntegerField()
+    group_name = serializers.CharField()
+    wallet_enabled = serializers.BooleanField()
+    total_added = PaiseField()
+    total_spent = PaiseField()
+    remaining_balance = PaiseField()
+
+
+class NetBalanceSerializer(serializers.Serializer):
+    user_id = serializers.IntegerField()
+    net_balance = PaiseField()
+
+
+class TransferSerializer(serializers.Serializer):
+    from_user = serializers.IntegerField()
+    to_user = serializers.IntegerField()
+    amount = PaiseField()
+
+
+class GroupBalanceSerializer(serializers.Serializer):
+    group_id = serializers.IntegerField()
+    group_name = serializers.CharField()
+    net_balance = PaiseField()
+
+
+class MyBalancesSerializer(serializers.Serializer):
+    groups = GroupBalanceSerializer(many=True)
+    total = PaiseField()
+
+
+class MemberTotalSerializer(NetBalanceSerializer):
+    username = serializers.CharField()
+
+
+class GroupOverviewSerializer(serializers.Serializer):
+    summary = WalletSummarySerializer()
+    totals = MemberTotalSerializer(many=True)
+    settle_up = TransferSerializer(many=True)
+    plan_hash = serializers.CharField()
+    latest_expenses = ExpenseSerializer(many=True)
+
+
+class BalancesAsOfSerializer(serializers.Serializer):
+    as_of = serializers.DateTimeField()
+    snapshot_at = serializers.DateTimeField(allow_null=True)
+    balances = NetBalanceSerializer(many=True)
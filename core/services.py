@@ -1,9 +1,23 @@
-from django.db.models import Sum
+from django.contrib.auth.models import User
+from django.db.models import Max, OuterRef, Q, Subquery, Sum
 from decimal import Decimal
 from collections import defaultdict
+from datetime import timedelta
+import hashlib
+import json
 
+from django.utils import timezone
+
+from . import sharding
+from .metrics import timed
+from .splits import format_paise, from_paise
 from .models import (
+    ArchivedExpense,
+    ArchivedExpenseSplit,
+    BalanceSnapshot,
+    CarriedBalance,
     Group,
+    GroupMember,
     WalletContribution,
     WalletExpense,
     Expense,
@@ -12,60 +26,78 @@ from .models import (
 )
 
 
+# ============================================================
+# ✅ MONEY IS INTEGER PAISE INSIDE THIS MODULE
+# ============================================================
+# Amounts leave the DB as Decimal sums and are turned into int paise
+# right away; serializers.PaiseField renders them as exact strings.
+def _paise(total):
+    return round(total * 100) if total else 0
+
+
 # ============================================================
 # ✅ WALLET SUMMARY
 # ============================================================
+@timed
 def get_wallet_summary(group_id):
     group = Group.objects.get(id=group_id)
 
-    total_added = WalletContribution.objects.filter(
+    total_added = _paise(WalletContribution.objects.filter(
         group=group
-    ).aggregate(total=Sum("amount"))["total"] or Decimal("0")
+    ).aggregate(total=Sum("amount"))["total"])
 
-    total_spent = WalletExpense.objects.filter(
+    total_spent = _paise(WalletExpense.objects.filter(
         group=group
-    ).aggregate(total=Sum("amount"))["total"] or Decimal("0")
-
-    remaining = total_added - total_spent
+    ).aggregate(total=Sum("amount"))["total"])
 
     return {
         "group_id": group.id,
         "group_name": group.name,
         "wallet_enabled": group.wallet_enabled,
-        "total_added": float(total_added),
-        "total_spent": float(total_spent),
-        "remaining_balance": float(remaining),
+        "total_added": total_added,
+        "total_spent": total_spent,
+        "remaining_balance": total_added - total_spent,
     }
 
 
 # ============================================================
 # ✅ CALCULATE NET BALANCE (USED BY TOTALS + BALANCES)
 # ============================================================
+@timed
 def calculate_net_balances(group_id):
-    expenses = Expense.objects.filter(group_id=group_id)
-    settlements = Settlement.objects.filter(
-        group_id=group_id,
-        status="PAID"
-    )
+    """
+    Net paise per user: carried + paid + settled out - owed - settled in.
+    Five queries, whatever the number of expenses.
+    """
+    paid = Expense.objects.filter(
+        group_id=group_id
+    ).values("paid_by_id").annotate(total=Sum("amount"))
+
+    owed = ExpenseSplit.objects.filter(
+        expense__group_id=group_id
+    ).values("user_id").annotate(total=Sum("share_amount"))
 
-    net = defaultdict(Decimal)
+    settlements = Settlement.objects.filter(group_id=group_id, status="PAID")
+    sent = settlements.values("from_user_id").annotate(total=Sum("amount"))
+    received = settlements.values("to_user_id").annotate(total=Sum("amount"))
 
-    # -----------------------
-    # Handle Expenses
-    # -----------------------
-    for exp in expenses:
-        net[exp.paid_by_id] += exp.amount
+    # Archived expenses live on as one carried-forward row per member
+    carried = CarriedBalance.objects.filter(
+        group_id=group_id
+    ).values_list("user_id", "amount")
 
-        splits = ExpenseSplit.objects.filter(expense=exp)
-        for sp in splits:
-            net[sp.user_id] -= sp.share_amount
+    net = defaultdict(int)
 
-    # -----------------------
-    # Handle Paid Settlements
-    # -----------------------
-    for s in settlements:
-        net[s.from_user_id] += s.amount
-        net[s.to_user_id] -= s.amount
+    for user_id, amount in carried:
+        net[user_id] += _paise(amount)
+    for row in paid:
+        net[row["paid_by_id"]] += _paise(row["total"])
+    for row in owed:
+        net[row["user_id"]] -= _paise(row["total"])
+    for row in sent:
+        net[row["from_user_id"]] += _paise(row["total"])
+    for row in received:
+        net[row["to_user_id"]] -= _paise(row["total"])
 
     return net
 
@@ -73,30 +105,29 @@ def calculate_net_balances(group_id):
 # ============================================================
 # ✅ TOTALS TAB
 # ============================================================
+@timed
 def get_totals(group_id):
     net = calculate_net_balances(group_id)
 
-    result = []
-
-    for user_id, amount in net.items():
-        result.append({
-            "user_id": user_id,
-            "net_balance": float(round(amount, 2))
-        })
-
-    return result
+    return [
+        {"user_id": user_id, "net_balance": amount}
+        for user_id, amount in sorted(net.items())
+    ]
 
 
 # ============================================================
 # ✅ BALANCES TAB (DEBT SIMPLIFICATION)
 # ============================================================
-def get_settle_up(group_id):
-    net = calculate_net_balances(group_id)
-
+@timed
+def simplify_debts(net):
+    """
+    Greedy payer/receiver matching over ``{user_id: paise}``. Users are
+    taken in id order so the same balances always give the same plan.
+    """
     receivers = []
     payers = []
 
-    for user_id, amount in net.items():
+    for user_id, amount in sorted(net.items()):
         if amount > 0:
             receivers.append([user_id, amount])
         elif amount < 0:
@@ -114,7 +145,7 @@ def get_settle_up(group_id):
         settlements.append({
             "from_user": payer_id,
             "to_user": rec_id,
-            "amount": float(round(send_amt, 2))
+            "amount": send_amt,
         })
 
         payers[i][1] -= send_amt
@@ -126,3 +157,344 @@ def get_settle_up(group_id):
             j += 1
 
     return settlements
+
+
+@timed
+def get_settle_up(group_id):
+    return simplify_debts(calculate_net_balances(group_id))
+
+
+# ============================================================
+# ✅ GROUP OVERVIEW (ONE SCREEN, ONE LEDGER READ)
+# ============================================================
+MAX_OVERVIEW_EXPENSES = 50
+
+
+def _wallet_total(model):
+    return Subquery(
+        model.objects.filter(
+            group=OuterRef("pk")
+        ).values("group").annotate(total=Sum("amount")).values("total")
+    )
+
+
+@timed
+def get_group_overview(group_id, latest=10):
+    """
+    Wallet summary, per-member totals and the settle-up plan from a
+    single :func:`calculate_net_balances` pass, plus the ``latest``
+    expenses. Eight queries whatever the size of the group.
+    """
+    latest = max(0, min(latest, MAX_OVERVIEW_EXPENSES))
+
+    group = Group.objects.annotate(
+        total_added=_wallet_total(WalletContribution),
+        total_spent=_wallet_total(WalletExpense),
+    ).get(id=group_id)
+    total_added = _paise(group.total_added)
+    total_spent = _paise(group.total_spent)
+
+    net = calculate_net_balances(group_id)
+    usernames = dict(
+        User.objects.filter(id__in=list(net)).values_list("id", "username")
+    )
+
+    expenses = []
+    if latest:
+        expenses = list(
+            Expense.objects.filter(group_id=group_id).select_related(
+                "paid_by__profile"
+            ).order_by("-created_at")[:latest]
+        )
+
+    return {
+        "summary": {
+            "group_id": group.id,
+            "group_name": group.name,
+            "wallet_enabled": group.wallet_enabled,
+            "total_added": total_added,
+            "total_spent": total_spent,
+            "remaining_balance": total_added - total_spent,
+        },
+        "totals": [
+            {"user_id": user_id, "username": usernames.get(user_id, ""), "net_balance": amount}
+            for user_id, amount in sorted(net.items())
+        ],
+        "settle_up": simplify_debts(net),
+        "latest_expenses": expenses,
+    }
+
+
+# ============================================================
+# ✅ SETTLE ALL (RECORD WHOLE PLAN IN ONE GO)
+# ============================================================
+class PlanMismatch(Exception):
+    def __init__(self, plan, plan_hash):
+        super().__init__("Settle-up plan has changed")
+        self.plan = plan
+        self.plan_hash = plan_hash
+
+
+@timed
+def get_plan_hash(plan):
+    payload = json.dumps(
+        [[s["from_user"], s["to_user"], format_paise(s["amount"])] for s in plan],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@timed
+def record_settle_all(group_id, plan_hash):
+    """
+    Record every transfer of the current settle-up plan as PAID.
+
+    ``plan_hash`` must match the plan the client was shown, otherwise
+    ``PlanMismatch`` is raised with the fresh plan and nothing is written.
+    """
+    with sharding.atomic():
+        # Serialise concurrent settle-alls on the same group
+        Group.objects.select_for_update().filter(id=group_id).first()
+
+        plan = get_settle_up(group_id)
+        current_hash = get_plan_hash(plan)
+
+        if plan_hash != current_hash:
+            raise PlanMismatch(plan, current_hash)
+
+        Settlement.objects.bulk_create([
+            Settlement(
+                group_id=group_id,
+                from_user_id=s["from_user"],
+                to_user_id=s["to_user"],
+                amount=from_paise(s["amount"]),
+                status="PAID",
+            )
+            for s in plan
+        ])
+
+    return plan
+
+
+# ============================================================
+# ✅ MY BALANCES (ACROSS ALL GROUPS)
+# ============================================================
+def _group_balances(user_id):
+    """The user's net balance per group, on the current shard."""
+    memberships = GroupMember.objects.filter(
+        user_id=user_id,
+        group__deleted_at__isnull=True,
+    ).order_by("group_id").values_list("group_id", "group__name")
+
+    paid = Expense.objects.filter(
+        paid_by_id=user_id
+    ).values("group_id").annotate(total=Sum("amount"))
+
+    owed = ExpenseSplit.objects.filter(
+        user_id=user_id
+    ).values("expense__group_id").annotate(total=Sum("share_amount"))
+
+    settled = Settlement.objects.filter(
+        Q(from_user_id=user_id) | Q(to_user_id=user_id),
+        status="PAID",
+    ).values("group_id").annotate(
+        sent=Sum("amount", filter=Q(from_user_id=user_id)),
+        received=Sum("amount", filter=Q(to_user_id=user_id)),
+    )
+
+    carried = CarriedBalance.objects.filter(
+        user_id=user_id
+    ).values_list("group_id", "amount")
+
+    net = defaultdict(int)
+
+    for group_id, amount in carried:
+        net[group_id] += _paise(amount)
+
+    for row in paid:
+        net[row["group_id"]] += _paise(row["total"])
+
+    for row in owed:
+        net[row["expense__group_id"]] -= _paise(row["total"])
+
+    for row in settled:
+        net[row["group_id"]] += _paise(row["sent"])
+        net[row["group_id"]] -= _paise(row["received"])
+
+    return [
+        {
+            "group_id": group_id,
+            "group_name": group_name,
+            "net_balance": net[group_id],
+        }
+        for group_id, group_name in memberships
+    ]
+
+
+@timed
+def get_user_balances(user_id):
+    """
+    Net balance of one user in every group they belong to.
+
+    Uses five grouped queries per shard regardless of how many groups
+    the user is in, instead of replaying each group's ledger.
+    """
+    groups = sharding.merge(
+        sharding.fan_out(lambda: _group_balances(user_id)),
+        lambda group: group["group_id"],
+    )
+    groups.sort(key=lambda group: group["group_id"])
+
+    return {
+        "groups": groups,
+        "total": sum(group["net_balance"] for group in groups),
+    }
+
+
+# ============================================================
+# ✅ POINT-IN-TIME BALANCES (SNAPSHOT + DELTAS)
+# ============================================================
+# Snapshots stop short of "now" so rows still being committed with an
+# earlier created_at are not skipped by the next replay.
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+
+def _net_deltas(group_id, after, until, archived=False):
+    """
+    Per-user net change from expenses, splits and PAID settlements with
+    ``after < created_at <= until``, as four grouped aggregates (two more
+    with ``archived`` when the window reaches into the cold archive).
+    """
+    window = {"created_at__lte": until}
+    if after:
+        window["created_at__gt"] = after
+
+    split_window = {f"expense__{k}": v for k, v in window.items()}
+
+    ledgers = [(Expense, ExpenseSplit)]
+    if archived:
+        ledgers.append((ArchivedExpense, ArchivedExpenseSplit))
+
+    paid = []
+    owed = []
+    for expense_model, split_model in ledgers:
+        paid += expense_model.objects.filter(
+            group_id=group_id, **window
+        ).values("paid_by_id").annotate(total=Sum("amount"))
+
+        owed += split_model.objects.filter(
+            expense__group_id=group_id, **split_window
+        ).values("user_id").annotate(total=Sum("share_amount"))
+
+    settlements = Settlement.objects.filter(
+        group_id=group_id, status="PAID", **window
+    )
+    sent = settlements.values("from_user_id").annotate(total=Sum("amount"))
+    received = settlements.values("to_user_id").annotate(total=Sum("amount"))
+
+    net = defaultdict(int)
+
+    for row in paid:
+        net[row["paid_by_id"]] += _paise(row["total"])
+    for row in owed:
+        net[row["user_id"]] -= _paise(row["total"])
+    for row in sent:
+        net[row["from_user_id"]] += _paise(row["total"])
+    for row in received:
+        net[row["to_user_id"]] -= _paise(row["total"])
+
+    return net
+
+
+@timed
+def calculate_balances_as_of(group_id, as_of):
+    """
+    Balances at ``as_of``: nearest earlier snapshot plus the deltas after it.
+    Returns ``(net, snapshot)``; ``snapshot`` is ``None`` for a full replay.
+    """
+    snapshot = BalanceSnapshot.objects.filter(
+        group_id=group_id,
+        taken_at__lte=as_of,
+    ).order_by("-taken_at").first()
+
+    archived_through = CarriedBalance.objects.filter(
+        group_id=group_id
+    ).aggregate(t=Max("through"))["t"]
+
+    net = defaultdict(int)
+    after = None
+
+    if snapshot:
+        after = snapshot.taken_at
+        for user_id, amount in snapshot.balances.items():
+            net[int(user_id)] = _paise(Decimal(amount))
+
+    archived = archived_through is not None and (
+        after is None or after < archived_through
+    )
+    for user_id, amount in _net_deltas(group_id, after, as_of, archived).items():
+        net[user_id] += amount
+
+    return net, snapshot
+
+
+@timed
+def get_balances_as_of(group_id, as_of=None):
+    as_of = as_of or timezone.now()
+    net, snapshot = calculate_balances_as_of(group_id, as_of)
+
+    return {
+        "as_of": as_of,
+        "snapshot_at": snapshot.taken_at if snapshot else None,
+        "balances": [
+            {
+                "user_id": user_id,
+                "net_balance": amount,
+            }
+            for user_id, amount in sorted(net.items())
+        ],
+    }
+
+
+def invalidate_snapshots(group_id, since):
+    """
+    Call when a row created at ``since`` is edited or deleted: drops the
+    group's snapshots that already counted it. The next snapshot_balances
+    run writes fresh ones.
+    """
+    BalanceSnapshot.objects.filter(group_id=group_id, taken_at__gte=since).delete()
+
+
+@timed
+def take_balance_snapshot(group_id, at=None):
+    """
+    Store the group's balances at ``at`` (default: now minus SNAPSHOT_LAG).
+    Returns ``None`` when nothing changed since the previous snapshot.
+    """
+    at = at or timezone.now() - SNAPSHOT_LAG
+
+    previous = BalanceSnapshot.objects.filter(
+        group_id=group_id
+    ).order_by("-taken_at").first()
+
+    if previous:
+        if previous.taken_at >= at:
+            return None
+
+        window = {"created_at__gt": previous.taken_at, "created_at__lte": at}
+        changed = (
+            Expense.objects.filter(group_id=group_id, **window).exists()
+            or Settlement.objects.filter(group_id=group_id, **window).exists()
+        )
+        if not changed:
+            return None
+
+    net, _ = calculate_balances_as_of(group_id, at)
+
+    return BalanceSnapshot.objects.create(
+        group_id=group_id,
+        taken_at=at,
+        balances={
+            str(user_id): format_paise(amount) for user_id, amount in net.items()
+        },
+    )
@@ -0,0 +1,465 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import (
+    ArchivedExpense,
+    ArchivedExpenseSplit,
+    BalanceSnapshot,
+    CarriedBalance,
+    Expense,
+    ExpenseSplit,
+    Group,
+    GroupInvite,
+    GroupMember,
+    GroupShard,
+    Settlement,
+    SpendingRollup,
+    UserProfile,
+    WalletContribution,
+    WalletExpense,
+)
+
+
+DEFAULTS = {
+    "NEW_GROUP_SHARDS": [],
+    "CACHE_SECONDS": 60,
+}
+
+CACHE_KEY = "shard:group:{group_id}"
+
+# Auto ids on shard N start at N * ID_SPAN, so ids are unique across
+# shards and rows keep them when their group moves
+ID_SPAN = 10 ** 12
+
+# Per-group tables and the path to their group id, parents first:
+# the order rows are copied in (and the reverse of the delete order)
+GROUP_TABLES = [
+    (Group, "id"),
+    (GroupMember, "group_id"),
+    (CarriedBalance, "group_id"),
+    (ArchivedExpense, "group_id"),
+    (ArchivedExpenseSplit, "expense__group_id"),
+    (BalanceSnapshot, "group_id"),
+    (SpendingRollup, "group_id"),
+    (GroupInvite, "group_id"),
+    (WalletExpense, "group_id"),
+    (WalletContribution, "group_id"),
+    (Settlement, "group_id"),
+    (Expense, "group_id"),
+    (ExpenseSplit, "expense__group_id"),
+]
+GROUP_FIELDS = dict(GROUP_TABLES)
+
+# Global rows every shard keeps a copy of, for foreign keys and joins
+REFERENCE_MODELS = (User, UserProfile)
+
+# Shard for unhinted per-group queries in the current block
+_shard = ContextVar("shard", default=None)
+
+
+class ShardError(Exception):
+    pass
+
+
+def sharding_settings():
+    return {**DEFAULTS, **getattr(settings, "SHARDING", {})}
+
+
+def shard_aliases():
+    return getattr(settings, "DATABASE_SHARDS", [DEFAULT_DB_ALIAS])
+
+
+def is_sharded():
+    return len(shard_aliases()) > 1
+
+
+def is_sharded_model(model):
+    return model._meta.concrete_model in GROUP_FIELDS
+
+
+# ============================================================
+# ✅ CURRENT SHARD
+# ============================================================
+def current():
+    """Alias per-group queries in this block go to."""
+    return _shard.get() or DEFAULT_DB_ALIAS
+
+
+def route(alias):
+    """
+    Send the rest of the enclosing :func:`use_shard` block to ``alias``;
+    for ShardRoutingMiddleware, which only learns the group in process_view.
+    """
+    _shard.set(alias)
+
+
+@contextmanager
+def use_shard(alias):
+    token = _shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _shard.reset(token)
+
+
+@contextmanager
+def for_group(group_id):
+    with use_shard(shard_for_group(group_id)) as alias:
+        yield alias
+
+
+def atomic():
+    """``transaction.atomic()`` on the current shard rather than "default"."""
+    return transaction.atomic(using=current())
+
+
+# ============================================================
+# ✅ DIRECTORY (GROUP -> SHARD)
+# ============================================================
+def _entry(group_id):
+    """``(alias, moving_to)`` for the group, cached for CACHE_SECONDS."""
+    key = CACHE_KEY.format(group_id=group_id)
+    entry = cache.get(key)
+    if entry is None:
+        row = GroupShard.objects.using(DEFAULT_DB_ALIAS).filter(
+            group_id=group_id
+        ).values_list("alias", "moving_to").first()
+        entry = tuple(row) if row else (DEFAULT_DB_ALIAS, "")
+        cache.set(key, entry, timeout=sharding_settings()["CACHE_SECONDS"])
+    return entry
+
+
+def shard_for_group(group_id):
+    if not is_sharded():
+        return DEFAULT_DB_ALIAS
+    return _entry(group_id)[0]
+
+
+def is_moving(group_id):
+    return is_sharded() and bool(_entry(group_id)[1])
+
+
+def owns(group_id):
+    """
+    Whether the current shard holds the group's live rows and they may
+    be written: not a copy left by or being made for a move.
+    """
+    if not is_sharded():
+        return True
+    alias, moving_to = _entry(group_id)
+    return alias == current() and not moving_to
+
+
+def forget(group_id):
+    cache.delete(CACHE_KEY.format(group_id=group_id))
+
+
+def place_new_group(user_id):
+    """
+    Shard for a group ``user_id`` is creating. By creator, so one
+    person's groups tend to share a shard and cross-group reads touch fewer.
+    """
+    aliases = sharding_settings()["NEW_GROUP_SHARDS"] or shard_aliases()
+    return aliases[user_id % len(aliases)]
+
+
+def record_group(group_id, alias):
+    """Call after creating a group on ``alias``."""
+    if alias == DEFAULT_DB_ALIAS:
+        return
+    GroupShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        group_id=group_id, defaults={"alias": alias}
+    )
+    cache.set(
+        CACHE_KEY.format(group_id=group_id),
+        (alias, ""),
+        timeout=sharding_settings()["CACHE_SECONDS"],
+    )
+
+
+def locate(model, **lookup):
+    """
+    Group id of the ``model`` row matching ``lookup``, or ``None``.
+    Looks on the shard an integer ``pk`` was allocated on first, then
+    on the others.
+    """
+    aliases = shard_aliases()
+    pk = lookup.get("pk")
+    if isinstance(pk, int) and 0 < pk // ID_SPAN < len(aliases):
+        home = aliases[pk // ID_SPAN]
+        aliases = [home] + [a for a in aliases if a != home]
+
+    field = GROUP_FIELDS[model]
+    for alias in aliases:
+        group_id = model._base_manager.using(alias).filter(
+            **lookup
+        ).values_list(field, flat=True).first()
+        if group_id is not None:
+            return group_id
+    return None
+
+
+# ============================================================
+# ✅ CROSS-GROUP READS
+# ============================================================
+def fan_out(build):
+    """
+    Call ``build()`` once per shard with per-group queries routed there.
+    ``build`` must evaluate its querysets. Returns ``[(alias, result)]``;
+    with a single shard that is just one plain call.
+    """
+    if not is_sharded():
+        return [(DEFAULT_DB_ALIAS, build())]
+
+    results = []
+    for alias in shard_aliases():
+        with use_shard(alias):
+            results.append((alias, build()))
+    return results
+
+
+def merge(parts, group_of):
+    """
+    Flatten fan-out results (lists). A group found on two shards is in
+    the middle of a move; its items are taken from its current owner only.
+    """
+    seen = defaultdict(set)
+    for alias, items in parts:
+        for item in items:
+            seen[group_of(item)].add(alias)
+
+    return [
+        item
+        for alias, items in parts
+        for item in items
+        if len(seen[group_of(item)]) == 1 or shard_for_group(group_of(item)) == alias
+    ]
+
+
+# ============================================================
+# ✅ SHARD SETUP (AFTER MIGRATE)
+# ============================================================
+def reserve_id_ranges(alias):
+    """Start the auto ids of per-group tables on ``alias`` at its range."""
+    aliases = shard_aliases()
+    start = aliases.index(alias) * ID_SPAN if alias in aliases else 0
+    if not start:
+        return
+
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        for model in GROUP_FIELDS:
+            pk = model._meta.pk
+            if pk.get_internal_type() not in ("AutoField", "BigAutoField"):
+                continue
+            table = model._meta.db_table
+
+            if connection.vendor == "sqlite":
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute(
+                        "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)",
+                        [table, start - 1],
+                    )
+                elif row[0] < start:
+                    cursor.execute(
+                        "UPDATE sqlite_sequence SET seq = %s WHERE name = %s",
+                        [start - 1, table],
+                    )
+            elif connection.vendor == "postgresql":
+                cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", [table, pk.column])
+                sequence = cursor.fetchone()[0]
+                cursor.execute(f"SELECT last_value FROM {sequence}")
+                if cursor.fetchone()[0] < start:
+                    cursor.execute("SELECT setval(%s, %s)", [sequence, start - 1])
+
+
+def sync_users(alias, user_ids=None, batch_size=1000):
+    """
+    Copy users and profiles from "default" that ``alias`` doesn't have
+    yet (all of them, or just ``user_ids``). Returns the rows copied.
+    """
+    copied = 0
+    for model in REFERENCE_MODELS:
+        source = model._base_manager.using(DEFAULT_DB_ALIAS).order_by("pk")
+        if user_ids is not None:
+            key = "pk__in" if model is User else "user_id__in"
+            source = source.filter(**{key: list(user_ids)})
+
+        last = None
+        while True:
+            batch = source if last is None else source.filter(pk__gt=last)
+            rows = list(batch[:batch_size])
+            if not rows:
+                break
+            last = rows[-1].pk
+
+            present = set(
+                model._base_manager.using(alias).filter(
+                    pk__in=[r.pk for r in rows]
+                ).values_list("pk", flat=True)
+            )
+            missing = [r for r in rows if r.pk not in present]
+            if missing:
+                model._base_manager.using(alias)._insert(
+                    missing, fields=model._meta.concrete_fields, using=alias, raw=True
+                )
+            copied += len(missing)
+    return copied
+
+
+def prepare_shard(using, **kwargs):
+    """post_migrate: give a new shard its id range and the users."""
+    if not is_sharded() or using not in shard_aliases() or using == DEFAULT_DB_ALIAS:
+        return
+    reserve_id_ranges(using)
+    sync_users(using)
+
+
+# ============================================================
+# ✅ KEEP USERS ON EVERY SHARD
+# ============================================================
+def _copy(instance, alias):
+    copy = type(instance)(**{
+        f.attname: getattr(instance, f.attname)
+        for f in instance._meta.concrete_fields
+    })
+    # raw: update-or-insert as is, no auto_now, no further signals acted on
+    copy.save_base(raw=True, using=alias)
+
+
+def replicate_saved(sender, instance, raw=False, using=DEFAULT_DB_ALIAS, **kwargs):
+    if raw or using != DEFAULT_DB_ALIAS or not is_sharded():
+        return
+    for alias in shard_aliases()[1:]:
+        _copy(instance, alias)
+
+
+def replicate_deleted(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    if using != DEFAULT_DB_ALIAS or not is_sharded():
+        return
+    for alias in shard_aliases()[1:]:
+        sender._base_manager.using(alias).filter(pk=instance.pk).delete()
+
+
+# ============================================================
+# ✅ MOVE A GROUP BETWEEN SHARDS
+# ============================================================
+def _referenced_users(group_id, alias):
+    user_ids = set()
+    for model, field in GROUP_TABLES:
+        for f in model._meta.concrete_fields:
+            if f.is_relation and f.related_model is User:
+                user_ids.update(
+                    model._base_manager.using(alias).filter(
+                        **{field: group_id}
+                    ).values_list(f.attname, flat=True).distinct()
+                )
+    user_ids.discard(None)
+    return user_ids
+
+
+def _delete_rows(group_id, alias, batch_size):
+    """Raw-delete the group's rows on ``alias``, children first."""
+    for model, field in reversed(GROUP_TABLES):
+        queryset = model._base_manager.using(alias).filter(**{field: group_id})
+        while True:
+            ids = list(queryset.order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            batch = model._base_manager.using(alias).filter(pk__in=ids)
+            batch._raw_delete(alias)
+
+
+def _copy_rows(model, field, group_id, source, target, batch_size):
+    """Copy one table's rows of the group in pk batches; returns the count."""
+    queryset = model._base_manager.using(source).filter(
+        **{field: group_id}
+    ).order_by("pk")
+    fields = model._meta.concrete_fields
+
+    copied = 0
+    last = None
+    while True:
+        batch = queryset if last is None else queryset.filter(pk__gt=last)
+        rows = list(batch[:batch_size])
+        if not rows:
+            break
+        last = rows[-1].pk
+
+        # raw keeps created_at and every other value as stored
+        with transaction.atomic(using=target):
+            model._base_manager.using(target)._insert(
+                rows, fields=fields, using=target, raw=True
+            )
+        copied += len(rows)
+    return copied
+
+
+def move_group(group_id, target, batch_size=1000, drain=None, log=None):
+    """
+    Copy every row of the group to shard ``target``, switch the
+    directory over and delete the old copy. Reads keep working
+    throughout; writes to this group get 503 until the switch.
+
+    ``drain`` is how long to wait for every worker's cached directory
+    entry to expire (default CACHE_SECONDS). Returns rows copied per table.
+    """
+    log = log or (lambda message: None)
+    drain = sharding_settings()["CACHE_SECONDS"] if drain is None else drain
+
+    if target not in shard_aliases():
+        raise ShardError(f"Unknown shard {target!r}")
+    forget(group_id)
+    source, moving_to = _entry(group_id)
+    if moving_to:
+        raise ShardError(f"Group {group_id} is already moving to {moving_to}")
+    if source == target:
+        raise ShardError(f"Group {group_id} is already on {target}")
+    if not Group._base_manager.using(source).filter(id=group_id).exists():
+        raise ShardError(f"Group {group_id} not found on {source}")
+
+    directory = GroupShard.objects.using(DEFAULT_DB_ALIAS)
+    directory.update_or_create(
+        group_id=group_id, defaults={"alias": source, "moving_to": target}
+    )
+    forget(group_id)
+    log(f"Group {group_id}: writes paused, waiting {drain}s for workers to notice")
+    time.sleep(drain)
+
+    try:
+        sync_users(target, _referenced_users(group_id, source), batch_size)
+        # Leftovers of an earlier, interrupted move
+        _delete_rows(group_id, target, batch_size)
+
+        copied = {}
+        for model, field in GROUP_TABLES:
+            name = model._meta.model_name
+            copied[name] = _copy_rows(model, field, group_id, source, target, batch_size)
+            on_target = model._base_manager.using(target).filter(**{field: group_id}).count()
+            if on_target != copied[name]:
+                raise ShardError(f"{name}: copied {copied[name]} rows, found {on_target}")
+            log(f"  {name}: {copied[name]}")
+    except Exception:
+        directory.filter(group_id=group_id).update(moving_to="")
+        forget(group_id)
+        raise
+
+    directory.filter(group_id=group_id).update(
+        alias=target, moving_to="", moved_from=source
+    )
+    forget(group_id)
+    log(f"Group {group_id}: now on {target}, waiting {drain}s before removing it from {source}")
+    time.sleep(drain)
+
+    _delete_rows(group_id, source, batch_size)
+    directory.filter(group_id=group_id).update(moved_from="")
+    return copied
@@ -0,0 +1,225 @@
+import math
+from decimal import Decimal, InvalidOperation
+
+from .models import ExpenseSplit
+
+
+SPLIT_EQUAL = "EQUAL"
+SPLIT_EXACT = "EXACT"
+SPLIT_PERCENT = "PERCENT"
+SPLIT_SHARES = "SHARES"
+
+SPLIT_TYPES = (SPLIT_EQUAL, SPLIT_EXACT, SPLIT_PERCENT, SPLIT_SHARES)
+
+PAISE = Decimal("0.01")
+
+# PERCENT and SHARES weights: below MAX_WEIGHT, at most 4 decimal places,
+# so scaling them to ints stays cheap whatever a client sends
+WEIGHT_PLACES = Decimal("0.0001")
+MAX_WEIGHT = Decimal("1000000000")
+
+# Largest amount an expense or split row can store, in paise
+MAX_DIGITS = ExpenseSplit._meta.get_field("share_amount").max_digits
+MAX_PAISE = 10 ** MAX_DIGITS - 1
+
+
+class SplitError(ValueError):
+    pass
+
+
+# ============================================================
+# ✅ HELPERS
+# ============================================================
+def to_decimal(value, field="amount"):
+    try:
+        result = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        raise SplitError(f"Invalid {field}: {value}")
+
+    if not result.is_finite():
+        raise SplitError(f"Invalid {field}: {value}")
+
+    return result
+
+
+def to_paise(value, field="amount"):
+    amount = to_decimal(value, field)
+
+    try:
+        # Raises once the digits don't fit the context precision (1e30)
+        rounded = amount.quantize(PAISE)
+    except InvalidOperation:
+        raise SplitError(f"Invalid {field}: {value}")
+
+    if amount != rounded:
+        raise SplitError(f"{field} cannot have more than 2 decimal places")
+
+    return int(amount * 100)
+
+
+def from_paise(paise):
+    return (Decimal(paise) / 100).quantize(PAISE)
+
+
+def format_paise(paise):
+    """Exact ``"-12.05"`` string, without going through Decimal or float."""
+    sign = "-" if paise < 0 else ""
+    rupees, rest = divmod(abs(paise), 100)
+    return f"{sign}{rupees}.{rest:02d}"
+
+
+def to_weight(value, field):
+    weight = to_decimal(value, field)
+
+    # Compare before quantizing: "1e5000000" must not reach the context
+    if weight.copy_abs() >= MAX_WEIGHT:
+        raise SplitError(f"{field} must be below {MAX_WEIGHT}")
+    if weight != weight.quantize(WEIGHT_PLACES):
+        raise SplitError(f"{field} cannot have more than 4 decimal places")
+
+    return weight
+
+
+def _scaled(raw, field):
+    """
+    Turn decimal weights into ints sharing one common scale.
+    Returns ``(int_weights, scale)``.
+    """
+    ratios = [to_weight(v, field).as_integer_ratio() for v in raw]
+    scale = math.lcm(*(d for _, d in ratios))
+    return [n * (scale // d) for n, d in ratios], scale
+
+
+def _allocate(total_paise, weights):
+    """
+    Largest-remainder allocation of ``total_paise`` over int ``weights``.
+
+    Every member first gets the floor of their exact quota, then the
+    leftover paise go one each to the largest fractional remainders.
+    Ties keep the input order, so the result is deterministic and always
+    sums to ``total_paise``.
+    """
+    weight_sum = sum(weights)
+
+    floors = []
+    remainders = []
+    for w in weights:
+        q, r = divmod(total_paise * w, weight_sum)
+        floors.append(q)
+        remainders.append(r)
+
+    leftover = total_paise - sum(floors)
+    if leftover:
+        order = sorted(range(len(weights)), key=lambda i: (-remainders[i], i))
+        for i in order[:leftover]:
+            floors[i] += 1
+
+    return floors
+
+
+def _values_for(user_ids, values, field):
+    if not isinstance(values, dict):
+        raise SplitError("values must map user id to a number")
+
+    by_user = {str(k): v for k, v in values.items()}
+    missing = [uid for uid in user_ids if str(uid) not in by_user]
+    if missing:
+        raise SplitError(f"Missing {field} for users: {missing}")
+
+    extra = set(by_user) - {str(uid) for uid in user_ids}
+    if extra:
+        raise SplitError(f"Values given for users outside the split: {sorted(extra)}")
+
+    return [by_user[str(uid)] for uid in user_ids]
+
+
+# ============================================================
+# ✅ SPLIT ENGINE
+# ============================================================
+def compute_split_paise(total_paise, split_type, user_ids, values=None):
+    """
+    Split ``total_paise`` between ``user_ids``.
+
+    Returns a list of ``(user_id, share_paise)`` pairs in the order of
+    ``user_ids`` whose shares add up exactly to ``total_paise``.
+    """
+    user_ids = list(user_ids)
+
+    if not user_ids:
+        raise SplitError("At least one member is required")
+    if len(set(user_ids)) != len(user_ids):
+        raise SplitError("Members must be unique")
+    if total_paise <= 0:
+        raise SplitError("amount must be greater than zero")
+
+    if split_type == SPLIT_EQUAL:
+        base, leftover = divmod(total_paise, len(user_ids))
+        shares = [base + 1 if i < leftover else base for i in range(len(user_ids))]
+
+    elif split_type == SPLIT_EXACT:
+        raw = _values_for(user_ids, values, "amount")
+        shares = [to_paise(v, "amount") for v in raw]
+        if any(s < 0 for s in shares):
+            raise SplitError("Split amounts cannot be negative")
+        if sum(shares) != total_paise:
+            raise SplitError(
+                f"Split amounts add up to {from_paise(sum(shares))}, "
+                f"expected {from_paise(total_paise)}"
+            )
+
+    elif split_type == SPLIT_PERCENT:
+        raw = _values_for(user_ids, values, "percentage")
+        percents, scale = _scaled(raw, "percentage")
+        if any(p < 0 for p in percents):
+            raise SplitError("Percentages cannot be negative")
+        if sum(percents) != 100 * scale:
+            raise SplitError("Percentages must add up to 100")
+        shares = _allocate(total_paise, percents)
+
+    elif split_type == SPLIT_SHARES:
+        raw = _values_for(user_ids, values, "shares")
+        weights, _ = _scaled(raw, "shares")
+        if any(w < 0 for w in weights):
+            raise SplitError("Shares cannot be negative")
+        if sum(weights) == 0:
+            raise SplitError("Total shares must be greater than zero")
+        shares = _allocate(total_paise, weights)
+
+    else:
+        raise SplitError(f"Unknown split_type: {split_type}")
+
+    return list(zip(user_ids, shares))
+
+
+def compute_splits(amount, split_type, user_ids, values=None):
+    """
+    Decimal front-end to ``compute_split_paise``.
+    Returns ``(user_id, Decimal share)`` pairs.
+    """
+    total_paise = to_paise(amount)
+    if abs(total_paise) > MAX_PAISE:
+        raise SplitError(f"amount cannot have more than {MAX_DIGITS} digits")
+
+    return [
+        (user_id, from_paise(share))
+        for user_id, share in compute_split_paise(
+            total_paise, split_type, user_ids, values
+        )
+    ]
+
+
+def create_expense_splits(expense, shares, batch_size=500):
+    """
+    Persist ``(user_id, share)`` pairs for ``expense`` in one bulk insert.
+    """
+    return ExpenseSplit.objects.bulk_create(
+        [
+            ExpenseSplit(
+                expense=expense,
+                user_id=user_id,
+                share_amount=share,
+            )
+            for user_id, share in shares
+        ],
+        batch_size=batch_size,
+    )
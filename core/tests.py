@@ -1,3 +1,2374 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import unittest
+import unittest.mock
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from .models import (
+    ArchivedExpense,
+    ArchivedExpenseSplit,
+    BalanceSnapshot,
+    CarriedBalance,
+    CoMembership,
+    Group,
+    GroupInvite,
+    GroupMember,
+    GroupPurge,
+    GroupShard,
+    Expense,
+    IdempotencyKey,
+    ExpenseSplit,
+    PasswordResetOTP,
+    Settlement,
+    SpendingRollup,
+    UserProfile,
+    WalletContribution,
+    WalletExpense,
+)
+from . import archive, janitor, routers, sharding
+from .ratelimit import hit
+from .services import calculate_net_balances, simplify_debts, take_balance_snapshot
+from .splits import (
+    SPLIT_EQUAL,
+    SPLIT_EXACT,
+    SPLIT_PERCENT,
+    SPLIT_SHARES,
+    SplitError,
+    compute_split_paise,
+    compute_splits,
+    format_paise,
+    from_paise,
+)
+
+
+RUN_BENCHMARKS = os.getenv("RUN_BENCHMARKS") == "1"
+
+
+def make_group(member_count, name="Trip"):
+    users = User.objects.bulk_create(
+        [User(username=f"{name.lower()}{i}") for i in range(member_count)]
+    )
+    group = Group.objects.create(name=name, created_by=users[0])
+    GroupMember.objects.bulk_create(
+        [GroupMember(group=group, user=u) for u in users]
+    )
+    return group, users
+
+
+# =====================================================
+# ✂️ SPLIT ENGINE
+# =====================================================
+class SplitEngineTests(TestCase):
+    def test_equal_split_spreads_remainder(self):
+        shares = compute_splits("100.00", SPLIT_EQUAL, [1, 2, 3])
+        self.assertEqual(
+            shares,
+            [(1, Decimal("33.34")), (2, Decimal("33.33")), (3, Decimal("33.33"))],
+        )
+
+    def test_exact_split_must_match_amount(self):
+        shares = compute_splits(
+            "50", SPLIT_EXACT, [1, 2], {"1": "20.50", "2": "29.50"}
+        )
+        self.assertEqual(shares, [(1, Decimal("20.50")), (2, Decimal("29.50"))])
+
+        with self.assertRaises(SplitError):
+            compute_splits("50", SPLIT_EXACT, [1, 2], {"1": "20", "2": "20"})
+
+    def test_percent_split(self):
+        shares = compute_splits(
+            "10", SPLIT_PERCENT, [1, 2, 3], {1: "33.33", 2: "33.33", 3: "33.34"}
+        )
+        self.assertEqual(sum(s for _, s in shares), Decimal("10.00"))
+
+        with self.assertRaises(SplitError):
+            compute_splits("10", SPLIT_PERCENT, [1, 2], {1: 50, 2: 40})
+
+    def test_shares_split(self):
+        shares = compute_splits("100", SPLIT_SHARES, [1, 2], {1: 1, 2: 3})
+        self.assertEqual(shares, [(1, Decimal("25.00")), (2, Decimal("75.00"))])
+
+    def test_rejects_bad_input(self):
+        with self.assertRaises(SplitError):
+            compute_splits("10.001", SPLIT_EQUAL, [1])
+        with self.assertRaises(SplitError):
+            compute_splits("10", SPLIT_EQUAL, [])
+        with self.assertRaises(SplitError):
+            compute_splits("10", "CUSTOM", [1])
+        with self.assertRaises(SplitError):
+            compute_splits("10", SPLIT_SHARES, [1, 2], {1: 1})
+        with self.assertRaises(SplitError):
+            compute_splits("1e30", SPLIT_EQUAL, [1])
+        with self.assertRaises(SplitError):
+            compute_splits("100", SPLIT_SHARES, [1, 2], {1: "1e5000000", 2: "1e-5000000"})
+        with self.assertRaises(SplitError):
+            compute_splits("100", SPLIT_PERCENT, [1, 2], {1: "50.00001", 2: "49.99999"})
+        with self.assertRaises(SplitError):
+            compute_splits("100000000.00", SPLIT_EQUAL, [1])
+
+    def test_property_shares_always_sum_to_amount(self):
+        rng = random.Random(26)
+
+        for _ in range(500):
+            n = rng.randint(1, 40)
+            users = rng.sample(range(1, 1000), n)
+            total = rng.randint(1, 10_000_000)
+            split_type = rng.choice([SPLIT_EQUAL, SPLIT_PERCENT, SPLIT_SHARES, SPLIT_EXACT])
+
+            if split_type == SPLIT_SHARES:
+                values = {u: rng.randint(1, 10) for u in users}
+            elif split_type == SPLIT_PERCENT:
+                cuts = sorted(rng.randint(0, 10_000) for _ in range(n - 1))
+                bounds = [0] + cuts + [10_000]
+                values = {
+                    u: Decimal(bounds[i + 1] - bounds[i]) / 100
+                    for i, u in enumerate(users)
+                }
+            elif split_type == SPLIT_EXACT:
+                cuts = sorted(rng.randint(0, total) for _ in range(n - 1))
+                bounds = [0] + cuts + [total]
+                values = {
+                    u: Decimal(bounds[i + 1] - bounds[i]) / 100
+                    for i, u in enumerate(users)
+                }
+            else:
+                values = None
+
+            result = compute_split_paise(total, split_type, users, values)
+            again = compute_split_paise(total, split_type, users, values)
+
+            self.assertEqual(result, again)
+            self.assertEqual([u for u, _ in result], users)
+            self.assertEqual(sum(s for _, s in result), total)
+            self.assertTrue(all(s >= 0 for _, s in result))
+
+            if split_type == SPLIT_EQUAL:
+                amounts = [s for _, s in result]
+                self.assertLessEqual(max(amounts) - min(amounts), 1)
+            elif split_type in (SPLIT_SHARES, SPLIT_PERCENT):
+                weight_sum = sum(Decimal(str(v)) for v in values.values())
+                for u, s in result:
+                    exact = Decimal(total) * Decimal(str(values[u])) / weight_sum
+                    self.assertLess(abs(s - exact), 1)
+
+
+class ExpenseCreateSplitTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def test_equal_split_over_whole_group(self):
+        res = self.client.post(
+            "/api/expenses/",
+            {"group": self.group.id, "title": "Dinner", "amount": "100"},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 201)
+
+        splits = ExpenseSplit.objects.filter(expense_id=res.data["id"])
+        self.assertEqual(splits.count(), 3)
+        self.assertEqual(sum(s.share_amount for s in splits), Decimal("100.00"))
+
+    def test_shares_split_over_subset(self):
+        a, b, _ = self.users
+        res = self.client.post(
+            "/api/expenses/",
+            {
+                "group": self.group.id,
+                "title": "Cab",
+                "amount": "90",
+                "split_type": "SHARES",
+                "members": [a.id, b.id],
+                "values": {str(a.id): 2, str(b.id): 1},
+            },
+            format="json",
+        )
+        self.assertEqual(res.status_code, 201)
+
+        shares = dict(
+            ExpenseSplit.objects.filter(expense_id=res.data["id"])
+            .values_list("user_id", "share_amount")
+        )
+        self.assertEqual(shares, {a.id: Decimal("60.00"), b.id: Decimal("30.00")})
+
+    def test_invalid_split_creates_nothing(self):
+        res = self.client.post(
+            "/api/expenses/",
+            {
+                "group": self.group.id,
+                "title": "Cab",
+                "amount": "90",
+                "split_type": "PERCENT",
+                "values": {str(u.id): 10 for u in self.users},
+            },
+            format="json",
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_huge_amount_is_a_400(self):
+        res = self.client.post(
+            "/api/expenses/",
+            {"group": self.group.id, "title": "Cab", "amount": "1e30"},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_members_must_be_a_list(self):
+        res = self.client.post(
+            "/api/expenses/",
+            {"group": self.group.id, "title": "Cab", "amount": "90", "members": "12"},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_rejects_members_outside_group(self):
+        outsider = User.objects.create_user(username="outsider", password="pw")
+        res = self.client.post(
+            "/api/expenses/",
+            {
+                "group": self.group.id,
+                "title": "Cab",
+                "amount": "90",
+                "members": [outsider.id],
+            },
+            format="json",
+        )
+        self.assertEqual(res.status_code, 400)
+
+    def test_split_inserts_are_batched(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(
+                "/api/expenses/",
+                {"group": self.group.id, "title": "Dinner", "amount": "100"},
+                format="json",
+            )
+
+        split_inserts = [
+            q for q in ctx.captured_queries
+            if q["sql"].startswith('INSERT INTO "core_expensesplit"')
+        ]
+        self.assertEqual(len(split_inserts), 1)
+
+
+# =====================================================
+# 🤝 SETTLE ALL
+# =====================================================
+class SettleAllTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(4)
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+        for payer, amount in zip(self.users[:3], ("100", "55.55", "10")):
+            self.client.force_authenticate(payer)
+            self.client.post(
+                "/api/expenses/",
+                {"group": self.group.id, "title": "Food", "amount": amount},
+                format="json",
+            )
+        self.client.force_authenticate(self.users[0])
+
+    def settle_up(self):
+        res = self.client.get(f"/api/groups/{self.group.id}/settle_up/")
+        return res.data, res["X-Plan-Hash"]
+
+    def test_settle_all_zeroes_balances(self):
+        plan, plan_hash = self.settle_up()
+        self.assertTrue(plan)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(
+                f"/api/groups/{self.group.id}/settle_all/",
+                {"plan_hash": plan_hash},
+                format="json",
+            )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["settlements"], plan)
+
+        inserts = [
+            q for q in ctx.captured_queries
+            if q["sql"].startswith('INSERT INTO "core_settlement"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Settlement.objects.filter(status="PAID").count(), len(plan))
+        self.assertTrue(
+            all(v == 0 for v in calculate_net_balances(self.group.id).values())
+        )
+
+        plan, _ = self.settle_up()
+        self.assertEqual(plan, [])
+
+    def test_stale_hash_is_rejected(self):
+        _, plan_hash = self.settle_up()
+
+        self.client.post(
+            "/api/expenses/",
+            {"group": self.group.id, "title": "Late", "amount": "7"},
+            format="json",
+        )
+
+        res = self.client.post(
+            f"/api/groups/{self.group.id}/settle_all/",
+            {"plan_hash": plan_hash},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 409)
+        self.assertNotEqual(res.data["plan_hash"], plan_hash)
+        self.assertFalse(Settlement.objects.exists())
+
+    def test_requires_membership(self):
+        _, plan_hash = self.settle_up()
+        outsider = User.objects.create(username="outsider")
+        self.client.force_authenticate(outsider)
+
+        res = self.client.post(
+            f"/api/groups/{self.group.id}/settle_all/",
+            {"plan_hash": plan_hash},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 404)
+
+
+# =====================================================
+# 📊 MY BALANCES
+# =====================================================
+class MyBalancesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.groups = []
+
+        for name in ("Goa", "Flat", "Office"):
+            group, users = make_group(3, name=name)
+            self.groups.append((group, users))
+
+        # "me" is the first member of every group
+        self.me = self.groups[0][1][0]
+        for group, _ in self.groups[1:]:
+            GroupMember.objects.create(group=group, user=self.me)
+
+    def add_expense(self, group, payer, amount):
+        self.client.force_authenticate(payer)
+        res = self.client.post(
+            "/api/expenses/",
+            {"group": group.id, "title": "x", "amount": amount},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 201)
+
+    def test_matches_per_group_replay(self):
+        (goa, goa_users), (flat, flat_users), (office, _) = self.groups
+
+        self.add_expense(goa, self.me, "90")
+        self.add_expense(goa, goa_users[1], "30")
+        self.add_expense(flat, flat_users[1], "100")
+        Settlement.objects.create(
+            group=flat, from_user=self.me, to_user=flat_users[1],
+            amount=Decimal("10"), status="PAID",
+        )
+        Settlement.objects.create(
+            group=flat, from_user=self.me, to_user=flat_users[1],
+            amount=Decimal("99"), status="PENDING",
+        )
+
+        self.client.force_authenticate(self.me)
+        with self.assertNumQueries(5):
+            res = self.client.get("/api/me/balances/")
+        self.assertEqual(res.status_code, 200)
+
+        by_group = {g["group_id"]: g["net_balance"] for g in res.data["groups"]}
+        for group, _ in self.groups:
+            expected = calculate_net_balances(group.id).get(self.me.id, 0)
+            self.assertEqual(by_group[group.id], format_paise(expected))
+
+        self.assertEqual(by_group[office.id], "0.00")
+        self.assertEqual(
+            Decimal(res.data["total"]), sum(Decimal(v) for v in by_group.values())
+        )
+
+
+# =====================================================
+# 📈 SPENDING ROLLUPS
+# =====================================================
+class SpendingRollupTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def snapshot(self):
+        return sorted(
+            SpendingRollup.objects.values_list(
+                "group_id", "user_id", "month",
+                "paid", "share", "wallet_spent", "expense_count",
+            )
+        )
+
+    def test_incremental_matches_rebuild(self):
+        res = self.client.post(
+            "/api/expenses/",
+            {"group": self.group.id, "title": "Dinner", "amount": "100"},
+            format="json",
+        )
+        self.client.post(
+            "/api/expenses/",
+            {"group": self.group.id, "title": "Cab", "amount": "30"},
+            format="json",
+        )
+        self.client.post(
+            "/api/wallet-expenses/",
+            {"group": self.group.id, "title": "Milk", "amount": "12.50"},
+            format="json",
+        )
+        self.client.patch(
+            f"/api/expenses/{res.data['id']}/", {"amount": "90"}, format="json"
+        )
+        self.client.delete(f"/api/expenses/{res.data['id']}/")
+
+        incremental = self.snapshot()
+        call_command("rebuild_rollups", stdout=open(os.devnull, "w"))
+
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(WalletExpense.objects.get().added_by, self.users[0])
+
+    def test_group_analytics_reads_rollups(self):
+        self.client.post(
+            "/api/expenses/",
+            {"group": self.group.id, "title": "Dinner", "amount": "99"},
+            format="json",
+        )
+        month = SpendingRollup.objects.first().month.strftime("%Y-%m")
+
+        with self.assertNumQueries(2):
+            res = self.client.get(
+                f"/api/groups/{self.group.id}/analytics/",
+                {"from": month, "to": month},
+            )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]["total_spent"], "99.00")
+        self.assertEqual(
+            sum(Decimal(m["share"]) for m in res.data[0]["members"]), Decimal("99.00")
+        )
+
+        url = f"/api/groups/{self.group.id}/analytics/"
+        res = self.client.get(url, {"from": "2001-01", "to": "2001-12"})
+        self.assertEqual(res.data, [])
+
+        res = self.client.get(url, {"from": "bad"})
+        self.assertEqual(res.status_code, 400)
+
+    def test_user_analytics_by_group_type(self):
+        self.client.post(
+            "/api/expenses/",
+            {"group": self.group.id, "title": "Dinner", "amount": "99"},
+            format="json",
+        )
+        res = self.client.get("/api/me/analytics/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data[0]["by_group_type"]["OTHER"]["share"], "33.00")
+        self.assertEqual(res.data[0]["total_share"], "33.00")
+
+
+# =====================================================
+# 📸 POINT-IN-TIME BALANCES
+# =====================================================
+class BalancesAsOfTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(3)
+        self.client = APIClient()
+        self.start = timezone.now() - timedelta(days=30)
+
+        # one expense per day, alternating payers; a settlement on day 10
+        for day in range(20):
+            payer = self.users[day % 3]
+            self.client.force_authenticate(payer)
+            res = self.client.post(
+                "/api/expenses/",
+                {
+                    "group": self.group.id,
+                    "title": f"Day {day}",
+                    "amount": f"{day + 1}0.01",
+                },
+                format="json",
+            )
+            Expense.objects.filter(id=res.data["id"]).update(
+                created_at=self.start + timedelta(days=day)
+            )
+
+        settlement = Settlement.objects.create(
+            group=self.group, from_user=self.users[1], to_user=self.users[0],
+            amount=Decimal("25.00"), status="PAID",
+        )
+        Settlement.objects.filter(id=settlement.id).update(
+            created_at=self.start + timedelta(days=10, hours=1)
+        )
+        self.client.force_authenticate(self.users[0])
+
+    def replay(self, as_of):
+        """Reference: full replay of rows created up to as_of."""
+        net = {u.id: Decimal("0") for u in self.users}
+        for exp in Expense.objects.filter(created_at__lte=as_of):
+            net[exp.paid_by_id] += exp.amount
+            for sp in exp.splits.all():
+                net[sp.user_id] -= sp.share_amount
+        for st in Settlement.objects.filter(created_at__lte=as_of, status="PAID"):
+            net[st.from_user_id] += st.amount
+            net[st.to_user_id] -= st.amount
+        return {k: f"{v:.2f}" for k, v in net.items()}
+
+    def balances(self, as_of):
+        res = self.client.get(
+            f"/api/groups/{self.group.id}/balances/",
+            {"as_of": as_of.isoformat()},
+        )
+        self.assertEqual(res.status_code, 200)
+        got = {u.id: "0.00" for u in self.users}
+        got.update({b["user_id"]: b["net_balance"] for b in res.data["balances"]})
+        return got, res.data
+
+    def test_matches_full_replay_with_and_without_snapshots(self):
+        checkpoints = [
+            self.start + timedelta(days=d, hours=12) for d in (0, 5, 10, 15, 25)
+        ]
+
+        for as_of in checkpoints:
+            got, data = self.balances(as_of)
+            self.assertIsNone(data["snapshot_at"])
+            self.assertEqual(got, self.replay(as_of))
+
+        for d in (3, 9, 14):
+            at = self.start + timedelta(days=d, hours=6)
+            self.assertIsNotNone(take_balance_snapshot(self.group.id, at))
+
+        for as_of in checkpoints:
+            got, _ = self.balances(as_of)
+            self.assertEqual(got, self.replay(as_of))
+
+        _, data = self.balances(checkpoints[2])
+        self.assertEqual(
+            parse_datetime(data["snapshot_at"]), self.start + timedelta(days=9, hours=6)
+        )
+
+    def test_edits_and_deletes_after_a_snapshot_invalidate_it(self):
+        pending = Settlement.objects.create(
+            group=self.group, from_user=self.users[2], to_user=self.users[0],
+            amount=Decimal("40.00"), status="PENDING",
+        )
+        Settlement.objects.filter(id=pending.id).update(
+            created_at=self.start + timedelta(days=2)
+        )
+        now = timezone.now()
+        take_balance_snapshot(self.group.id, now)
+
+        expense = Expense.objects.filter(title="Day 4").get()
+        self.assertEqual(self.client.delete(f"/api/expenses/{expense.id}/").status_code, 204)
+        self.assertEqual(self.balances(now)[0], self.replay(now))
+
+        split = ExpenseSplit.objects.filter(expense__title="Day 7").first()
+        res = self.client.patch(
+            f"/api/expense-splits/{split.id}/", {"share_amount": "1.00"}, format="json"
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.balances(now)[0], self.replay(now))
+
+        res = self.client.patch(
+            f"/api/settlements/{pending.id}/", {"status": "PAID"}, format="json"
+        )
+        self.assertEqual(res.status_code, 200)
+        got, data = self.balances(now)
+        self.assertEqual(got, self.replay(now))
+        self.assertIsNone(data["snapshot_at"])
+
+        net = calculate_net_balances(self.group.id)
+        self.assertEqual(
+            {u: v for u, v in got.items() if v != "0.00"},
+            {u: format_paise(v) for u, v in net.items() if v},
+        )
+
+    def test_query_count_is_bounded(self):
+        take_balance_snapshot(self.group.id, self.start + timedelta(days=15))
+
+        # group lookup, snapshot lookup, archive cut-off and four delta aggregates
+        with self.assertNumQueries(7):
+            self.balances(timezone.now())
+
+    def test_snapshot_command_skips_unchanged_groups(self):
+        out = open(os.devnull, "w")
+        call_command("snapshot_balances", stdout=out)
+        call_command("snapshot_balances", stdout=out)
+        self.assertEqual(BalanceSnapshot.objects.count(), 1)
+
+    def test_rejects_bad_timestamp(self):
+        res = self.client.get(
+            f"/api/groups/{self.group.id}/balances/", {"as_of": "yesterday"}
+        )
+        self.assertEqual(res.status_code, 400)
+
+
+# =====================================================
+# 🔎 EXPENSE SEARCH
+# =====================================================
+class ExpenseSearchTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(2)
+        self.other, _ = make_group(2, name="Other")
+        self.me = self.users[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.me)
+
+        for title in ("Dinner at Goa", "Breakfast", "Dinner cab", "Groceries"):
+            self.client.post(
+                "/api/expenses/",
+                {"group": self.group.id, "title": title, "amount": "10"},
+                format="json",
+            )
+        WalletExpense.objects.create(
+            group=self.group, added_by=self.me, amount=Decimal("5"),
+            title="Dinner snacks",
+        )
+        Expense.objects.create(
+            group=self.other, paid_by=self.other.created_by,
+            amount=Decimal("5"), title="Dinner elsewhere",
+        )
+
+    def search(self, q, **params):
+        res = self.client.get("/api/search/expenses/", {"q": q, **params})
+        self.assertEqual(res.status_code, 200)
+        return res.data
+
+    def test_finds_prefix_matches_in_my_groups_only(self):
+        data = self.search("din")
+        titles = sorted(r["title"] for r in data["results"])
+        self.assertEqual(titles, ["Dinner at Goa", "Dinner cab", "Dinner snacks"])
+        self.assertIn("wallet_expense", {r["type"] for r in data["results"]})
+        self.assertEqual(
+            sorted(r["amount"] for r in data["results"]), ["10.00", "10.00", "5.00"]
+        )
+
+        data = self.search("dinner goa")
+        self.assertEqual([r["title"] for r in data["results"]], ["Dinner at Goa"])
+
+    def test_index_follows_updates_and_deletes(self):
+        expense = Expense.objects.get(title="Groceries")
+        expense.title = "Vegetables"
+        expense.save()
+        self.assertEqual(self.search("groceries")["results"], [])
+        self.assertEqual(len(self.search("veg")["results"]), 1)
+
+        expense.delete()
+        self.assertEqual(self.search("veg")["results"], [])
+
+    def test_pagination(self):
+        first = self.search("dinner", page_size=2)
+        second = self.search("dinner", page_size=2, page=2)
+
+        self.assertTrue(first["has_next"])
+        self.assertFalse(second["has_next"])
+        ids = [(r["type"], r["id"]) for r in first["results"] + second["results"]]
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_query_syntax_is_not_injected(self):
+        self.assertEqual(len(self.search('din"* (')["results"]), 3)
+        self.assertEqual(self.search('"()')["results"], [])
+
+
+# =====================================================
+# 👥 USER SUGGESTIONS
+# =====================================================
+class UserSuggestTests(TestCase):
+    def setUp(self):
+        self.me = User.objects.create(username="me")
+        self.friend = User.objects.create(username="ravi_k", email="ravi@x.com")
+        self.stranger = User.objects.create(username="ravi_a", email="a@x.com")
+        self.phone_user = User.objects.create(username="zed")
+        UserProfile.objects.create(user=self.phone_user, phone="9876543210")
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.me)
+
+        res = self.client.post("/api/groups/", {"name": "Flat"}, format="json")
+        self.group_id = res.data["id"]
+        self.client.post(
+            "/api/members/",
+            {"group": self.group_id, "identifier": "ravi_k"},
+            format="json",
+        )
+
+    def suggest(self, q, **params):
+        res = self.client.get("/api/users/suggest/", {"q": q, **params})
+        self.assertEqual(res.status_code, 200)
+        return [r["username"] for r in res.data]
+
+    def test_prefers_people_i_share_groups_with(self):
+        self.assertEqual(self.suggest("ravi"), ["ravi_k", "ravi_a"])
+        self.assertEqual(self.suggest("RAVI"), ["ravi_k", "ravi_a"])
+
+    def test_matches_email_and_phone_prefixes_of_co_members_only(self):
+        self.assertEqual(self.suggest("ravi@"), ["ravi_k"])
+        self.assertEqual(self.suggest("a@"), [])
+        self.assertEqual(self.suggest("098-765"), [])
+        self.assertEqual(self.suggest("me"), [])
+
+    def test_strangers_need_an_exact_email_or_phone(self):
+        self.assertEqual(self.suggest("A@x.com"), ["ravi_a"])
+        self.assertEqual(self.suggest("+91 98765 43210"), ["zed"])
+
+    def test_never_returns_a_strangers_email_or_phone(self):
+        for q in ("ravi", "a@x.com", "9876543210", "zed"):
+            res = self.client.get("/api/users/suggest/", {"q": q})
+            for row in res.data:
+                self.assertEqual(set(row), {"id", "username", "contact", "shared_groups"})
+                self.assertNotIn("a@x.com", str(row))
+                self.assertNotIn("9876543210", str(row))
+
+        res = self.client.get("/api/users/suggest/", {"q": "a@x.com"})
+        self.assertEqual(res.data[0]["contact"], "a***@x.com")
+        res = self.client.get("/api/users/suggest/", {"q": "9876543210"})
+        self.assertEqual(res.data[0]["contact"], "******3210")
+
+    def test_can_exclude_current_members(self):
+        self.assertEqual(self.suggest("ravi", group=self.group_id), ["ravi_a"])
+
+    def test_counts_follow_membership_changes(self):
+        pair = CoMembership.objects.get(user=self.me, other=self.friend)
+        self.assertEqual(pair.shared_groups, 1)
+
+        member = GroupMember.objects.get(group_id=self.group_id, user=self.friend)
+        self.client.delete(f"/api/members/{member.id}/")
+        self.assertFalse(CoMembership.objects.exists())
+
+        GroupMember.objects.create(group_id=self.group_id, user=self.friend)
+        call_command("rebuild_comembership", stdout=open(os.devnull, "w"))
+        self.assertEqual(CoMembership.objects.count(), 2)
+
+        self.client.delete(f"/api/groups/{self.group_id}/")
+        self.assertFalse(CoMembership.objects.exists())
+
+    def test_query_count_is_constant(self):
+        # username + phone scans, candidate rows, shared counts
+        with self.assertNumQueries(4):
+            self.suggest("9876543210")
+
+
+# =====================================================
+# 🧹 JANITOR
+# =====================================================
+class JanitorTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(1)
+        user = self.users[0]
+        old = timezone.now() - timedelta(hours=1)
+
+        PasswordResetOTP.objects.create(user=user, otp="111111")
+        PasswordResetOTP.objects.create(user=user, otp="222222", is_used=True)
+        for _ in range(5):
+            otp = PasswordResetOTP.objects.create(user=user, otp="333333")
+            PasswordResetOTP.objects.filter(id=otp.id).update(created_at=old)
+
+        GroupInvite.objects.create(group=self.group, created_by=user)
+        GroupInvite.objects.create(group=self.group, created_by=user, expires_at=old)
+        GroupInvite.objects.create(group=self.group, created_by=user, is_active=False)
+
+    def janitor(self, *args):
+        out = io.StringIO()
+        call_command("janitor", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_only_counts(self):
+        out = self.janitor("--dry-run")
+        self.assertIn("Would delete 6 otps", out)
+        self.assertIn("Would delete 2 invites", out)
+        self.assertEqual(PasswordResetOTP.objects.count(), 7)
+
+    def test_purges_in_batches(self):
+        with CaptureQueriesContext(connection) as ctx:
+            out = self.janitor("--batch-size", "2", "--only", "otps")
+
+        self.assertIn("Deleted 6 otps", out)
+        deletes = [q for q in ctx.captured_queries if q["sql"].startswith("DELETE")]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(PasswordResetOTP.objects.get().otp, "111111")
+
+        self.janitor()
+        self.assertEqual(GroupInvite.objects.count(), 1)
+        self.assertIn("Deleted 0 otps", self.janitor())
+
+
+# =====================================================
+# 🚦 RATE LIMITING
+# =====================================================
+@override_settings(RATE_LIMITS={
+    "login": {"ip": (5, 60), "identifier": (2, 60)},
+    "forgot_password": {"ip": (5, 60), "identifier": (1, 60)},
+})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        User.objects.create_user(username="asha", password="right-pw", email="a@x.com")
+
+    def login(self, identifier, ip="10.0.0.1"):
+        return self.client.post(
+            "/api/auth/login/",
+            {"identifier": identifier, "password": "wrong"},
+            format="json",
+            REMOTE_ADDR=ip,
+        )
+
+    def test_blocks_per_identifier_before_any_query(self):
+        self.assertEqual(self.login("asha").status_code, 401)
+        self.assertEqual(self.login("ASHA ").status_code, 401)
+
+        with self.assertNumQueries(0):
+            res = self.login("asha", ip="10.0.0.2")
+        self.assertEqual(res.status_code, 429)
+        self.assertGreaterEqual(int(res["Retry-After"]), 1)
+
+        # other identifiers are still allowed
+        self.assertEqual(self.login("someone").status_code, 401)
+
+    def test_blocks_per_ip(self):
+        for i in range(5):
+            self.assertEqual(self.login(f"user{i}").status_code, 401)
+        self.assertEqual(self.login("user9").status_code, 429)
+        self.assertEqual(self.login("user9", ip="10.0.0.9").status_code, 401)
+
+    def test_forgot_password_limited_by_email(self):
+        self.client.post("/api/auth/forgot-password/", {"email": "nobody@x.com"})
+        res = self.client.post("/api/auth/forgot-password/", {"email": "nobody@x.com"})
+        self.assertEqual(res.status_code, 429)
+
+    def test_window_slides(self):
+        start = 60 * 20_000.0
+        for _ in range(3):
+            self.assertTrue(hit("t", 3, 60, now=start)[0])
+
+        allowed, retry_after = hit("t", 3, 60, now=start + 30)
+        self.assertFalse(allowed)
+        self.assertEqual(retry_after, 30)
+
+        # halfway into the next window, half of the old count still weighs in
+        self.assertTrue(hit("t", 3, 60, now=start + 90)[0])
+        self.assertTrue(hit("t", 3, 60, now=start + 90)[0])
+        self.assertFalse(hit("t", 3, 60, now=start + 90)[0])
+
+    def test_stats_are_staff_only(self):
+        self.login("asha")
+        self.client.force_authenticate(User.objects.create(username="s", is_staff=True))
+        res = self.client.get("/api/auth/rate-limits/")
+        self.assertEqual(res.data["login"], {"allowed": 1, "blocked": 0})
+
+        self.client.force_authenticate(User.objects.create(username="n"))
+        self.assertEqual(self.client.get("/api/auth/rate-limits/").status_code, 403)
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, "set RUN_BENCHMARKS=1 to run benchmarks")
+class RateLimitBenchmark(TestCase):
+    def test_check_overhead(self):
+        cache.clear()
+        rounds = 20_000
+        start = time.perf_counter()
+        for i in range(rounds):
+            hit(f"bench:{i % 500}", 1_000_000, 60)
+        elapsed = time.perf_counter() - start
+        print(f"\nratelimit hit: {elapsed / rounds * 1e6:.1f} us/check (locmem)")
+
+
+# =====================================================
+# 🌱 SEED DATA
+# =====================================================
+class SeedLoadTests(TestCase):
+    def seed(self, prefix):
+        call_command(
+            "seed_load",
+            "--users", "40", "--groups", "6", "--seed", "7",
+            "--prefix", prefix, "--expenses-max", "30", "--batch-size", "25",
+            "--members-max", "12", "--wallet-ratio", "1",
+            stdout=io.StringIO(),
+        )
+        return Group.objects.filter(name__startswith=f"{prefix}7_")
+
+    def test_generates_consistent_ledgers(self):
+        groups = self.seed("a")
+        self.assertEqual(groups.count(), 6)
+        self.assertEqual(User.objects.filter(username__startswith="a7_").count(), 40)
+        self.assertTrue(WalletExpense.objects.exists())
+        self.assertTrue(GroupInvite.objects.exists())
+
+        for expense in Expense.objects.prefetch_related("splits"):
+            self.assertEqual(
+                sum(s.share_amount for s in expense.splits.all()), expense.amount
+            )
+        for group in groups:
+            self.assertEqual(sum(calculate_net_balances(group.id).values()), 0)
+
+        self.assertTrue(SpendingRollup.objects.exists())
+        self.assertNotEqual(
+            Expense.objects.order_by("created_at").first().created_at.date(),
+            timezone.now().date(),
+        )
+
+    def test_same_seed_same_data(self):
+        def shape(prefix):
+            return [
+                (
+                    g.group_type,
+                    g.members.count(),
+                    list(g.expenses.order_by("amount").values_list("amount", "title")),
+                )
+                for g in self.seed(prefix).order_by("id")
+            ]
+
+        self.assertEqual(shape("a"), shape("b"))
+
+    def test_every_user_gets_a_distinct_phone(self):
+        self.seed("a")
+        self.seed("b")
+
+        phones = UserProfile.objects.values_list("phone", flat=True)
+        self.assertEqual(User.objects.count(), 80)
+        self.assertEqual(len(set(phones)), 80)
+
+
+class LoadTestReportTests(TestCase):
+    def test_percentiles_per_route(self):
+        from .management.commands.loadtest import summarize
+
+        latencies = {"totals": [i / 1000 for i in range(1, 101)]}
+        result = summarize(latencies, {"totals": 2, "groups": 1}, elapsed=10)
+
+        totals = result["routes"]["totals"]
+        self.assertEqual(
+            (totals["p50_ms"], totals["p95_ms"], totals["p99_ms"]), (50, 95, 99)
+        )
+        self.assertEqual(totals["rps"], 10)
+        self.assertEqual(result["routes"]["groups"]["requests"], 0)
+        self.assertEqual(result["errors"], 3)
+
+    def test_fallback_is_timed_under_the_route_called(self):
+        from .management.commands.loadtest import VirtualUser, mint_tokens
+
+        group, users = make_group(1)
+        [token] = mint_tokens([users[0].username])
+        user = VirtualUser(None, token, random.Random(1))
+        user.groups = {group.id: []}
+
+        route, method, path, _ = user.next_request("mark_settlement")
+        self.assertEqual((route, method), ("totals", "GET"))
+        self.assertEqual(path, f"/api/groups/{group.id}/totals/")
+        self.assertEqual(user.user_id, users[0].id)
+
+
+# =====================================================
+# ⏱️ SQL INSTRUMENTATION
+# =====================================================
+class QueryInstrumentationTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def test_server_timing_header(self):
+        res = self.client.get(f"/api/groups/{self.group.id}/summary/")
+        timing = res["Server-Timing"]
+
+        for metric in ("db;dur=", "serialize;dur=", "total;dur="):
+            self.assertIn(metric, timing)
+        self.assertIn('desc="4 queries"', timing)
+
+    @override_settings(SQL_INSTRUMENTATION={"N_PLUS_ONE_THRESHOLD": 3})
+    def test_flags_repeated_statements(self):
+        # members_count is one COUNT per listed group
+        for i in range(3):
+            group = Group.objects.create(name=f"Extra {i}", created_by=self.users[0])
+            GroupMember.objects.create(group=group, user=self.users[0])
+
+        with self.assertLogs("core.sql", "WARNING") as logs:
+            self.client.get("/api/groups/")
+
+        self.assertTrue(any("Possible N+1" in line for line in logs.output))
+        self.assertTrue(any("groups-list" in line for line in logs.output))
+
+    @override_settings(SQL_INSTRUMENTATION={"SLOW_REQUEST_MS": 0, "SLOW_QUERY_MS": 0})
+    def test_logs_slow_requests_and_queries(self):
+        with self.assertLogs("core.sql", "WARNING") as logs:
+            self.client.get(f"/api/groups/{self.group.id}/summary/")
+
+        self.assertTrue(any("Slow request" in line for line in logs.output))
+        self.assertTrue(any("Slow query" in line for line in logs.output))
+
+    def test_normalize_sql(self):
+        from .middleware import normalize_sql
+
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id IN (%s, %s, %s) AND x = 'a' LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (...) AND x = ? LIMIT ?",
+        )
+
+
+# =====================================================
+# 🔬 PROFILING
+# =====================================================
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.profiling = override_settings(PROFILING={"DIR": self.tmp.name, "TOP_N": 5})
+        self.profiling.enable()
+        self.addCleanup(self.profiling.disable)
+
+        self.group, self.users = make_group(2)
+        self.url = f"/api/groups/{self.group.id}/summary/"
+        self.staff, self.member = self.users
+        self.staff.is_staff = True
+        self.staff.save(update_fields=["is_staff"])
+
+        self.client = APIClient()
+        self.token = lambda user: str(RefreshToken.for_user(user).access_token)
+
+    def files(self):
+        return sorted(os.listdir(self.tmp.name))
+
+    def test_staff_request_is_profiled(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token(self.staff)}")
+        res = self.client.get(self.url, HTTP_X_PROFILE="1")
+
+        self.assertEqual(res.status_code, 200)
+        name = res["X-Profile-Id"]
+        self.assertEqual(self.files(), [f"{name}.prof", f"{name}.txt"])
+
+        with open(os.path.join(self.tmp.name, f"{name}.txt")) as fh:
+            summary = fh.read()
+        self.assertIn(f"GET {self.url}", summary)
+        self.assertIn("cumulative", summary)
+
+    def test_only_explicit_values_turn_profiling_on(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token(self.staff)}")
+
+        for value in ("0", "false", "no", "off"):
+            self.assertNotIn("X-Profile-Id", self.client.get(self.url, HTTP_X_PROFILE=value))
+            self.assertNotIn("X-Profile-Id", self.client.get(f"{self.url}?profile={value}"))
+        self.assertEqual(self.files(), [])
+
+        self.assertIn("X-Profile-Id", self.client.get(f"{self.url}?profile=true"))
+
+    def test_signed_token_with_memory(self):
+        from .middleware import make_profile_token
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token(self.member)}")
+        res = self.client.get(
+            f"{self.url}?profile=mem", HTTP_X_PROFILE_TOKEN=make_profile_token()
+        )
+
+        with open(os.path.join(self.tmp.name, f"{res['X-Profile-Id']}.txt")) as fh:
+            self.assertIn("Top allocations", fh.read())
+
+    def test_ignored_for_regular_users_and_bad_tokens(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token(self.member)}")
+
+        res = self.client.get(self.url, HTTP_X_PROFILE="1")
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn("X-Profile-Id", res)
+
+        res = self.client.get(self.url, HTTP_X_PROFILE="1", HTTP_X_PROFILE_TOKEN="forged:abc")
+        self.assertNotIn("X-Profile-Id", res)
+        self.assertEqual(self.files(), [])
+
+    def test_budget_per_minute(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token(self.staff)}")
+
+        with override_settings(PROFILING={"DIR": self.tmp.name, "MAX_PER_MINUTE": 2}):
+            profiled = [
+                "X-Profile-Id" in self.client.get(self.url, HTTP_X_PROFILE="1")
+                for _ in range(4)
+            ]
+
+        self.assertEqual(profiled, [True, True, False, False])
+        self.assertEqual(len(self.files()), 4)
+
+    def test_keeps_newest_profiles(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token(self.staff)}")
+
+        with override_settings(PROFILING={"DIR": self.tmp.name, "KEEP": 2}):
+            names = [
+                self.client.get(self.url, HTTP_X_PROFILE="1")["X-Profile-Id"]
+                for _ in range(3)
+            ]
+
+        self.assertEqual(
+            self.files(),
+            sorted(f"{n}.{ext}" for n in names[1:] for ext in ("prof", "txt")),
+        )
+
+
+# =====================================================
+# 📈 METRICS
+# =====================================================
+@override_settings(DEBUG=True)
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.group, self.users = make_group(2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def scrape(self, **extra):
+        res = self.client.get("/metrics", **extra)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return res.content.decode()
+
+    def test_request_service_and_queue_metrics(self):
+        self.client.get(f"/api/groups/{self.group.id}/totals/")
+        body = self.scrape()
+
+        self.assertIn("# TYPE splitbills_http_request_duration_seconds histogram", body)
+        self.assertIn(
+            'splitbills_http_requests_total{route="groups-totals",method="GET",status="200"}',
+            body,
+        )
+        self.assertIn(
+            'splitbills_http_request_duration_seconds_bucket{route="groups-totals",le="+Inf"}',
+            body,
+        )
+        self.assertIn('splitbills_db_queries_total{route="groups-totals"}', body)
+        self.assertIn('splitbills_service_duration_seconds_count{function="get_totals"}', body)
+        self.assertIn('splitbills_job_queue_depth{job="janitor_otps"} 0', body)
+
+    def test_cache_hit_ratio(self):
+        from .metrics import collect
+
+        def reads():
+            counters, _ = collect()
+            return [
+                counters.get(("cache_requests_total", (("result", r),)), 0)
+                for r in ("hit", "miss")
+            ]
+
+        hits, misses = reads()
+        cache.set("metrics-test", 1)
+        cache.get("metrics-test")
+        cache.get_many(["metrics-test", "metrics-missing"])
+
+        self.assertEqual(reads(), [hits + 2, misses + 1])
+        self.assertIn("splitbills_cache_hit_ratio ", self.scrape())
+
+    def test_merges_worker_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "metrics_999999.json"), "w") as fh:
+                json.dump({
+                    "counters": [["db_queries_total", [["route", "other-worker"]], 7]],
+                    "histograms": [],
+                }, fh)
+
+            with override_settings(METRICS={"MULTIPROC_DIR": tmp}):
+                body = self.scrape()
+
+            self.assertIn('splitbills_db_queries_total{route="other-worker"} 7', body)
+            self.assertIn(f"metrics_{os.getpid()}.json", os.listdir(tmp))
+
+    def test_queue_depths_are_cached_between_scrapes(self):
+        from .metrics import queue_depths
+
+        depths = queue_depths()
+        with self.assertNumQueries(0):
+            self.assertEqual(queue_depths(), depths)
+
+    @override_settings(METRICS={"TOKEN": "s3cret"})
+    def test_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        self.scrape(HTTP_AUTHORIZATION="Bearer s3cret")
+
+        with override_settings(DEBUG=False):
+            self.scrape(HTTP_AUTHORIZATION="Bearer s3cret")
+
+    @override_settings(DEBUG=False)
+    def test_token_is_required_outside_debug(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+
+# =====================================================
+# 💵 INTEGER PAISE
+# =====================================================
+class PaiseBalanceTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def test_format_paise(self):
+        for paise, text in ((0, "0.00"), (5, "0.05"), (-5, "-0.05"), (123456, "1234.56")):
+            self.assertEqual(format_paise(paise), text)
+
+    def test_amounts_are_exact_strings(self):
+        # 0.10 three ways leaves a paisa that float rounding used to blur
+        self.client.post(
+            "/api/expenses/",
+            {"group": self.group.id, "title": "Tea", "amount": "0.10"},
+            format="json",
+        )
+
+        totals = self.client.get(f"/api/groups/{self.group.id}/totals/").data
+        self.assertEqual(
+            sorted(t["net_balance"] for t in totals), ["-0.03", "-0.03", "0.06"]
+        )
+
+        plan = self.client.get(f"/api/groups/{self.group.id}/settle_up/").data
+        self.assertEqual([p["amount"] for p in plan], ["0.03", "0.03"])
+
+        summary = self.client.get(f"/api/groups/{self.group.id}/summary/").data
+        self.assertEqual(summary["remaining_balance"], "0.00")
+
+    def test_net_balances_query_count_is_constant(self):
+        for i in range(20):
+            self.client.post(
+                "/api/expenses/",
+                {"group": self.group.id, "title": f"x{i}", "amount": "9.99"},
+                format="json",
+            )
+
+        with self.assertNumQueries(5):
+            net = calculate_net_balances(self.group.id)
+        self.assertEqual(sum(net.values()), 0)
+        self.assertTrue(all(isinstance(v, int) for v in net.values()))
+
+    def test_simplify_debts(self):
+        plan = simplify_debts({1: -500, 2: 300, 3: -100, 4: 300})
+        self.assertEqual(plan, [
+            {"from_user": 1, "to_user": 2, "amount": 300},
+            {"from_user": 1, "to_user": 4, "amount": 200},
+            {"from_user": 3, "to_user": 4, "amount": 100},
+        ])
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, "set RUN_BENCHMARKS=1 to run benchmarks")
+class BalanceEngineBenchmark(TestCase):
+    """Decimal (previous engine) vs int paise: aggregate, simplify, render."""
+
+    def decimal_engine(self, rows):
+        net = defaultdict(Decimal)
+        for user_id, amount in rows:
+            net[user_id] += amount
+
+        receivers = [[u, a] for u, a in net.items() if a > 0]
+        payers = [[u, -a] for u, a in net.items() if a < 0]
+        plan = []
+        i = j = 0
+        while i < len(payers) and j < len(receivers):
+            send = min(payers[i][1], receivers[j][1])
+            plan.append((payers[i][0], receivers[j][0], float(round(send, 2))))
+            payers[i][1] -= send
+            receivers[j][1] -= send
+            i += payers[i][1] == 0
+            j += receivers[j][1] == 0
+        return plan
+
+    def int_engine(self, rows):
+        net = defaultdict(int)
+        for user_id, amount in rows:
+            net[user_id] += amount
+        return [
+            (p["from_user"], p["to_user"], format_paise(p["amount"]))
+            for p in simplify_debts(net)
+        ]
+
+    def test_engines(self):
+        rng = random.Random(1)
+
+        for members in (100, 1000, 5000):
+            paise_rows = []
+            for _ in range(members * 20):
+                payer = rng.randrange(members)
+                amount = rng.randint(100, 500_000)
+                paise_rows.append((payer, amount))
+                paise_rows.append((rng.randrange(members), -amount))
+            decimal_rows = [(u, from_paise(a)) for u, a in paise_rows]
+
+            timings = {}
+            for name, engine, rows in (
+                ("decimal", self.decimal_engine, decimal_rows),
+                ("int", self.int_engine, paise_rows),
+            ):
+                start = time.perf_counter()
+                plan = engine(rows)
+                timings[name] = time.perf_counter() - start
+                self.assertTrue(plan)
+
+            print(
+                f"\n{members:>5} members, {len(paise_rows):>7} rows: "
+                f"decimal {timings['decimal'] * 1000:7.1f}ms, "
+                f"int {timings['int'] * 1000:7.1f}ms "
+                f"({timings['decimal'] / timings['int']:.1f}x)"
+            )
+
+
+# =====================================================
+# 👥 BULK ADD MEMBERS
+# =====================================================
+class BulkMembersTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(2)
+        self.url = f"/api/groups/{self.group.id}/members/bulk/"
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+        self.friends = User.objects.bulk_create([
+            User(username=f"friend{i}", email=f"friend{i}@x.com") for i in range(30)
+        ])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=u, phone=f"98765432{i:02d}")
+            for i, u in enumerate(self.friends)
+        ])
+        call_command("rebuild_comembership", stdout=open(os.devnull, "w"))
+
+    def test_outcomes_per_identifier(self):
+        res = self.client.post(self.url, {"identifiers": [
+            "friend0",
+            "friend1@x.com",
+            "+91 98765 43202",
+            "trip1",
+            "friend0@x.com",
+            "nobody",
+        ]}, format="json")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["added"], 3)
+        self.assertEqual(
+            [r["status"] for r in res.data["results"]],
+            ["added", "added", "added", "already_member", "duplicate", "not_found"],
+        )
+        self.assertEqual(res.data["results"][2]["user_id"], self.friends[2].id)
+        self.assertEqual(GroupMember.objects.filter(group=self.group).count(), 5)
+
+        # Incremental co-membership counts match a full rebuild
+        pairs = set(CoMembership.objects.values_list("user_id", "other_id", "shared_groups"))
+        call_command("rebuild_comembership", stdout=open(os.devnull, "w"))
+        self.assertEqual(
+            pairs,
+            set(CoMembership.objects.values_list("user_id", "other_id", "shared_groups")),
+        )
+
+    def test_query_count_does_not_grow(self):
+        def queries(identifiers, group):
+            url = f"/api/groups/{group.id}/members/bulk/"
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(url, {"identifiers": identifiers}, format="json")
+            self.assertEqual(res.status_code, 200)
+            # Inserts may be split into DB-sized batches; lookups must not grow
+            return sum(q["sql"].startswith("SELECT") for q in ctx.captured_queries)
+
+        other, _ = make_group(1, name="Other")
+        GroupMember.objects.create(group=other, user=self.users[0])
+
+        few = queries(["friend0", "friend1@x.com", "9876543202", "x"], self.group)
+        many = queries(
+            [f"friend{i}" for i in range(10)]
+            + [f"friend{i}@x.com" for i in range(10, 20)]
+            + [f"98765432{i}" for i in range(20, 30)]
+            + ["x", "y"],
+            other,
+        )
+        self.assertEqual(few, many)
+
+    def test_validation(self):
+        res = self.client.post(self.url, {"identifiers": "friend0"}, format="json")
+        self.assertEqual(res.status_code, 400)
+
+        res = self.client.post(self.url, {"identifiers": ["x"] * 101}, format="json")
+        self.assertEqual(res.status_code, 400)
+
+        self.client.force_authenticate(self.friends[0])
+        res = self.client.post(self.url, {"identifiers": ["friend1"]}, format="json")
+        self.assertEqual(res.status_code, 404)
+
+
+# =====================================================
+# 🗑️ SOFT DELETE + GROUP PURGE
+# =====================================================
+class GroupPurgeTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(3)
+        self.other, _ = make_group(2, name="Other")
+        self.client = APIClient()
+
+        for group, payer in ((self.group, self.users[0]), (self.other, None)):
+            payer = payer or group.created_by
+            self.client.force_authenticate(payer)
+            for i in range(5):
+                self.client.post(
+                    "/api/expenses/",
+                    {"group": group.id, "title": f"x{i}", "amount": "30"},
+                    format="json",
+                )
+        Settlement.objects.create(
+            group=self.group, from_user=self.users[1], to_user=self.users[0],
+            amount=Decimal("10"), status="PAID",
+        )
+        self.client.force_authenticate(self.users[0])
+
+    def rows(self, group):
+        return {
+            name: model.objects.filter(**{field: group.id}).count()
+            for name, model, field in janitor.GROUP_STEPS
+        }
+
+    def test_delete_hides_group_immediately(self):
+        before = self.rows(self.group)
+
+        res = self.client.delete(f"/api/groups/{self.group.id}/")
+        self.assertEqual(res.status_code, 204)
+
+        self.assertEqual(self.client.get(f"/api/groups/{self.group.id}/").status_code, 404)
+        self.assertEqual(self.client.get("/api/groups/").data, [])
+        self.assertEqual(self.client.get(f"/api/members/?group={self.group.id}").data, [])
+        self.assertEqual(self.client.get(f"/api/expenses/?group={self.group.id}").data, [])
+        search = self.client.get("/api/search/expenses/", {"q": "x1"}).data
+        self.assertEqual(search["results"], [])
+        self.assertEqual(self.client.get("/api/me/analytics/").data, [])
+        for action in ("summary", "totals", "settle_up"):
+            res = self.client.get(f"/api/groups/{self.group.id}/{action}/")
+            self.assertEqual(res.status_code, 404)
+
+        # Nothing removed yet, just queued
+        self.assertEqual(self.rows(self.group), before)
+        self.assertTrue(GroupPurge.objects.filter(group_id=self.group.id).exists())
+
+    def test_purge_resumes_and_spares_other_groups(self):
+        expected = self.rows(self.group)
+        untouched = self.rows(self.other)
+        self.client.delete(f"/api/groups/{self.group.id}/")
+
+        record = GroupPurge.objects.get(group_id=self.group.id)
+        # A deadline already in the past stops after the first full batch
+        self.assertFalse(janitor.purge_group(record, batch_size=4, deadline=0))
+        record.refresh_from_db()
+        self.assertEqual(record.step, "splits")
+        self.assertEqual(record.deleted, {"splits": 4})
+        self.assertIsNone(record.finished_at)
+
+        out = io.StringIO()
+        call_command("purge_groups", "--batch-size", "4", stdout=out)
+        self.assertIn(f"Group {self.group.id} (Trip)", out.getvalue())
+
+        record.refresh_from_db()
+        self.assertIsNotNone(record.finished_at)
+        self.assertEqual(record.deleted, expected)
+        self.assertEqual(sum(self.rows(self.group).values()), 0)
+        self.assertEqual(self.rows(self.other), untouched)
+
+    def test_writes_to_deleted_group_are_rejected(self):
+        split = ExpenseSplit.objects.filter(expense__group=self.group).first()
+        self.client.delete(f"/api/groups/{self.group.id}/")
+
+        res = self.client.post(
+            f"/api/groups/{self.group.id}/mark_settlement/",
+            {"from_user": self.users[1].id, "to_user": self.users[0].id, "amount": "5"},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 404)
+
+        res = self.client.post(
+            "/api/settlements/",
+            {"group": self.group.id, "amount": "5", "status": "PAID"},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("group", res.data)
+
+        res = self.client.patch(
+            f"/api/expense-splits/{split.id}/", {"share_amount": "1"}, format="json"
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(Settlement.objects.filter(group=self.group).count(), 1)
+
+
+class GroupPurgeRaceTests(TransactionTestCase):
+    # Foreign keys are checked at commit, so this needs real commits
+    def test_rows_written_after_their_step_are_swept_again(self):
+        group, users = make_group(2)
+        client = APIClient()
+        client.force_authenticate(users[0])
+        client.delete(f"/api/groups/{group.id}/")
+
+        # The purge got past settlements before a late write landed
+        record = GroupPurge.objects.get(group_id=group.id)
+        record.step = "members"
+        record.save()
+        Settlement.objects.create(
+            group=group, from_user=users[1], to_user=users[0],
+            amount=Decimal("10"), status="PAID",
+        )
+
+        [(record, done)] = janitor.purge_groups()
+        self.assertTrue(done)
+        self.assertEqual(record.deleted["settlements"], 1)
+        self.assertFalse(Group.objects.filter(id=group.id).exists())
+        self.assertFalse(Settlement.objects.exists())
+
+
+# =====================================================
+# 🧊 COLD ARCHIVE
+# =====================================================
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(3)
+        self.client = APIClient()
+        self.now = timezone.now()
+
+        # Old expenses, squared up 300 days ago, then unsettled spending
+        for days in (400, 390, 380, 370):
+            self.expense(days, "10.01")
+        plan = simplify_debts(calculate_net_balances(self.group.id))
+        for p in plan:
+            settlement = Settlement.objects.create(
+                group=self.group, from_user_id=p["from_user"], to_user_id=p["to_user"],
+                amount=from_paise(p["amount"]), status="PAID",
+            )
+            Settlement.objects.filter(id=settlement.id).update(
+                created_at=self.ago(300)
+            )
+        for days in (250, 200, 10):
+            self.expense(days, "7.00")
+
+        self.client.force_authenticate(self.users[0])
+
+    def ago(self, days):
+        return self.now - timedelta(days=days)
+
+    def expense(self, days, amount):
+        payer = self.users[days % 3]
+        self.client.force_authenticate(payer)
+        res = self.client.post(
+            "/api/expenses/",
+            {"group": self.group.id, "title": f"Day {days}", "amount": amount},
+            format="json",
+        )
+        Expense.objects.filter(id=res.data["id"]).update(created_at=self.ago(days))
+
+    def balances(self):
+        url = f"/api/groups/{self.group.id}"
+        as_of = [
+            self.client.get(f"{url}/balances/", {"as_of": self.ago(d).isoformat()}).data["balances"]
+            for d in (395, 300, 220, 0)
+        ]
+        return (
+            self.client.get(f"{url}/totals/").data,
+            self.client.get(f"{url}/settle_up/").data,
+            self.client.get("/api/me/balances/").data,
+            as_of,
+        )
+
+    def test_cutoff_is_last_settled_point(self):
+        self.assertEqual(
+            archive.settled_cutoff(self.group.id, self.ago(180)), self.ago(300)
+        )
+        # Never square before 380 days ago
+        self.assertIsNone(archive.settled_cutoff(self.group.id, self.ago(380)))
+
+        # Batches end on whole instants, so their size doesn't matter
+        Expense.objects.filter(title="Day 390").update(created_at=self.ago(400))
+        for batch_size in (1, 2, 500):
+            self.assertEqual(
+                archive.settled_cutoff(self.group.id, self.ago(180), batch_size),
+                self.ago(300),
+            )
+
+    def test_archive_keeps_balances_exact(self):
+        before = self.balances()
+        call_command("rebuild_rollups", stdout=open(os.devnull, "w"))
+        rollups = set(SpendingRollup.objects.values_list("user_id", "month", "paid", "share"))
+
+        call_command(
+            "archive_expenses", "--older-than-days", "180", "--batch-size", "3",
+            stdout=open(os.devnull, "w"),
+        )
+
+        self.assertEqual(ArchivedExpense.objects.count(), 4)
+        self.assertEqual(ArchivedExpenseSplit.objects.count(), 12)
+        self.assertEqual(Expense.objects.count(), 3)
+        self.assertEqual(
+            set(CarriedBalance.objects.values_list("through", flat=True)), {self.ago(300)}
+        )
+        self.assertEqual(self.balances(), before)
+
+        call_command("rebuild_rollups", stdout=open(os.devnull, "w"))
+        self.assertEqual(
+            set(SpendingRollup.objects.values_list("user_id", "month", "paid", "share")),
+            rollups,
+        )
+
+        # Nothing new has settled, so a second run moves nothing
+        results = archive.archive_groups(self.ago(180))
+        self.assertEqual(results, {})
+
+    def test_archive_endpoint_pages_newest_first(self):
+        archive.archive_groups(self.ago(180))
+        url = f"/api/groups/{self.group.id}/archive/"
+
+        res = self.client.get(url, {"page_size": 3})
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.data["has_next"])
+        self.assertEqual([r["title"] for r in res.data["results"]], ["Day 370", "Day 380", "Day 390"])
+        self.assertEqual(len(res.data["results"][0]["splits"]), 3)
+        self.assertEqual(res.data["results"][0]["amount"], "10.01")
+
+        res = self.client.get(url, {"page_size": 3, "page": 2})
+        self.assertFalse(res.data["has_next"])
+        self.assertEqual([r["title"] for r in res.data["results"]], ["Day 400"])
+
+        self.client.force_authenticate(User.objects.create(username="outsider"))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+# =====================================================
+# 🔁 IDEMPOTENCY KEYS
+# =====================================================
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        self.group, self.users = make_group(2)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.users[0]).access_token}"
+        )
+        self.body = {"group": self.group.id, "title": "Dinner", "amount": "40"}
+
+    def post(self, key, body=None):
+        return self.client.post(
+            "/api/expenses/", body or self.body, format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_first_response(self):
+        first = self.post("abc")
+        self.assertEqual(first.status_code, 201)
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.post("abc")
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Expense.objects.count(), 1)
+        # The failed claim and one indexed read of the stored response
+        self.assertEqual(
+            len([q for q in ctx.captured_queries if "idempotencykey" in q["sql"]]), 2
+        )
+
+        # Keys are per user and per key
+        self.assertEqual(self.post("other").status_code, 201)
+        self.assertEqual(Expense.objects.count(), 2)
+
+    def test_reused_key_with_different_body_is_rejected(self):
+        self.post("abc")
+        res = self.post("abc", {**self.body, "amount": "41"})
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(Expense.objects.count(), 1)
+
+    def test_multipart_bodies_of_equal_length_are_told_apart(self):
+        def post(title):
+            return self.client.post(
+                "/api/expenses/", {**self.body, "title": title},
+                format="multipart", HTTP_IDEMPOTENCY_KEY="form",
+            )
+
+        self.assertEqual(post("Dinner").status_code, 201)
+        self.assertEqual(post("Dinner")["Idempotent-Replayed"], "true")
+        self.assertEqual(post("Supper").status_code, 422)
+
+        # PATCH bodies are parsed here too, and the view still sees them
+        def patch(phone):
+            return self.client.patch(
+                "/api/profile/", {"phone": phone},
+                format="multipart", HTTP_IDEMPOTENCY_KEY="profile",
+            )
+
+        self.assertEqual(patch("9000000001").status_code, 200)
+        self.assertEqual(UserProfile.objects.get(user=self.users[0]).phone, "9000000001")
+        self.assertEqual(patch("9000000002").status_code, 422)
+
+    def test_errors_are_replayed_but_server_errors_are_not(self):
+        bad = {**self.body, "amount": "-1"}
+        self.assertEqual(self.post("bad", bad).status_code, 400)
+        self.assertEqual(self.post("bad", bad).status_code, 400)
+        self.assertEqual(IdempotencyKey.objects.get(key="bad").status_code, 400)
+
+        from . import views
+
+        original = views.ExpenseViewSet.create
+        views.ExpenseViewSet.create = lambda *a, **k: 1 / 0
+        self.addCleanup(setattr, views.ExpenseViewSet, "create", original)
+        self.client.raise_request_exception = False
+        self.assertEqual(self.post("boom").status_code, 500)
+        self.assertFalse(IdempotencyKey.objects.filter(key="boom").exists())
+
+    def test_duplicate_waits_for_in_flight_original(self):
+        from . import idempotency
+
+        first = self.post("abc")
+        row = IdempotencyKey.objects.get(key="abc")
+        stored = (row.status_code, bytes(row.body))
+        IdempotencyKey.objects.filter(pk=row.pk).update(status_code=None, body=b"")
+
+        def original_finishes(seconds):
+            IdempotencyKey.objects.filter(pk=row.pk).update(
+                status_code=stored[0], body=stored[1]
+            )
+
+        with unittest.mock.patch.object(idempotency.time, "sleep", original_finishes):
+            res = self.post("abc")
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.content, first.content)
+        self.assertEqual(Expense.objects.count(), 1)
+
+        # Still running after WAIT: tell the client to retry later
+        IdempotencyKey.objects.filter(pk=row.pk).update(status_code=None)
+        with override_settings(IDEMPOTENCY={"WAIT": 0}):
+            res = self.post("abc")
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(Expense.objects.count(), 1)
+
+    def test_expired_keys_run_again_and_are_purged(self):
+        self.post("abc")
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.post("abc").status_code, 201)
+        self.assertEqual(Expense.objects.count(), 2)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(janitor.run(["idempotency_keys"]), {"idempotency_keys": 1})
+
+
+# =====================================================
+# 📦 BATCH
+# =====================================================
+class BatchTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+        self.client.post(
+            "/api/expenses/",
+            {"group": self.group.id, "title": "Dinner", "amount": "90"},
+            format="json",
+        )
+        g = f"/api/groups/{self.group.id}"
+        self.screen = [
+            f"{g}/summary/", f"{g}/totals/", f"{g}/settle_up/",
+            f"/api/members/?group={self.group.id}", f"/api/expenses/?group={self.group.id}",
+        ]
+
+    def batch(self, requests, **extra):
+        return self.client.post(
+            "/api/batch/", {"requests": requests, **extra}, format="json"
+        )
+
+    def test_group_screen_in_one_round_trip(self):
+        res = self.batch([{"method": "GET", "url": url} for url in self.screen])
+        self.assertEqual(res.status_code, 200)
+
+        for url, sub in zip(self.screen, res.data["responses"]):
+            direct = self.client.get(url)
+            self.assertEqual(sub["status"], 200)
+            self.assertEqual(sub["body"], json.loads(direct.content))
+
+        settle_up = res.data["responses"][2]
+        self.assertEqual(
+            settle_up["headers"]["X-Plan-Hash"], self.client.get(self.screen[2])["X-Plan-Hash"]
+        )
+
+    def test_posts_run_in_order_with_the_callers_auth(self):
+        res = self.batch([
+            {"method": "POST", "url": "/api/expenses/",
+             "body": {"group": self.group.id, "title": "Cab", "amount": "30"}},
+            {"method": "GET", "url": f"/api/expenses/?group={self.group.id}"},
+        ])
+        created, listed = res.data["responses"]
+        self.assertEqual(created["status"], 201)
+        self.assertEqual(Expense.objects.get(id=created["body"]["id"]).paid_by, self.users[0])
+        self.assertEqual(len(listed["body"]), 2)
+
+        outsider = APIClient()
+        outsider.force_authenticate(User.objects.create(username="outsider"))
+        res = outsider.post(
+            "/api/batch/",
+            {"requests": [{"url": f"/api/groups/{self.group.id}/"}]},
+            format="json",
+        )
+        self.assertEqual(res.data["responses"][0]["status"], 404)
+
+    def test_limits_and_bad_items(self):
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.batch([{"method": "DELETE", "url": self.screen[0]}]).status_code, 400)
+        self.assertEqual(self.batch([{"url": "https://example.com/"}]).status_code, 400)
+        with override_settings(BATCH={"MAX_REQUESTS": 2}):
+            self.assertEqual(self.batch([{"url": u} for u in self.screen]).status_code, 400)
+
+        res = self.batch([{"url": "/api/batch/"}, {"url": "/api/nope/"}])
+        self.assertEqual([r["status"] for r in res.data["responses"]], [400, 404])
+
+        with override_settings(BATCH={"TIMEOUT": 0}):
+            res = self.batch([{"url": u} for u in self.screen])
+        self.assertEqual({r["status"] for r in res.data["responses"]}, {504})
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.batch([{"url": self.screen[0]}]).status_code, 401)
+
+    def test_parallel_reads_match_sequential(self):
+        requests = [{"url": url} for url in self.screen]
+        sequential = self.batch(requests).data["responses"]
+
+        from concurrent.futures import Future
+        from . import batch
+
+        submitted = []
+
+        class InlineExecutor:
+            # Worker threads can't see this test's open transaction
+            def __init__(self, max_workers):
+                pass
+
+            def submit(self, fn, *args):
+                submitted.append(args[2])
+                future = Future()
+                future.set_result(batch.dispatch(*args))
+                return future
+
+            def shutdown(self, **kwargs):
+                pass
+
+        requests.insert(2, {"method": "POST", "url": "/api/expenses/",
+                            "body": {"group": self.group.id, "title": "Cab", "amount": "30"}})
+        with unittest.mock.patch.object(batch, "ThreadPoolExecutor", InlineExecutor):
+            parallel = self.batch(requests, parallel=True).data["responses"]
+
+        # GETs either side of the POST are pooled; the POST runs on its own
+        self.assertEqual(submitted, self.screen)
+        self.assertEqual(parallel[2]["status"], 201)
+        self.assertEqual(parallel[:2], sequential[:2])
+        self.assertEqual(len(parallel[-1]["body"]), 2)
+
+
+# =====================================================
+# 🧭 GROUP OVERVIEW
+# =====================================================
+class GroupOverviewTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(4)
+        self.client = APIClient()
+        self.url = f"/api/groups/{self.group.id}/overview/"
+        for i, user in enumerate(self.users[:3]):
+            self.client.force_authenticate(user)
+            self.client.post(
+                "/api/expenses/",
+                {"group": self.group.id, "title": f"E{i}", "amount": f"{10 * (i + 1)}.01"},
+                format="json",
+            )
+        self.client.force_authenticate(self.users[0])
+
+    def test_matches_the_separate_endpoints(self):
+        res = self.client.get(self.url, {"expenses": 2})
+        self.assertEqual(res.status_code, 200)
+
+        g = f"/api/groups/{self.group.id}"
+        settle_up = self.client.get(f"{g}/settle_up/")
+        self.assertEqual(res.data["summary"], self.client.get(f"{g}/summary/").data)
+        self.assertEqual(res.data["settle_up"], settle_up.data)
+        self.assertEqual(res["X-Plan-Hash"], settle_up["X-Plan-Hash"])
+        self.assertEqual(res.data["plan_hash"], settle_up["X-Plan-Hash"])
+
+        totals = self.client.get(f"{g}/totals/").data
+        self.assertEqual(
+            [{k: v for k, v in t.items() if k != "username"} for t in res.data["totals"]],
+            totals,
+        )
+        self.assertEqual(
+            [t["username"] for t in res.data["totals"]], [u.username for u in self.users]
+        )
+
+        expenses = self.client.get("/api/expenses/", {"group": self.group.id}).data
+        self.assertEqual(res.data["latest_expenses"], expenses[:2])
+
+    def test_query_count_does_not_grow(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url)
+
+        extra, others = make_group(30, name="Extra")
+        GroupMember.objects.bulk_create(
+            [GroupMember(group=self.group, user=u) for u in others]
+        )
+        for i, user in enumerate(others):
+            self.client.force_authenticate(user)
+            self.client.post(
+                "/api/expenses/",
+                {"group": self.group.id, "title": f"X{i}", "amount": "3.33"},
+                format="json",
+            )
+        self.client.force_authenticate(self.users[0])
+
+        with CaptureQueriesContext(connection) as large:
+            res = self.client.get(self.url, {"expenses": 20})
+        self.assertEqual(len(res.data["latest_expenses"]), 20)
+        self.assertEqual(len(res.data["totals"]), 34)
+        # Membership check plus the eight of get_group_overview
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+        self.assertEqual(len(large.captured_queries), 9)
+
+    def test_members_only_and_bad_params(self):
+        self.assertEqual(self.client.get(self.url, {"expenses": "x"}).status_code, 400)
+        self.client.force_authenticate(User.objects.create(username="outsider"))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+# =====================================================
+# 🚀 SERIALIZER-FREE LIST FAST PATH
+# =====================================================
+class FastPathTests(TestCase):
+    def setUp(self):
+        self.group, self.users = make_group(3)
+        a, b, _ = self.users
+        a.email = "a@example.com"
+        a.save(update_fields=["email"])
+        UserProfile.objects.create(user=a, phone="9876543210", profile_image="profile_pictures/a.png")
+        UserProfile.objects.create(user=b, phone="9876543211")
+
+        self.client = APIClient()
+        for i, user in enumerate(self.users):
+            self.client.force_authenticate(user)
+            self.client.post(
+                "/api/expenses/",
+                {"group": self.group.id, "title": f"Chai ☕ {i}", "amount": f"{i}.5"},
+                format="json",
+            )
+        self.client.force_authenticate(a)
+
+    def assertSameAsSerializer(self, url, serializer_class, queryset):
+        from rest_framework.renderers import JSONRenderer
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, {"group": self.group.id})
+        self.assertEqual(res.status_code, 200)
+
+        expected = JSONRenderer().render(
+            serializer_class(queryset, many=True, context={"request": res.wsgi_request}).data
+        )
+        self.assertEqual(res.content, expected)
+        self.assertIn(b"http://testserver/media/profile_pictures/a.png", res.content)
+        return len(ctx.captured_queries)
+
+    def test_expense_list_is_byte_identical(self):
+        from .serializers import ExpenseSerializer
+
+        queries = self.assertSameAsSerializer(
+            "/api/expenses/",
+            ExpenseSerializer,
+            Expense.objects.filter(group=self.group).order_by("-created_at"),
+        )
+        self.assertEqual(queries, 1)
+
+    def test_member_list_is_byte_identical(self):
+        from .serializers import GroupMemberSerializer
+
+        queries = self.assertSameAsSerializer(
+            "/api/members/",
+            GroupMemberSerializer,
+            GroupMember.objects.filter(group=self.group),
+        )
+        self.assertEqual(queries, 1)
+
+    def test_unsupported_fields_fail_at_compile_time(self):
+        from .fastpath import RowSerializer
+        from .serializers import GroupMemberSerializer, GroupSerializer
+
+        with self.assertRaises(TypeError):
+            RowSerializer(GroupMemberSerializer).compile()
+        with self.assertRaises(TypeError):
+            RowSerializer(GroupSerializer).compile()
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, "set RUN_BENCHMARKS=1 to run benchmarks")
+class FastPathBenchmark(TestCase):
+    """ExpenseSerializer(many=True) vs EXPENSE_ROWS over the same rows."""
+
+    def test_rows_per_second(self):
+        from .serializers import EXPENSE_ROWS, ExpenseSerializer
+
+        group, users = make_group(20)
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=u, phone=str(9_000_000_000 + u.id)) for u in users]
+        )
+        rng = random.Random(1)
+
+        for rows in (1000, 10000):
+            Expense.objects.all().delete()
+            Expense.objects.bulk_create([
+                Expense(group=group, paid_by=rng.choice(users), title="Dinner",
+                        amount=from_paise(rng.randint(100, 500_000)))
+                for _ in range(rows)
+            ])
+            queryset = Expense.objects.filter(group=group).order_by("-created_at")
+
+            timings = {}
+            for name, build in (
+                ("serializer", lambda: ExpenseSerializer(
+                    queryset.select_related("paid_by__profile"), many=True).data),
+                ("fast path", lambda: EXPENSE_ROWS.data(queryset)),
+            ):
+                start = time.perf_counter()
+                self.assertEqual(len(build()), rows)
+                timings[name] = time.perf_counter() - start
+
+            print(
+                f"\n{rows:>6} expenses: "
+                f"serializer {rows / timings['serializer']:>9,.0f} rows/s, "
+                f"fast path {rows / timings['fast path']:>9,.0f} rows/s "
+                f"({timings['serializer'] / timings['fast path']:.1f}x)"
+            )
+
+
+# =====================================================
+# 🛠️ ADMIN
+# =====================================================
+# The manifest storage needs collectstatic, which tests don't run
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class AdminTests(TestCase):
+    PAGES = [
+        "group", "groupmember", "walletcontribution", "walletexpense",
+        "expense", "expensesplit", "settlement",
+    ]
+
+    def setUp(self):
+        admin_user = User.objects.create_superuser("root", "root@example.com", "pw")
+        self.client.force_login(admin_user)
+
+    def add_ledger(self, name, members):
+        group, users = make_group(members, name=name)
+        api = APIClient()
+        for user in users:
+            api.force_authenticate(user)
+            api.post("/api/expenses/", {"group": group.id, "title": "Tea", "amount": "9"}, format="json")
+            WalletContribution.objects.create(group=group, user=user, amount="5")
+            WalletExpense.objects.create(group=group, added_by=user, amount="1", title="Tea")
+            Settlement.objects.create(group=group, from_user=user, to_user=users[0], amount="1")
+
+    def query_counts(self):
+        counts = {}
+        for page in self.PAGES:
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.get(f"/admin/core/{page}/")
+            self.assertEqual(res.status_code, 200, page)
+            counts[page] = len(ctx.captured_queries)
+        return counts
+
+    def test_changelists_do_not_grow_with_rows(self):
+        self.add_ledger("Small", 2)
+        small = self.query_counts()
+        self.add_ledger("Large", 12)
+        self.assertEqual(self.query_counts(), small)
+
+    def test_paginator_uses_planner_estimate_on_postgres(self):
+        from . import admin as core_admin
+
+        queryset = ExpenseSplit.objects.order_by("-id")
+        self.assertEqual(core_admin.EstimatedCountPaginator(queryset, 50).count, 0)
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params):
+                self.sql = sql
+
+            def fetchone(self):
+                return ([{"Plan": {"Plan Rows": 2_000_000}}],)
+
+        postgres = unittest.mock.Mock(vendor="postgresql", cursor=Cursor)
+        with unittest.mock.patch.object(core_admin, "connections", {"default": postgres}):
+            self.assertEqual(core_admin.EstimatedCountPaginator(queryset, 50).count, 2_000_000)
+
+
+# =====================================================
+# 🪞 READ REPLICAS
+# =====================================================
+class ReplicaRouterTests(TransactionTestCase):
+    # The router sends reads inside a transaction to the primary, so
+    # these can't run inside TestCase's wrapping transaction
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        # Per test, not per class: the flush after each test must still
+        # be allowed to touch the replica's tables
+        replicas = self.settings(DATABASE_REPLICAS=["replica"], REPLICA_PIN_SECONDS=5)
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+        cache.clear()
+        self.group, self.users = make_group(2)
+
+        # The stand-in replica lags: same rows, older group name
+        for obj in [*self.users, self.group, *GroupMember.objects.all()]:
+            obj.save(using="replica")
+        Group.objects.using("replica").filter(id=self.group.id).update(name="Trip (stale)")
+
+        self.url = f"/api/groups/{self.group.id}/"
+        self.clients = []
+        for user in self.users:
+            client = APIClient()
+            client.credentials(
+                HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}"
+            )
+            self.clients.append(client)
+
+    def test_reads_use_replica_and_writes_use_primary(self):
+        writer, _ = self.clients
+        self.assertEqual(writer.get(self.url).data["name"], "Trip (stale)")
+
+        res = writer.post(
+            "/api/expenses/",
+            {"group": self.group.id, "title": "Tea", "amount": "10"},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(Expense.objects.using("default").count(), 1)
+        self.assertEqual(Expense.objects.using("replica").count(), 0)
+
+    def test_writer_reads_own_writes_until_pin_expires(self):
+        writer, other = self.clients
+        res = writer.patch(self.url, {"name": "Beach"}, format="json")
+        self.assertEqual(res.status_code, 200)
+
+        self.assertEqual(writer.get(self.url).data["name"], "Beach")
+        self.assertEqual(other.get(self.url).data["name"], "Trip (stale)")
+
+        cache.delete(routers.PIN_KEY.format(user_id=self.users[0].id))
+        self.assertEqual(writer.get(self.url).data["name"], "Trip (stale)")
+
+    def test_replicas_need_a_shared_cache(self):
+        from .checks import check_replica_pin_cache
+
+        self.assertEqual(
+            [e.id for e in check_replica_pin_cache(None)], ["core.E001"]
+        )
+        shared = {"default": {"BACKEND": "core.cache.RedisCache", "LOCATION": "redis://"}}
+        with self.settings(CACHES=shared):
+            self.assertEqual(check_replica_pin_cache(None), [])
+        with self.settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(check_replica_pin_cache(None), [])
+
+    def test_router_rules(self):
+        router = routers.ReplicaRouter()
+
+        self.assertIsNone(router.db_for_read(Group))
+        with routers.read_from_replica() as alias:
+            self.assertEqual(alias, "replica")
+            self.assertEqual(Group.objects.all().db, "replica")
+            self.assertEqual(router.db_for_write(Group), "default")
+            with transaction.atomic():
+                self.assertEqual(Group.objects.all().db, "default")
+
+        self.assertFalse(router.allow_migrate("replica", "core"))
+        self.assertIsNone(router.allow_migrate("default", "core"))
+
+        with override_settings(DATABASE_REPLICAS=[]):
+            # No replicas configured: nothing changes
+            self.assertEqual(self.client.get("/api/groups/").status_code, 401)
+            self.assertIsNone(router.db_for_write(Group))
+
+
+# =====================================================
+# 🧩 GROUP SHARDS
+# =====================================================
+class ShardingTests(TransactionTestCase):
+    # Two local SQLite databases: "default" (shard 0) and "shard" (shard 1)
+    databases = {"default", "shard"}
+
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        shards = self.settings(
+            DATABASE_SHARDS=["default", "shard"],
+            SHARDING={"NEW_GROUP_SHARDS": ["shard"], "CACHE_SECONDS": 60},
+        )
+        shards.enable()
+        self.addCleanup(shards.disable)
+        cache.clear()
+        sharding.reserve_id_ranges("shard")
+
+        self.home, self.users = make_group(2)
+        # bulk_create skips the signals; this is what migrate does for a new shard
+        sharding.sync_users("shard")
+
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.users[0]).access_token}"
+        )
+
+    def add_expense(self, group_id, amount="30"):
+        res = self.client.post(
+            "/api/expenses/",
+            {"group": group_id, "title": "Dinner", "amount": amount},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 201, res.data)
+        return res.data["id"]
+
+    def test_new_group_is_created_and_served_from_its_shard(self):
+        res = self.client.post("/api/groups/", {"name": "Goa"}, format="json")
+        self.assertEqual(res.status_code, 201)
+        group_id = res.data["id"]
+
+        self.assertGreaterEqual(group_id, sharding.ID_SPAN)
+        self.assertFalse(Group.objects.using("default").filter(id=group_id).exists())
+        self.assertEqual(GroupShard.objects.get(group_id=group_id).alias, "shard")
+
+        expense_id = self.add_expense(group_id)
+        self.assertEqual(Expense.objects.using("shard").filter(group_id=group_id).count(), 1)
+        self.assertEqual(ExpenseSplit.objects.using("shard").count(), 1)
+        self.assertEqual(Expense.objects.using("default").count(), 0)
+
+        self.assertEqual(len(self.client.get("/api/expenses/", {"group": group_id}).data), 1)
+        self.assertEqual(self.client.get(f"/api/expenses/{expense_id}/").status_code, 200)
+        res = self.client.get(f"/api/groups/{group_id}/summary/")
+        self.assertEqual(res.status_code, 200)
+
+        res = self.client.post(
+            f"/api/groups/{group_id}/members/bulk/",
+            {"identifiers": [self.users[1].username]},
+            format="json",
+        )
+        self.assertEqual(res.data["added"], 1)
+        self.assertEqual(GroupMember.objects.using("shard").filter(group_id=group_id).count(), 2)
+        self.assertTrue(CoMembership.objects.using("default").filter(
+            user=self.users[0], other=self.users[1]
+        ).exists())
+
+    def test_cross_group_endpoints_read_every_shard(self):
+        self.add_expense(self.home.id, "10")
+        group_id = self.client.post("/api/groups/", {"name": "Goa"}, format="json").data["id"]
+        self.add_expense(group_id, "30")
+
+        res = self.client.get("/api/groups/")
+        self.assertEqual([g["id"] for g in res.data], [self.home.id, group_id])
+
+        res = self.client.get("/api/me/balances/")
+        self.assertEqual(
+            [(g["group_id"], g["net_balance"]) for g in res.data["groups"]],
+            [(self.home.id, "5.00"), (group_id, "0.00")],
+        )
+
+        res = self.client.get("/api/search/expenses/", {"q": "dinner"})
+        self.assertEqual({r["group_id"] for r in res.data["results"]}, {self.home.id, group_id})
+
+    def test_move_group_copies_rows_and_switches_over(self):
+        expense_id = self.add_expense(self.home.id)
+        created_at = Expense.objects.get(id=expense_id).created_at
+
+        out = io.StringIO()
+        call_command("move_group", self.home.id, "shard", drain=0, stdout=out)
+        self.assertIn("Moved 8 rows", out.getvalue())
+
+        for model in (Group, GroupMember, Expense, ExpenseSplit, SpendingRollup):
+            self.assertFalse(model.objects.using("default").exists(), model)
+        self.assertEqual(Expense.objects.using("shard").get(id=expense_id).created_at, created_at)
+        shard = GroupShard.objects.get(group_id=self.home.id)
+        self.assertEqual((shard.alias, shard.moving_to, shard.moved_from), ("shard", "", ""))
+
+        res = self.client.get(f"/api/expenses/{expense_id}/")
+        self.assertEqual(res.status_code, 200)
+        self.add_expense(self.home.id)
+        self.assertEqual(Expense.objects.using("shard").count(), 2)
+
+    def test_writes_to_a_moving_group_are_refused(self):
+        GroupShard.objects.create(group_id=self.home.id, alias="default", moving_to="shard")
+
+        res = self.client.post(
+            "/api/expenses/",
+            {"group": self.home.id, "title": "Tea", "amount": "10"},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res["Retry-After"], "5")
+        self.assertEqual(self.client.get(f"/api/groups/{self.home.id}/").status_code, 200)
+
+        with self.assertRaises(CommandError):
+            call_command("move_group", self.home.id, "shard", drain=0, stdout=io.StringIO())
+
+    def test_users_are_kept_on_every_shard(self):
+        user = User.objects.create_user("newbie")
+        profile = UserProfile.objects.create(user=user, phone="9000000000")
+        self.assertTrue(User.objects.using("shard").filter(id=user.id).exists())
+
+        profile.phone = "9000000001"
+        profile.save()
+        self.assertEqual(UserProfile.objects.using("shard").get(id=profile.id).phone, "9000000001")
+
+        user.delete()
+        self.assertFalse(User.objects.using("shard").filter(id=user.id).exists())
+        self.assertFalse(UserProfile.objects.using("shard").exists())
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, "set RUN_BENCHMARKS=1 to run benchmarks")
+class SplitEngineBenchmark(TestCase):
+    def test_split_throughput(self):
+        rng = random.Random(1)
+
+        for n in (100, 500, 1000):
+            users = list(range(1, n + 1))
+            weights = {u: rng.randint(1, 5) for u in users}
+
+            for split_type, values in (
+                (SPLIT_EQUAL, None),
+                (SPLIT_SHARES, weights),
+            ):
+                rounds = 200
+                start = time.perf_counter()
+                for _ in range(rounds):
+                    compute_split_paise(12_345_678, split_type, users, values)
+                elapsed = time.perf_counter() - start
+                print(
+                    f"\n{split_type:<7} members={n:<5} "
+                    f"{rounds / elapsed:,.0f} splits/s"
+                )
+
+    def test_bulk_insert_throughput(self):
+        group, users = make_group(500, name="Bench")
+        client = APIClient()
+        client.force_authenticate(users[0])
+
+        rounds = 20
+        start = time.perf_counter()
+        for i in range(rounds):
+            client.post(
+                "/api/expenses/",
+                {"group": group.id, "title": f"Bench {i}", "amount": "999.99"},
+                format="json",
+            )
+        elapsed = time.perf_counter() - start
+        print(f"\ncreate expense members=500 {rounds / elapsed:,.1f} expenses/s")
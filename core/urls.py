@@ -23,6 +23,12 @@ from .views import (
     ExpenseSplitViewSet,
     SettlementViewSet,
     UserProfileView,
+    my_balances,
+    my_analytics,
+    search_expenses_view,
+    suggest_users_view,
+    rate_limit_stats,
+    batch_view,
 )
 
 router = DefaultRouter()
@@ -52,9 +58,19 @@ urlpatterns = [
     # 🔐 PASSWORD RESET
     path("auth/forgot-password/", forgot_password, name="forgot-password"),
     path("auth/reset-password/", reset_password, name="reset-password"),
+    path("auth/rate-limits/", rate_limit_stats, name="rate-limit-stats"),
 
     # 👤 PROFILE
     path("profile/", UserProfileView.as_view(), name="user-profile"),
+    path("me/balances/", my_balances, name="my-balances"),
+    path("me/analytics/", my_analytics, name="my-analytics"),
+
+    # 📦 BATCH
+    path("batch/", batch_view, name="batch"),
+
+    # 🔎 SEARCH
+    path("search/expenses/", search_expenses_view, name="search-expenses"),
+    path("users/suggest/", suggest_users_view, name="suggest-users"),
 
     # CRUD
     path("", include(router.urls)),
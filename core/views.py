@@ -1,12 +1,16 @@
 import json
 import urllib.parse
 import random
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.core.mail import send_mail
-from django.utils.timezone import now
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import is_naive, make_aware, now
 from .models import GroupInvite
 from django.shortcuts import get_object_or_404
 
@@ -15,7 +19,7 @@ from rest_framework.decorators import permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework import status, viewsets
 from rest_framework.decorators import action, api_view
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -33,6 +37,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from .models import (
     Group,
     GroupMember,
+    GroupPurge,
     WalletContribution,
     WalletExpense,
     Expense,
@@ -51,9 +56,44 @@ from .serializers import (
     ExpenseSplitSerializer,
     SettlementSerializer,
     UserProfileSerializer,
+    BalancesAsOfSerializer,
+    GroupOverviewSerializer,
+    EXPENSE_ROWS,
+    MEMBER_ROWS,
+    MyBalancesSerializer,
+    NetBalanceSerializer,
+    TransferSerializer,
+    WalletSummarySerializer,
 )
 
-from .services import get_wallet_summary, get_settle_up
+from .services import get_wallet_summary, get_settle_up, get_user_balances
+from . import batch, metrics, sharding
+from .archive import get_archived_expenses
+from .people import (
+    MAX_BULK_MEMBERS,
+    add_members,
+    group_removed,
+    member_joined,
+    member_left,
+    suggest_users,
+)
+from .ratelimit import get_stats as get_rate_limit_stats, rate_limit
+from .rollups import (
+    get_group_analytics,
+    get_user_analytics,
+    parse_month,
+    record_expense,
+    record_split,
+    record_wallet_expense,
+)
+from .search import search_expenses
+from .splits import (
+    SPLIT_EQUAL,
+    SplitError,
+    compute_splits,
+    create_expense_splits,
+    to_decimal,
+)
 
 
 # =====================================================
@@ -61,6 +101,7 @@ from .services import get_wallet_summary, get_settle_up
 # =====================================================
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@rate_limit("login", identifier_field="identifier")
 def login_with_identifier(request):
     identifier = request.data.get("identifier")
     password = request.data.get("password")
@@ -170,6 +211,7 @@ def google_login(request):
 @api_view(["POST"])
 @permission_classes([AllowAny])
 @parser_classes([MultiPartParser, FormParser])
+@rate_limit("register")
 def register(request):
     username = request.data.get("username")
     password = request.data.get("password")
@@ -216,6 +258,7 @@ def register(request):
 # =====================================================
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@rate_limit("forgot_password", identifier_field="email")
 def forgot_password(request):
     email = request.data.get("email")
 
@@ -247,6 +290,7 @@ def forgot_password(request):
 # =====================================================
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@rate_limit("reset_password", identifier_field="email")
 def reset_password(request):
     email = request.data.get("email")
     otp = request.data.get("otp")
@@ -279,6 +323,35 @@ def reset_password(request):
     return Response({"message": "Password reset successful"}, status=200)
 
 
+# =====================================================
+# 🚦 RATE LIMIT COUNTERS (STAFF ONLY)
+# =====================================================
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def rate_limit_stats(request):
+    return Response(get_rate_limit_stats())
+
+
+# =====================================================
+# 📈 PROMETHEUS METRICS (PLAIN TEXT, NO DRF)
+# =====================================================
+def metrics_view(request):
+    token = metrics.metrics_settings()["TOKEN"]
+    if not token:
+        # Open only for local development; production must set METRICS_TOKEN
+        if not settings.DEBUG:
+            return HttpResponse(status=403)
+    elif not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+
+    return HttpResponse(
+        metrics.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 # =====================================================
 # ✅ UPI LINK
 # =====================================================
@@ -337,6 +410,86 @@ class UserProfileView(APIView):
         return Response(serializer.data)
 
 
+# =====================================================
+# 📊 MY BALANCES (ALL GROUPS)
+# =====================================================
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def my_balances(request):
+    return Response(MyBalancesSerializer(get_user_balances(request.user.id)).data)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def my_analytics(request):
+    try:
+        start = parse_month(request.query_params.get("from"))
+        end = parse_month(request.query_params.get("to"))
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=400)
+
+    return Response(get_user_analytics(request.user.id, start, end))
+
+
+# =====================================================
+# 📦 BATCH (SEVERAL SUB-REQUESTS, ONE ROUND TRIP)
+# =====================================================
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def batch_view(request):
+    config = batch.batch_settings()
+    try:
+        items, parallel = batch.parse(request.data, config)
+    except batch.BatchError as e:
+        return Response({"detail": str(e)}, status=400)
+
+    return Response({"responses": batch.run(request, items, parallel, config)})
+
+
+# =====================================================
+# 🔎 SEARCH EXPENSES (ALL MY GROUPS)
+# =====================================================
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def search_expenses_view(request):
+    try:
+        page = int(request.query_params.get("page", 1))
+        page_size = int(request.query_params.get("page_size", 20))
+    except ValueError:
+        return Response({"detail": "page and page_size must be numbers"}, status=400)
+
+    return Response(
+        search_expenses(
+            request.user.id,
+            request.query_params.get("q"),
+            page=page,
+            page_size=page_size,
+        )
+    )
+
+
+# =====================================================
+# 👥 USER SUGGESTIONS (ADD MEMBER AUTOCOMPLETE)
+# =====================================================
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def suggest_users_view(request):
+    try:
+        limit = int(request.query_params.get("limit", 10))
+        group_id = int(request.query_params.get("group") or 0) or None
+    except ValueError:
+        return Response({"detail": "limit and group must be numbers"}, status=400)
+
+    return Response(
+        suggest_users(
+            request.user.id,
+            request.query_params.get("q"),
+            limit=limit,
+            exclude_group_id=group_id,
+        )
+    )
+
+
 # =====================================================
 # ✅ GROUPS (🔥 FIXED – CREATE WORKS)
 # =====================================================
@@ -348,7 +501,16 @@ from rest_framework import viewsets
 
 from .models import Group, GroupMember
 from .serializers import GroupSerializer
-from .services import get_wallet_summary, get_settle_up
+from .services import (
+    get_wallet_summary,
+    get_settle_up,
+    get_group_overview,
+    get_balances_as_of,
+    get_plan_hash,
+    invalidate_snapshots,
+    record_settle_all,
+    PlanMismatch,
+)
 
 
 class GroupViewSet(viewsets.ModelViewSet):
@@ -356,18 +518,33 @@ class GroupViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        # User can SEE only groups they belong to
+        # User can SEE only groups they belong to (and not soft-deleted)
         return Group.objects.filter(
-            members__user=self.request.user
+            members__user=self.request.user,
+            deleted_at__isnull=True,
         ).distinct()
 
-    def perform_create(self, serializer):
-        # Creator is always added as member
-        group = serializer.save(created_by=self.request.user)
-        GroupMember.objects.create(
-            group=group,
-            user=self.request.user,
+    def list(self, request, *args, **kwargs):
+        if not sharding.is_sharded():
+            return super().list(request, *args, **kwargs)
+
+        groups = sharding.merge(
+            sharding.fan_out(lambda: list(self.filter_queryset(self.get_queryset()))),
+            lambda group: group.id,
         )
+        groups.sort(key=lambda group: group.id)
+        return Response(self.get_serializer(groups, many=True).data)
+
+    def perform_create(self, serializer):
+        # Creator is always added as member; the group goes to the
+        # creator's shard ("default" unless DATABASE_SHARD_URLS is set)
+        with sharding.use_shard(sharding.place_new_group(self.request.user.id)) as alias:
+            group = serializer.save(created_by=self.request.user)
+            GroupMember.objects.create(
+                group=group,
+                user=self.request.user,
+            )
+        sharding.record_group(group.id, alias)
 
     def destroy(self, request, *args, **kwargs):
         group = self.get_object()
@@ -379,24 +556,169 @@ class GroupViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        group.delete()
+        # Hide now; purge_groups removes the rows in small batches later
+        with transaction.atomic(), sharding.atomic():
+            group_removed(group.id)
+            group.deleted_at = now()
+            group.save(update_fields=["deleted_at"])
+            GroupPurge.objects.create(
+                group_id=group.id,
+                group_name=group.name,
+                requested_by=request.user,
+            )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=["get"])
     def summary(self, request, pk=None):
-        return Response(get_wallet_summary(pk))
+        group = self.get_object()
+        return Response(WalletSummarySerializer(get_wallet_summary(group.id)).data)
 
     @action(detail=True, methods=["get"])
     def settle_up(self, request, pk=None):
-        return Response(get_settle_up(pk))
+        group = self.get_object()
+        plan = get_settle_up(group.id)
+        return Response(
+            TransferSerializer(plan, many=True).data,
+            headers={"X-Plan-Hash": get_plan_hash(plan)},
+        )
+
+    @action(detail=True, methods=["get"])
+    def overview(self, request, pk=None):
+        group = self.get_object()
+
+        try:
+            latest = int(request.query_params.get("expenses", 10))
+        except ValueError:
+            return Response(
+                {"detail": "expenses must be a number"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        overview = get_group_overview(group.id, latest)
+        plan_hash = get_plan_hash(overview["settle_up"])
+        return Response(
+            GroupOverviewSerializer({**overview, "plan_hash": plan_hash}).data,
+            headers={"X-Plan-Hash": plan_hash},
+        )
+
+    @action(detail=True, methods=["post"])
+    def settle_all(self, request, pk=None):
+        group = self.get_object()
+        plan_hash = request.data.get("plan_hash")
+
+        if not plan_hash:
+            return Response(
+                {"detail": "plan_hash required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            plan = record_settle_all(group.id, plan_hash)
+        except PlanMismatch as e:
+            return Response(
+                {
+                    "detail": "Balances changed, review the new plan",
+                    "plan": TransferSerializer(e.plan, many=True).data,
+                    "plan_hash": e.plan_hash,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response({
+            "message": "Group settled successfully",
+            "settlements": TransferSerializer(plan, many=True).data,
+        })
     
+    @action(detail=True, methods=["get"])
+    def balances(self, request, pk=None):
+        group = self.get_object()
+        as_of = request.query_params.get("as_of")
+
+        if as_of:
+            try:
+                parsed = parse_datetime(as_of)
+                if parsed is None:
+                    day = parse_date(as_of)
+                    if day is not None:
+                        # A bare date means "end of that day"
+                        parsed = datetime.combine(day, time.max)
+            except ValueError:
+                parsed = None
+
+            if parsed is None:
+                return Response(
+                    {"detail": "as_of must be an ISO date or timestamp"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            if is_naive(parsed):
+                parsed = make_aware(parsed)
+            as_of = parsed
+
+        return Response(
+            BalancesAsOfSerializer(get_balances_as_of(group.id, as_of)).data
+        )
+
+    @action(detail=True, methods=["get"])
+    def analytics(self, request, pk=None):
+        group = self.get_object()
+
+        try:
+            start = parse_month(request.query_params.get("from"))
+            end = parse_month(request.query_params.get("to"))
+        except ValueError as e:
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(get_group_analytics(group.id, start, end))
+
+    @action(detail=True, methods=["get"])
+    def archive(self, request, pk=None):
+        group = self.get_object()
+
+        try:
+            page = int(request.query_params.get("page", 1))
+            page_size = int(request.query_params.get("page_size", 20))
+        except ValueError:
+            return Response({"detail": "page and page_size must be numbers"}, status=400)
+
+        return Response(get_archived_expenses(group.id, page=page, page_size=page_size))
+
+    @action(detail=True, methods=["post"], url_path="members/bulk")
+    def bulk_members(self, request, pk=None):
+        group = self.get_object()
+        identifiers = request.data.get("identifiers")
+
+        if not isinstance(identifiers, list) or not identifiers:
+            return Response(
+                {"detail": "identifiers must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if len(identifiers) > MAX_BULK_MEMBERS:
+            return Response(
+                {"detail": f"At most {MAX_BULK_MEMBERS} identifiers per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = add_members(group.id, identifiers)
+
+        return Response({
+            "added": sum(r["status"] == "added" for r in results),
+            "results": results,
+        })
+
     @action(detail=True, methods=["get"])
     def totals(self, request, pk=None):
         from .services import get_totals
-        return Response(get_totals(pk))
+        group = self.get_object()
+        return Response(NetBalanceSerializer(get_totals(group.id), many=True).data)
     
     @action(detail=True, methods=["post"])
     def mark_settlement(self, request, pk=None):
+        group = self.get_object()
         from_user = request.data.get("from_user")
         to_user = request.data.get("to_user")
         amount = request.data.get("amount")
@@ -408,7 +730,7 @@ class GroupViewSet(viewsets.ModelViewSet):
             )
 
         Settlement.objects.create(
-            group_id=pk,
+            group=group,
             from_user_id=from_user,
             to_user_id=to_user,
             amount=amount,
@@ -429,7 +751,8 @@ class GroupMemberViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         group_id = self.request.query_params.get("group")
         queryset = GroupMember.objects.filter(
-            group__members__user=self.request.user
+            group__members__user=self.request.user,
+            group__deleted_at__isnull=True,
         )
 
         if group_id:
@@ -437,6 +760,11 @@ class GroupMemberViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    # 🚀 Lists skip model instances and serializer fields (same JSON)
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(MEMBER_ROWS.data(queryset, self.get_serializer_context()))
+
     def create(self, request, *args, **kwargs):
         group_id = request.data.get("group")
         identifier = request.data.get("identifier")
@@ -447,7 +775,7 @@ class GroupMemberViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        group = Group.objects.filter(id=group_id).first()
+        group = Group.objects.filter(id=group_id, deleted_at__isnull=True).first()
         if not group:
             return Response(
                 {"detail": "Group not found"},
@@ -503,7 +831,9 @@ class GroupMemberViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        member = GroupMember.objects.create(group=group, user=user)
+        with sharding.atomic():
+            member = GroupMember.objects.create(group=group, user=user)
+            member_joined(group.id, user.id)
 
         return Response(
             GroupMemberSerializer(member).data,
@@ -526,7 +856,9 @@ class GroupMemberViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        member.delete()
+        with sharding.atomic():
+            member.delete()
+            member_left(group.id, member.user_id)
 
         return Response(
             {"detail": "Member removed successfully"},
@@ -545,18 +877,40 @@ class WalletExpenseViewSet(viewsets.ModelViewSet):
     serializer_class = WalletExpenseSerializer
     permission_classes = [IsAuthenticated]
 
+    # 📈 Keep monthly rollups in step with every write
+    def perform_create(self, serializer):
+        with sharding.atomic():
+            wallet_expense = serializer.save(added_by=self.request.user)
+            record_wallet_expense(wallet_expense)
+
+    def perform_update(self, serializer):
+        with sharding.atomic():
+            record_wallet_expense(serializer.instance, sign=-1)
+            wallet_expense = serializer.save()
+            record_wallet_expense(wallet_expense)
+
+    def perform_destroy(self, instance):
+        with sharding.atomic():
+            record_wallet_expense(instance, sign=-1)
+            instance.delete()
+
 
 class ExpenseViewSet(viewsets.ModelViewSet):
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        queryset = Expense.objects.all()
+        queryset = Expense.objects.filter(group__deleted_at__isnull=True)
         group_id = self.request.query_params.get("group")
         if group_id:
             queryset = queryset.filter(group_id=group_id)
         return queryset.order_by("-created_at")
 
+    # 🚀 Lists skip model instances and serializer fields (same JSON)
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(EXPENSE_ROWS.data(queryset, self.get_serializer_context()))
+
     def create(self, request, *args, **kwargs):
         group_id = request.data.get("group")
         title = request.data.get("title")
@@ -569,7 +923,7 @@ class ExpenseViewSet(viewsets.ModelViewSet):
             )
 
         # 1️⃣ Validate group
-        group = Group.objects.filter(id=group_id).first()
+        group = Group.objects.filter(id=group_id, deleted_at__isnull=True).first()
         if not group:
             return Response(
                 {"detail": "Group not found"},
@@ -585,31 +939,83 @@ class ExpenseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        # 3️⃣ Create expense (paid_by = logged-in user)
-        expense = Expense.objects.create(
-            group=group,
-            paid_by=request.user,
-            title=title,
-            amount=amount,
-            split_type="EQUAL",
+        # 3️⃣ Resolve who shares this expense (default: whole group)
+        split_type = request.data.get("split_type", SPLIT_EQUAL)
+        member_ids = sorted(
+            GroupMember.objects.filter(group=group).values_list("user_id", flat=True)
         )
+        if hasattr(request.data, "getlist"):
+            selected = request.data.getlist("members")
+        else:
+            selected = request.data.get("members")
+
+        if selected:
+            try:
+                if not isinstance(selected, list):
+                    # A bare "12" would otherwise be read as users 1 and 2
+                    raise TypeError
+                selected = [int(uid) for uid in selected]
+            except (TypeError, ValueError):
+                return Response(
+                    {"detail": "members must be a list of user ids"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            outsiders = set(selected) - set(member_ids)
+            if outsiders:
+                return Response(
+                    {"detail": f"Users not in group: {sorted(outsiders)}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            member_ids = selected
+
+        # 4️⃣ Compute splits (sum always equals amount)
+        try:
+            amount = to_decimal(amount)
+            shares = compute_splits(
+                amount,
+                split_type,
+                member_ids,
+                request.data.get("values"),
+            )
+        except SplitError as e:
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        # 4️⃣ Equal split
-        members = GroupMember.objects.filter(group=group)
-        share = expense.amount / members.count()
-
-        for member in members:
-            ExpenseSplit.objects.create(
-                expense=expense,
-                user=member.user,
-                share_amount=share,
+        # 5️⃣ Create expense (paid_by = logged-in user) + splits in bulk
+        with sharding.atomic():
+            expense = Expense.objects.create(
+                group=group,
+                paid_by=request.user,
+                title=title,
+                amount=amount,
+                split_type=split_type,
             )
+            create_expense_splits(expense, shares)
+            record_expense(expense, shares)
 
         return Response(
             ExpenseSerializer(expense).data,
             status=status.HTTP_201_CREATED,
         )
 
+    # 📈 Keep monthly rollups (and balance snapshots) in step with edits and deletes
+    def perform_update(self, serializer):
+        with sharding.atomic():
+            record_expense(serializer.instance, sign=-1)
+            invalidate_snapshots(serializer.instance.group_id, serializer.instance.created_at)
+            expense = serializer.save()
+            invalidate_snapshots(expense.group_id, expense.created_at)
+            record_expense(expense)
+
+    def perform_destroy(self, instance):
+        with sharding.atomic():
+            record_expense(instance, sign=-1)
+            invalidate_snapshots(instance.group_id, instance.created_at)
+            instance.delete()
+
 
 
 
@@ -618,15 +1024,51 @@ class ExpenseSplitViewSet(viewsets.ModelViewSet):
     serializer_class = ExpenseSplitSerializer
     permission_classes = [IsAuthenticated]
 
+    # 📈 Keep monthly rollups (and balance snapshots) in step with every write
+    def perform_create(self, serializer):
+        with sharding.atomic():
+            split = serializer.save()
+            self._invalidate(split)
+            record_split(split)
+
+    def perform_update(self, serializer):
+        with sharding.atomic():
+            record_split(serializer.instance, sign=-1)
+            self._invalidate(serializer.instance)
+            split = serializer.save()
+            self._invalidate(split)
+            record_split(split)
+
+    def perform_destroy(self, instance):
+        with sharding.atomic():
+            record_split(instance, sign=-1)
+            self._invalidate(instance)
+            instance.delete()
+
+    def _invalidate(self, split):
+        invalidate_snapshots(split.expense.group_id, split.expense.created_at)
+
 
 class SettlementViewSet(viewsets.ModelViewSet):
     queryset = Settlement.objects.all()
     serializer_class = SettlementSerializer
     permission_classes = [IsAuthenticated]
+
+    # A PENDING -> PAID change or a delete alters balances back then
+    def perform_update(self, serializer):
+        with sharding.atomic():
+            invalidate_snapshots(serializer.instance.group_id, serializer.instance.created_at)
+            settlement = serializer.save()
+            invalidate_snapshots(settlement.group_id, settlement.created_at)
+
+    def perform_destroy(self, instance):
+        with sharding.atomic():
+            invalidate_snapshots(instance.group_id, instance.created_at)
+            instance.delete()
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def create_group_invite(request, group_id):
-    group = get_object_or_404(Group, id=group_id)
+    group = get_object_or_404(Group, id=group_id, deleted_at__isnull=True)
 
     # Only members can invite
     if not GroupMember.objects.filter(
@@ -651,7 +1093,9 @@ def create_group_invite(request, group_id):
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def join_group_with_invite(request, token):
-    invite = get_object_or_404(GroupInvite, token=token, is_active=True)
+    invite = get_object_or_404(
+        GroupInvite, token=token, is_active=True, group__deleted_at__isnull=True
+    )
 
     if invite.is_expired():
         invite.is_active = False
@@ -671,7 +1115,9 @@ def join_group_with_invite(request, token):
             status=status.HTTP_200_OK
         )
 
-    GroupMember.objects.create(group=group, user=user)
+    with sharding.atomic():
+        GroupMember.objects.create(group=group, user=user)
+        member_joined(group.id, user.id)
 
     return Response(
         {